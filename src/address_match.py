@@ -0,0 +1,213 @@
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from .text_normalize import fold, TRANSLITERATIONS
+except ImportError:
+    # Running as a standalone script
+    from text_normalize import fold, TRANSLITERATIONS
+
+# Pairs scoring at or above ACCEPT are matches, at or below REJECT are non-matches;
+# anything in between is ambiguous and goes to Gemini
+ADDRESS_MATCH_ACCEPT = float(os.getenv("ADDRESS_MATCH_ACCEPT", "0.85"))
+ADDRESS_MATCH_REJECT = float(os.getenv("ADDRESS_MATCH_REJECT", "0.35"))
+
+# Single-token variants are rewritten first, then multi-word phrases (longest first)
+PHRASES = {
+    "jumeirah lakes tower": "jlt",
+    "jumeirah lake tower": "jlt",
+    "jumeirah beach residence": "jbr",
+    "jumeirah village circle": "jvc",
+    "jumeirah village triangle": "jvt",
+    "dubai international financial centre": "difc",
+    "dubai multi commodities centre": "dmcc",
+    "dubai silicon oasis": "dso",
+    "dubai internet city": "dic",
+    "dubai media city": "dmc",
+    "dubai investments park": "dip",
+    "jebel ali free zone": "jafza",
+    "abu dhabi global market": "adgm",
+    "sheikh zayed road": "szr",
+    "business bay": "businessbay",
+    "downtown dubai": "downtown",
+    "post box": "pobox",
+    "po box": "pobox",
+    "p o box": "pobox",
+    "p o b": "pobox",
+    "united arab emirates": "uae",
+    "u a e": "uae",
+    "abu dhabi": "abudhabi",
+    "ras al khaimah": "rak",
+    "umm al quwain": "uaq",
+}
+
+TOKENS = {
+    **TRANSLITERATIONS,
+    # Street furniture
+    "st": "street", "str": "street", "rd": "road", "ave": "avenue", "av": "avenue", "blvd": "boulevard",
+    "hwy": "highway", "sq": "square", "bldg": "building", "bld": "building", "twr": "tower", "towers": "tower",
+    "flr": "floor", "fl": "floor", "intl": "international", "ctr": "centre", "center": "centre", "pob": "pobox",
+    "dist": "district",
+    "dxb": "dubai", "shj": "sharjah", "auh": "abudhabi",
+}
+
+# Unit markers carry no information in the token comparison; the number next to them is kept
+# and compared together with its label (see labelled_numbers)
+FILLER = {"office", "unit", "suite", "flat", "apt", "apartment", "shop", "no", "number", "the", "of", "and", "uae"}
+
+# Words that say what the number after them is, mapped to a common label
+# ("Office 303" and "Unit 303" name the same kind of thing)
+NUMBER_LABELS = {
+    "office": "unit", "unit": "unit", "suite": "unit", "flat": "unit", "apt": "unit", "apartment": "unit", "shop": "unit",
+    "building": "building", "tower": "building", "villa": "villa", "plot": "plot", "floor": "floor",
+}
+
+EMIRATES = {"dubai", "abudhabi", "sharjah", "ajman", "fujairah", "rak", "uaq"}
+
+_PHRASE_PATTERN = re.compile(r"\b(" + "|".join(re.escape(p) for p in sorted(PHRASES, key=len, reverse=True)) + r")\b")
+_NUMBER = re.compile(r"^\d+[a-z]?$")
+
+
+def _canonical_tokens(address: str) -> List[str]:
+    text = fold(address)
+    # Ordinals are plain numbers ("1st floor" -> "1 floor")
+    text = re.sub(r"\b(\d+)(st|nd|rd|th)\b", r"\1", text)
+    # Split letters from digits ("no303" -> "no 303", "303b" stays a unit number)
+    text = re.sub(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z]{2,})", " ", text)
+    text = " ".join(TOKENS.get(token, token) for token in text.split())
+    return _PHRASE_PATTERN.sub(lambda m: PHRASES[m.group(1)], text).split()
+
+
+def normalize_address(address: str) -> str:
+    return " ".join(token for token in _canonical_tokens(address) if token not in FILLER)
+
+
+def labelled_numbers(address: str) -> Set[Tuple[Optional[str], str]]:
+    """
+    (label, number) pairs of an address, binding each number to the word that names it
+
+    e.g. "Unit 5, Building 12, 3rd Floor" -> {("unit", "5"), ("building", "12"), ("floor", "3")};
+    numbers without a label word get None. PO box numbers are compared separately.
+    """
+    tokens = _canonical_tokens(address)
+    pairs = set()
+    for i, token in enumerate(tokens):
+        if not _NUMBER.match(token) or (i and tokens[i - 1] == "pobox"):
+            continue
+        j = i - 1
+        while j >= 0 and tokens[j] in ("no", "number"):
+            j -= 1
+        label = NUMBER_LABELS.get(tokens[j]) if j >= 0 else None
+        if label is None and i + 1 < len(tokens) and tokens[i + 1] == "floor":
+            label = "floor"
+        pairs.add((label, token))
+    return pairs
+
+
+def _number_conflict(pairs1, pairs2) -> Optional[str]:
+    """Why the labelled numbers of two addresses disagree, or None if they don't"""
+    labels1 = {label for label, _ in pairs1 if label}
+    labels2 = {label for label, _ in pairs2 if label}
+    for label in labels1 & labels2:
+        if {n for l, n in pairs1 if l == label} != {n for l, n in pairs2 if l == label}:
+            return f"Different {label} numbers"
+    numbers1 = {n for _, n in pairs1}
+    numbers2 = {n for _, n in pairs2}
+    if numbers1 and numbers2 and not numbers1 & numbers2:
+        return "Similar addresses with different unit numbers"
+    # The same number naming a unit on one side and a building on the other
+    for number in numbers1 & numbers2:
+        bound1 = {l for l, n in pairs1 if n == number and l}
+        bound2 = {l for l, n in pairs2 if n == number and l}
+        if bound1 and bound2 and not bound1 & bound2:
+            return "Same numbers bound to different unit/building labels"
+    return None
+
+
+def _pobox(tokens) -> Optional[str]:
+    for i, token in enumerate(tokens[:-1]):
+        if token == "pobox" and _NUMBER.match(tokens[i + 1]):
+            return tokens[i + 1]
+    return None
+
+
+def _levenshtein_similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return 1 - previous[-1] / len(a)
+
+
+def score_addresses(address1: str, address2: str) -> Dict:
+    """
+    Compare two addresses locally
+
+    Returns:
+        dict: {"score": 0..1, "reason": str, "conflict": bool}; conflict means the addresses carry
+              contradicting facts (different emirate or PO box) regardless of the text score.
+              "undecided": True marks pairs with too little text to score either way.
+    """
+    n1, n2 = normalize_address(address1), normalize_address(address2)
+    # Unit markers are dropped from the normalised text, so the numbers are checked against
+    # their labels first: "Unit 5, Building 12" and "Unit 12, Building 5" must not match
+    number_conflict = _number_conflict(labelled_numbers(address1), labelled_numbers(address2))
+    tokens1, tokens2 = n1.split(), n2.split()
+    emirates1, emirates2 = set(tokens1) & EMIRATES, set(tokens2) & EMIRATES
+    if emirates1 and emirates2 and not emirates1 & emirates2:
+        return {"score": 0.0, "reason": "Different emirates", "conflict": True}
+    box1, box2 = _pobox(tokens1), _pobox(tokens2)
+    if box1 and box2 and box1 != box2:
+        return {"score": 0.0, "reason": "Different PO Box numbers", "conflict": True}
+
+    # The emirate may be omitted on one side ("Dubai" included or not is acceptable)
+    set1: Set[str] = set(tokens1) - EMIRATES
+    set2: Set[str] = set(tokens2) - EMIRATES
+    if not set1 or not set2:
+        # Empty or only an emirate: nothing to go on either way, so the pair is left to the model
+        return {"score": 0.0, "reason": "Address too short to compare", "conflict": False, "undecided": True}
+    if n1 == n2 and not number_conflict:
+        return {"score": 1.0, "reason": "Identical after normalisation", "conflict": False}
+
+    common = set1 & set2
+    # Containment alone would let a short address ("Dubai Marina") match anything that contains it
+    containment = len(common) / min(len(set1), len(set2))
+    jaccard = len(common) / len(set1 | set2)
+    token_set = 0.5 * containment + 0.5 * jaccard
+    edit = _levenshtein_similarity(" ".join(sorted(set1)), " ".join(sorted(set2)))
+    score = 0.6 * token_set + 0.4 * edit
+
+    if number_conflict:
+        # Same building but e.g. a different office number is for the model (or a human) to judge
+        score = min(score, ADDRESS_MATCH_ACCEPT - 0.01)
+        reason = number_conflict
+    else:
+        reason = f"{len(common)} of {min(len(set1), len(set2))} address tokens shared"
+    return {"score": round(score, 4), "reason": reason, "conflict": False}
+
+
+def match_addresses_local(address1: str, address2: str) -> Optional[Dict]:
+    """
+    Decide whether two addresses refer to the same place without calling a model
+
+    Returns:
+        dict: {"match": bool, "reason": str, "score": float} when the local engine is confident,
+              None when the pair is ambiguous and should be escalated
+    """
+    result = score_addresses(address1, address2)
+    if result.get("undecided"):
+        return None
+    if result["conflict"] or result["score"] <= ADDRESS_MATCH_REJECT:
+        return {"match": False, "reason": result["reason"], "score": result["score"]}
+    if result["score"] >= ADDRESS_MATCH_ACCEPT:
+        return {"match": True, "reason": result["reason"], "score": result["score"]}
+    return None
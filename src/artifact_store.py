@@ -0,0 +1,208 @@
+import fnmatch
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Every file a job leaves on local disk (recordings, snapshots, debug screenshots, temporary
+# uploads) is tracked here. Files are reference counted: a pending upload holds a reference and
+# the last release deletes the file. Unreferenced files stay for inspection until the total size
+# cap evicts them, least recently used first.
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# (directory, filename pattern) pairs scanned at startup for files left by earlier runs: only
+# where the agents write at runtime, i.e. their "videos/" output directory (recordings,
+# snapshots, debug screenshots) and the temporary uploads. src/videos holds recordings checked
+# into the repository, so it is never scanned, even when the server runs from src/.
+_RUNTIME_VIDEOS_DIR = os.path.abspath("videos")
+ARTIFACT_ROOTS: List[Tuple[str, str]] = [(tempfile.gettempdir(), "temp_upload_*")]
+if _RUNTIME_VIDEOS_DIR != os.path.join(_SRC_DIR, "videos"):
+    ARTIFACT_ROOTS.insert(0, (_RUNTIME_VIDEOS_DIR, "*"))
+
+
+class ArtifactStore:
+    """Reference-counted registry of local job artifacts with an LRU size cap"""
+
+    def __init__(self, max_bytes: int = ARTIFACT_MAX_BYTES, roots: List[Tuple[str, str]] = ARTIFACT_ROOTS):
+        self.max_bytes = max_bytes
+        self.roots = roots
+        self._lock = threading.Lock()
+        self._artifacts: Dict[str, Dict] = {}
+        self._bytes = 0
+        self._stats = {"tracked": 0, "deleted": 0, "evictions": 0, "evicted_bytes": 0}
+
+    def track(self, path: str, job: str = None, kind: str = None, hold: bool = False) -> Optional[str]:
+        """
+        Start tracking a file a job wrote
+
+        Args:
+            path: Local file
+            job: Name of the job that created it (e.g. the evidence name)
+            kind: Label for metrics ("video", "snapshot", "debug", "upload", ...)
+            hold: Take a reference for the caller, to be given back with release()
+
+        Returns:
+            str: The absolute path, or None if the file doesn't exist
+        """
+        if not path or not os.path.isfile(path):
+            return None
+        path = os.path.abspath(path)
+        with self._lock:
+            artifact = self._artifacts.get(path)
+            if artifact is None:
+                size = os.path.getsize(path)
+                artifact = {
+                    "job": job,
+                    "kind": kind or _kind_of(path),
+                    "size": size,
+                    "refs": 0,
+                    "last_access": time.time(),
+                }
+                self._artifacts[path] = artifact
+                self._bytes += size
+                self._stats["tracked"] += 1
+            artifact["last_access"] = time.time()
+            if hold:
+                artifact["refs"] += 1
+        self._enforce_cap()
+        return path
+
+    def acquire(self, path: str) -> bool:
+        """Take a reference (e.g. for a pending upload); untracked files are tracked first"""
+        path = self.track(path)
+        if not path:
+            return False
+        with self._lock:
+            self._artifacts[path]["refs"] += 1
+        return True
+
+    def release(self, path: str, delete: bool = True):
+        """
+        Give back a reference; when the last one goes the file is deleted. With delete=False the
+        file is kept and left to the size cap instead.
+        """
+        if not path:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            artifact = self._artifacts.get(path)
+            if artifact is None:
+                return
+            artifact["refs"] = max(0, artifact["refs"] - 1)
+            if artifact["refs"] or not delete:
+                artifact["last_access"] = time.time()
+                return
+            self._delete(path)
+
+    def scan(self):
+        """Adopt untracked files under ARTIFACT_ROOTS (left by a previous run), then apply the cap"""
+        found = 0
+        for directory, pattern in self.roots:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in fnmatch.filter(names, pattern):
+                path = os.path.abspath(os.path.join(directory, name))
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                with self._lock:
+                    if path in self._artifacts:
+                        continue
+                    self._artifacts[path] = {
+                        "job": None, "kind": _kind_of(path), "size": size, "refs": 0,
+                        "last_access": mtime,
+                    }
+                    self._bytes += size
+                found += 1
+        if found:
+            print(f"Artifact store: found {found} files from earlier runs")
+        self._enforce_cap()
+
+    def _delete(self, path: str):
+        # Caller holds the lock
+        artifact = self._artifacts.pop(path, None)
+        if artifact is None:
+            return
+        self._bytes -= artifact["size"]
+        try:
+            os.remove(path)
+            self._stats["deleted"] += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not delete artifact {path}: {e}")
+
+    def _enforce_cap(self):
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+            # Files with a pending upload are never evicted
+            candidates = sorted(
+                (info["last_access"], path) for path, info in self._artifacts.items() if not info["refs"]
+            )
+            for _, path in candidates:
+                if self._bytes <= self.max_bytes:
+                    break
+                size = self._artifacts[path]["size"]
+                self._delete(path)
+                self._stats["evictions"] += 1
+                self._stats["evicted_bytes"] += size
+
+    def stats(self):
+        with self._lock:
+            by_kind: Dict[str, Dict] = {}
+            pinned_files = pinned_bytes = 0
+            jobs = set()
+            for info in self._artifacts.values():
+                kind = by_kind.setdefault(info["kind"], {"files": 0, "bytes": 0})
+                kind["files"] += 1
+                kind["bytes"] += info["size"]
+                if info["refs"]:
+                    pinned_files += 1
+                    pinned_bytes += info["size"]
+                if info["job"]:
+                    jobs.add(info["job"])
+            result = {
+                **self._stats,
+                "files": len(self._artifacts),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "pinned_files": pinned_files,
+                "pinned_bytes": pinned_bytes,
+                "jobs": len(jobs),
+                "by_kind": by_kind,
+            }
+        disks = {}
+        for directory, _ in self.roots:
+            try:
+                usage = shutil.disk_usage(directory)
+            except OSError:
+                continue
+            disks[os.path.abspath(directory)] = {"total": usage.total, "used": usage.used, "free": usage.free}
+        result["disk"] = disks
+        return result
+
+
+def _kind_of(path: str) -> str:
+    name = os.path.basename(path)
+    if name.startswith("temp_upload_"):
+        return "upload"
+    if name.startswith("debug_"):
+        return "debug"
+    if name.endswith(".webm"):
+        return "video"
+    if name.endswith((".jpg", ".jpeg")):
+        return "preview"
+    return "snapshot"
+
+
+artifact_store = ArtifactStore()
@@ -1,57 +1,63 @@
 import asyncio
 import json
+import os
 import random
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+import uuid
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from datetime import datetime
 
-async def extract_license_info(trade_license_number: str = None, direct_url: str = None):
+try:
+    from .browser_pool import browser_pool, FIREFOX_USER_AGENT, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+except ImportError:
+    # Running as a standalone script
+    from browser_pool import browser_pool, FIREFOX_USER_AGENT, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+
+async def save_debug_screenshot(page, data: dict, reason: str):
+    """Full-page screenshot for a failed run, named per job so concurrent failures don't overwrite each other"""
+    try:
+        os.makedirs("videos/", exist_ok=True)
+        path = os.path.join("videos/", f"debug_{reason}_{uuid.uuid4().hex}.png")
+        await page.screenshot(path=path, full_page=True)
+        data["debug_screenshot_path"] = path
+    except Exception as e:
+        print(f"Failed to save debug screenshot: {e}")
+
+async def extract_license_info(trade_license_number: str = None, direct_url: str = None, evidence: str = DEFAULT_EVIDENCE):
     """
     Extract license information from Dubai invest portal with maximum stealth
     
     Args:
         trade_license_number: The trade license number to search for
         direct_url: Optional direct URL to navigate to (e.g. from QR code)
+        evidence: "video", "video_low", "snapshot" or "none"
         
     Returns:
         dict: Extracted license information
     """
     
-    async with async_playwright() as p:
-        # Try Firefox as it's sometimes harder to detect
-        browser = await p.firefox.launch(
-            headless=True,
-            firefox_user_prefs={
-                "dom.webdriver.enabled": False,
-                "useAutomationExtension": False,
-                "general.platform.override": "Win32",
-                "general.useragent.override": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0"
-            }
-        )
-        
-        # Create context with realistic settings
-        context = await browser.new_context(
-            viewport={"width": 1366, "height": 768},  # Common laptop resolution
-            locale="en-US",
-            timezone_id="Asia/Dubai",  # Use Dubai timezone
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
-            record_video_dir="videos/",
-            record_video_size={"width": 1366, "height": 768},
-            geolocation={"latitude": 25.2048, "longitude": 55.2708},
-            permissions=["geolocation"],
-            extra_http_headers={
-                "Accept-Language": "en-US,en;q=0.9,ar;q=0.8",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br",
-                "DNT": "1",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-                "Sec-Fetch-Dest": "document",
-                "Sec-Fetch-Mode": "navigate",
-                "Sec-Fetch-Site": "none",
-                "Cache-Control": "max-age=0"
-            }
-        )
-        
+    # Firefox (pooled) as it's sometimes harder to detect; create context with realistic settings
+    async with browser_pool.new_context(
+        "firefox",
+        viewport={"width": 1366, "height": 768},  # Common laptop resolution
+        locale="en-US",
+        timezone_id="Asia/Dubai",  # Use Dubai timezone
+        user_agent=FIREFOX_USER_AGENT,
+        **evidence_options(evidence, "videos/", {"width": 1366, "height": 768}),
+        geolocation={"latitude": 25.2048, "longitude": 55.2708},
+        permissions=["geolocation"],
+        extra_http_headers={
+            "Accept-Language": "en-US,en;q=0.9,ar;q=0.8",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate, br",
+            "DNT": "1",
+            "Connection": "keep-alive",
+            "Upgrade-Insecure-Requests": "1",
+            "Sec-Fetch-Dest": "document",
+            "Sec-Fetch-Mode": "navigate",
+            "Sec-Fetch-Site": "none",
+            "Cache-Control": "max-age=0"
+        }
+    ) as context:
         page = await context.new_page()
         
         try:
@@ -172,39 +178,25 @@ async def extract_license_info(trade_license_number: str = None, direct_url: str
             print("EXTRACTED LICENSE INFORMATION")
             print("="*50)
             print(json.dumps(license_data, indent=2, ensure_ascii=False))
-            # Close context to save video
-            await context.close()
-            
-            # Get video path
-            video_path = await page.video.path()
-            if video_path:
-                print(f"Video saved at: {video_path}")
-                license_data["video_path"] = video_path
+            # Close context to save video (or snapshot)
+            await finish_evidence(context, page, evidence, license_data, "videos/", "license")
             
             return license_data
             
         except PlaywrightTimeoutError as e:
             print(f"Timeout error: {e}")
-            await page.screenshot(path="debug_timeout.png", full_page=True)
             error_data = {"error": "Timeout waiting for element"}
+            await save_debug_screenshot(page, error_data, "timeout")
             # Ensure video is saved even on timeout
-            await context.close()
-            video_path = await page.video.path()
-            if video_path:
-                error_data["video_path"] = video_path
+            await finish_evidence(context, page, evidence, error_data, "videos/", "license")
             return error_data
         except Exception as e:
             print(f"Error occurred: {e}")
-            await page.screenshot(path="debug_error.png", full_page=True)
             error_data = {"error": str(e)}
-            await context.close()
-            video_path = await page.video.path()
-            if video_path:
-                error_data["video_path"] = video_path
+            await save_debug_screenshot(page, error_data, "error")
+            await finish_evidence(context, page, evidence, error_data, "videos/", "license")
             return error_data
         finally:
-            await browser.close()
-            
             video_path = await page.video.path() if page.video else None
             if video_path:
                 print(f"\nVideo saved to: {video_path}")
@@ -213,7 +205,10 @@ async def extract_license_info(trade_license_number: str = None, direct_url: str
 async def main():
     trade_license_number = "1234538"
     
-    result = await extract_license_info(trade_license_number)
+    try:
+        result = await extract_license_info(trade_license_number)
+    finally:
+        await browser_pool.stop()
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = f"license_data_{trade_license_number}_{timestamp}.json"
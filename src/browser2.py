@@ -6,24 +6,30 @@
 # !playwright install chromium
 # !playwright install-deps
 
-from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 import json
 import re
 import asyncio
 
-async def extract_website_data(url):
+try:
+    from .browser_pool import browser_pool, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+except ImportError:
+    # Running as a standalone script
+    from browser_pool import browser_pool, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+
+async def extract_website_data(url, evidence: str = DEFAULT_EVIDENCE):
     """
     Extracts business information from a website using Playwright browser automation
+
+    evidence selects what is recorded: "video", "video_low", "snapshot" or "none"
     """
+    evidence_data = {"video_path": None}
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        # Create context with video recording
-        context = await browser.new_context(
-            record_video_dir="videos/",
-            record_video_size={"width": 1280, "height": 720}
-        )
+    # Create context (recording video if requested) on the pooled Chromium
+    async with browser_pool.new_context(
+        "chromium",
+        **evidence_options(evidence, "videos/", {"width": 1280, "height": 720})
+    ) as context:
         page = await context.new_page()
         
         print(f"Navigating to {url}...")
@@ -31,9 +37,7 @@ async def extract_website_data(url):
         await page.wait_for_timeout(2000)
         
         content = await page.content()
-        await context.close() # Close context to save video
-        video_path = await page.video.path()
-        await browser.close()
+        await finish_evidence(context, page, evidence, evidence_data, "videos/", "website") # Close context to save video
     
     soup = BeautifulSoup(content, 'html.parser')
     
@@ -171,7 +175,7 @@ async def extract_website_data(url):
     # Public video path fallback handling done in backend usually, but here we just pass the raw path
     # User requested: /data/uploads/website_check_20251215_085622.webm pattern? 
     # Backend handles the move and renaming. We just return the temp path.
-    result['video_path'] = video_path
+    result.update(evidence_data)
     
     return result
 
@@ -182,7 +186,10 @@ async def main():
     print("Starting website data extraction...")
     print("="*60)
     
-    data = await extract_website_data(url)
+    try:
+        data = await extract_website_data(url)
+    finally:
+        await browser_pool.stop()
     
     # Print results
     print("\n" + "="*60)
@@ -1,33 +1,30 @@
 import asyncio
 import json
 import traceback
-from playwright.async_api import async_playwright
-async def extract_lei_info(lei_code: str):
+
+try:
+    from .browser_pool import browser_pool, FIREFOX_USER_AGENT, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+except ImportError:
+    # Running as a standalone script
+    from browser_pool import browser_pool, FIREFOX_USER_AGENT, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+
+async def extract_lei_info(lei_code: str, evidence: str = DEFAULT_EVIDENCE):
     """
     Extract LEI company details from leicodeae.com
     
     Args:
         lei_code: The 20-character LEI code
+        evidence: "video", "video_low", "snapshot" or "none"
         
     Returns:
         dict: Extracted company details and video path
     """
-    async with async_playwright() as p:
-        browser = await p.firefox.launch(
-            headless=True,
-            firefox_user_prefs={
-                "dom.webdriver.enabled": False,
-                "useAutomationExtension": False,
-            }
-        )
-        
-        context = await browser.new_context(
-            viewport={"width": 1366, "height": 768},
-            record_video_dir="videos/",
-            record_video_size={"width": 1366, "height": 768},
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0"
-        )
-        
+    async with browser_pool.new_context(
+        "firefox",
+        viewport={"width": 1366, "height": 768},
+        **evidence_options(evidence, "videos/", {"width": 1366, "height": 768}),
+        user_agent=FIREFOX_USER_AGENT
+    ) as context:
         page = await context.new_page()
         lei_data = {}
         
@@ -185,12 +182,6 @@ async def extract_lei_info(lei_code: str):
             lei_data["error"] = str(e)
             
         finally:
-            await context.close()
-            video_path = await page.video.path()
-            if video_path:
-                print(f"Video saved at: {video_path}")
-                lei_data["video_path"] = video_path
-            
-            await browser.close()
+            await finish_evidence(context, page, evidence, lei_data, "videos/", "lei")
             
         return lei_data
@@ -6,6 +6,12 @@ import json
 import os
 import uuid
 
+try:
+    from .browser_pool import browser_pool, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+except ImportError:
+    # Running as a standalone script
+    from browser_pool import browser_pool, DEFAULT_EVIDENCE, evidence_options, finish_evidence
+
 # Directory for saving videos
 VIDEOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "videos")
 os.makedirs(VIDEOS_DIR, exist_ok=True)
@@ -81,19 +87,17 @@ async def verify_google_maps_address(address: str):
     return {"verified": verified, "map_url": current_url}
 
 # Revised implementation with correct video path capture
-async def verify_address_optimized(address: str):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            record_video_dir=VIDEOS_DIR,
-            record_video_size={"width": 1280, "height": 720},
-            viewport={"width": 1280, "height": 720}
-        )
+async def verify_address_optimized(address: str, evidence: str = DEFAULT_EVIDENCE):
+    async with browser_pool.new_context(
+        "chromium",
+        **evidence_options(evidence, VIDEOS_DIR, {"width": 1280, "height": 720}),
+        viewport={"width": 1280, "height": 720}
+    ) as context:
         page = await context.new_page()
         
         verified = False
         map_url = ""
-        saved_video_path = ""
+        evidence_data = {"video_path": ""}
 
         try:
             print(f"Navigating to Google Maps for: {address}")
@@ -127,28 +131,29 @@ async def verify_address_optimized(address: str):
                 verified = True
                 map_url = page.url
 
-            # Capture video path before closing
-            video_obj = page.video
-            if video_obj:
-                saved_video_path = await video_obj.path()
-
         except Exception as e:
             print(f"Error during verification: {e}")
             verified = False
         finally:
-            await context.close()
-            await browser.close()
+            await finish_evidence(context, page, evidence, evidence_data, VIDEOS_DIR, "maps")
 
     return {
         "verified": verified,
         "map_url": map_url,
-        "video_path": saved_video_path
+        **evidence_data
     }
 
+async def _run_standalone(address: str, evidence: str = DEFAULT_EVIDENCE):
+    try:
+        return await verify_address_optimized(address, evidence)
+    finally:
+        await browser_pool.stop()
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         addr = sys.argv[1]
-        result = asyncio.run(verify_address_optimized(addr))
+        evidence = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_EVIDENCE
+        result = asyncio.run(_run_standalone(addr, evidence))
         print(json.dumps(result))
     else:
         print(json.dumps({"error": "No address provided"}))
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+# Number of browser contexts (jobs) allowed to run at the same time across all engines
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+# Relaunch a browser after it has served this many jobs to keep memory usage in check
+BROWSER_POOL_MAX_JOBS = int(os.getenv("BROWSER_POOL_MAX_JOBS", "50"))
+# Engines launched eagerly on startup (others are launched on first use)
+BROWSER_POOL_ENGINES = [e.strip() for e in os.getenv("BROWSER_POOL_ENGINES", "firefox,chromium").split(",") if e.strip()]
+
+# Evidence a browser agent records for a job: full video, reduced-resolution video,
+# a single screenshot plus DOM snapshot, or nothing (bulk re-checks)
+EVIDENCE_LEVELS = ("video", "video_low", "snapshot", "none")
+DEFAULT_EVIDENCE = os.getenv("BROWSER_EVIDENCE", "video")
+if DEFAULT_EVIDENCE not in EVIDENCE_LEVELS:
+    # Checked once here; otherwise every job started without an explicit level would fail
+    print(f"Warning: BROWSER_EVIDENCE={DEFAULT_EVIDENCE!r} is not one of {EVIDENCE_LEVELS}, using 'video'")
+    DEFAULT_EVIDENCE = "video"
+# video_low records at this fraction of the viewport size
+LOW_VIDEO_SCALE = 0.5
+
+FIREFOX_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0"
+
+# Launch options per engine. Browser-level settings are shared by every job on that engine,
+# anything job specific (viewport, video, headers) belongs on the context instead.
+LAUNCH_OPTIONS = {
+    "firefox": {
+        "headless": True,
+        "firefox_user_prefs": {
+            "dom.webdriver.enabled": False,
+            "useAutomationExtension": False,
+            "general.platform.override": "Win32",
+            "general.useragent.override": FIREFOX_USER_AGENT
+        }
+    },
+    "chromium": {
+        "headless": True
+    }
+}
+
+
+class _PooledBrowser:
+    """A launched browser plus the bookkeeping needed for recycling."""
+
+    def __init__(self, engine, browser):
+        self.engine = engine
+        self.browser = browser
+        self.jobs = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Long-lived Playwright browsers shared by all browser agents.
+
+    One browser is kept per engine and every job gets its own fresh BrowserContext,
+    so jobs stay isolated (cookies, storage, video) without paying for a browser launch.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_jobs: int = BROWSER_POOL_MAX_JOBS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._playwright = None
+        self._browsers = {}
+        self._semaphore = asyncio.Semaphore(size)
+        # Guards starting and stopping Playwright only; launches are serialised per engine, so
+        # a browser launching for one engine never holds up jobs on another
+        self._lock = asyncio.Lock()
+        self._engine_locks = {}
+        # Retired browsers being closed in the background
+        self._closing = set()
+        self._launches = 0
+        self._jobs_served = 0
+
+    async def start(self, engines=None):
+        """Start Playwright and warm up the given engines."""
+        async with self._lock:
+            if not self._playwright:
+                self._playwright = await async_playwright().start()
+        for engine in engines or []:
+            try:
+                await self._get_browser(engine)
+            except Exception as e:
+                print(f"Browser pool: failed to warm up {engine}: {e}")
+
+    async def stop(self):
+        """Close all pooled browsers and stop Playwright."""
+        async with self._lock:
+            browsers, self._browsers = list(self._browsers.values()), {}
+            await asyncio.gather(*(self._close(pooled) for pooled in browsers), *self._closing)
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def _healthy(self, engine):
+        pooled = self._browsers.get(engine)
+        if pooled and not pooled.retired and pooled.browser.is_connected():
+            return pooled
+        return None
+
+    async def _get_browser(self, engine):
+        pooled = self._healthy(engine)
+        if pooled:
+            return pooled
+
+        lock = self._engine_locks.setdefault(engine, asyncio.Lock())
+        async with lock:
+            # Another job may have launched it while this one waited for the lock
+            pooled = self._healthy(engine)
+            if pooled:
+                return pooled
+
+            pooled = self._browsers.pop(engine, None)
+            if pooled:
+                # Unhealthy or due for recycling: close now if idle, otherwise once its last job ends
+                pooled.retired = True
+                if pooled.active == 0 or not pooled.browser.is_connected():
+                    self._close_later(pooled)
+
+            launcher = getattr(self._playwright, engine)
+            browser = await launcher.launch(**LAUNCH_OPTIONS.get(engine, {"headless": True}))
+            self._launches += 1
+            print(f"Browser pool: launched {engine}")
+            pooled = _PooledBrowser(engine, browser)
+            self._browsers[engine] = pooled
+            return pooled
+
+    def _close_later(self, pooled):
+        # Closing takes seconds; nobody has to wait for it
+        task = asyncio.create_task(self._close(pooled))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, pooled):
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            print(f"Browser pool: error closing {pooled.engine}: {e}")
+
+    @asynccontextmanager
+    async def new_context(self, engine: str, **context_options):
+        """
+        Borrow a fresh, isolated BrowserContext from the pooled browser for `engine`.
+
+        Args:
+            engine: Playwright engine name ("firefox" or "chromium")
+            **context_options: Passed straight to browser.new_context()
+
+        Yields:
+            BrowserContext: Closed automatically when the block exits
+        """
+        if not self._playwright:
+            await self.start()
+
+        async with self._semaphore:
+            pooled = await self._get_browser(engine)
+            pooled.active += 1
+
+            context = None
+            try:
+                context = await pooled.browser.new_context(**context_options)
+                yield context
+            finally:
+                if context:
+                    try:
+                        # Agents usually close the context themselves to flush the video;
+                        # closing again is harmless.
+                        await context.close()
+                    except Exception:
+                        pass
+
+                # No awaits in between, so this bookkeeping can't interleave with another job's
+                pooled.active -= 1
+                pooled.jobs += 1
+                self._jobs_served += 1
+                if pooled.jobs >= self.max_jobs:
+                    pooled.retired = True
+                if pooled.retired and pooled.active == 0:
+                    if self._browsers.get(engine) is pooled:
+                        del self._browsers[engine]
+                    self._close_later(pooled)
+
+    def status(self):
+        """Health and usage summary of the pool."""
+        return {
+            "started": self._playwright is not None,
+            "size": self.size,
+            "max_jobs_per_browser": self.max_jobs,
+            "launches": self._launches,
+            "jobs_served": self._jobs_served,
+            "browsers": {
+                engine: {
+                    "connected": pooled.browser.is_connected(),
+                    "jobs": pooled.jobs,
+                    "active": pooled.active,
+                    "retired": pooled.retired
+                }
+                for engine, pooled in self._browsers.items()
+            }
+        }
+
+
+def evidence_options(evidence: str, video_dir: str, size: dict) -> dict:
+    """
+    Context options for an evidence level (to merge into new_context)
+
+    Only the video levels record, which is where most of a job's CPU goes.
+    """
+    if evidence not in EVIDENCE_LEVELS:
+        raise ValueError(f"Unknown evidence level {evidence!r}, expected one of {EVIDENCE_LEVELS}")
+    if evidence == "video":
+        return {"record_video_dir": video_dir, "record_video_size": size}
+    if evidence == "video_low":
+        # Even dimensions keep the VP8 encoder happy
+        low = {k: int(v * LOW_VIDEO_SCALE) // 2 * 2 for k, v in size.items()}
+        return {"record_video_dir": video_dir, "record_video_size": low}
+    return {}
+
+
+async def finish_evidence(context, page, evidence: str, data: dict, evidence_dir: str, prefix: str):
+    """
+    Capture the requested evidence, close the context and record the file paths in `data`
+
+    Sets data["video_path"] for the video levels, and data["screenshot_path"] /
+    data["snapshot_path"] (viewport PNG and page HTML) for "snapshot". Closing the context is
+    what flushes the video to disk, so agents call this instead of context.close().
+    """
+    if evidence == "snapshot":
+        try:
+            os.makedirs(evidence_dir, exist_ok=True)
+            base = os.path.join(evidence_dir, f"{prefix}_{uuid.uuid4().hex}")
+            await page.screenshot(path=f"{base}.png")
+            with open(f"{base}.html", "w", encoding="utf-8") as f:
+                f.write(await page.content())
+            data["screenshot_path"] = f"{base}.png"
+            data["snapshot_path"] = f"{base}.html"
+        except Exception as e:
+            print(f"Failed to capture snapshot evidence: {e}")
+
+    await context.close()
+    video_path = await page.video.path() if page.video else None
+    if video_path:
+        print(f"Video saved at: {video_path}")
+        data["video_path"] = video_path
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# SQLite file backing the persistent tier of every cache (one table, namespaced by cache name)
+CACHE_DB_PATH = os.getenv(
+    "CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "kyb_cache.sqlite3")
+)
+
+_caches = {}
+
+
+class TieredCache:
+    """
+    Two-tier key/value cache: an in-memory LRU in front of a SQLite table that survives restarts.
+
+    Values must be JSON serialisable. Entries older than `ttl` are stale; stale entries are still
+    served for up to `stale_ttl` more seconds while a background refresh runs (stale-while-revalidate).
+    With `max_bytes` set, each tier is also bounded by the serialised size of its entries and the
+    least recently used entries are evicted first.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0, max_entries: int = 1024, max_bytes: int = None, db_path: str = CACHE_DB_PATH):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # key -> (value, fetched_at, ttl, size)
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._refreshing = set()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "evictions": 0}
+        self._db = self._open_db(db_path) if db_path else None
+        _caches[name] = self
+
+    def _open_db(self, db_path):
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    ttl REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            # Columns added after the table was first shipped
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+            if "size" not in columns:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE cache_entries SET size = length(value)")
+            if "last_access" not in columns:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, last_access)")
+            self._disk_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?", (self.name,)
+            ).fetchone()[0]
+            return conn
+        except Exception as e:
+            # Read-only filesystems (e.g. serverless) just lose the persistent tier
+            print(f"Cache {self.name}: persistent tier disabled ({e})")
+            return None
+
+    def _remember(self, key, entry):
+        previous = self._memory.pop(key, None)
+        if previous:
+            self._memory_bytes -= previous[3]
+        self._memory[key] = entry
+        self._memory_bytes += entry[3]
+        while len(self._memory) > self.max_entries or (self.max_bytes and self._memory_bytes > self.max_bytes and len(self._memory) > 1):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted[3]
+
+    def _evict_disk(self):
+        # Drop least recently used rows until the namespace fits in max_bytes again
+        while self._disk_bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY last_access LIMIT 100", (self.name,)
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.name, key))
+                self._memory_bytes -= self._memory.pop(key, (None, 0, 0, 0))[3]
+                self._disk_bytes -= size
+                self._stats["evictions"] += 1
+                if self._disk_bytes <= self.max_bytes:
+                    break
+
+    def _lookup(self, key):
+        """Returns (value, age, ttl, tier) or None"""
+        tier = "memory"
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                self._memory.move_to_end(key)
+            elif self._db:
+                row = self._db.execute(
+                    "SELECT value, fetched_at, ttl FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.name, key)
+                ).fetchone()
+                if row:
+                    entry = (json.loads(row[0]), row[1], row[2], len(row[0]))
+                    self._remember(key, entry)
+                    tier = "disk"
+                    if self.max_bytes:
+                        # Memory hits don't touch the disk, so disk recency is only refreshed here
+                        self._db.execute(
+                            "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                            (time.time(), self.name, key)
+                        )
+        if not entry:
+            return None
+        value, fetched_at, ttl, _ = entry
+        return value, time.time() - fetched_at, ttl, tier
+
+    def get(self, key: str):
+        """Return the cached value if it is still fresh, else None"""
+        found = self._lookup(key)
+        if found and found[1] <= found[2]:
+            self._stats[f"{found[3]}_hits"] += 1
+            return found[0]
+        self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        fetched_at = time.time()
+        serialised = json.dumps(value)
+        with self._lock:
+            self._remember(key, (value, fetched_at, ttl, len(serialised)))
+            if self._db:
+                if self.max_bytes:
+                    previous = self._db.execute(
+                        "SELECT size FROM cache_entries WHERE namespace = ? AND key = ?", (self.name, key)
+                    ).fetchone()
+                    self._disk_bytes += len(serialised) - (previous[0] if previous else 0)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, fetched_at, ttl, size, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.name, key, serialised, fetched_at, ttl, len(serialised), fetched_at)
+                )
+                if self.max_bytes and self._disk_bytes > self.max_bytes:
+                    self._evict_disk()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._memory_bytes -= self._memory.pop(key, (None, 0, 0, 0))[3]
+            if self._db:
+                row = self._db.execute(
+                    "SELECT size FROM cache_entries WHERE namespace = ? AND key = ?", (self.name, key)
+                ).fetchone()
+                if row:
+                    self._disk_bytes -= row[0]
+                    self._db.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.name, key))
+
+    async def get_or_fetch(self, key: str, fetch, ttl: float = None):
+        """
+        Return the cached value for `key`, calling `fetch()` on a miss
+
+        Args:
+            key: Cache key
+            fetch: Async callable returning the value; exceptions propagate and nothing is cached
+            ttl: Optional TTL override for this entry
+
+        Returns:
+            The cached or freshly fetched value
+        """
+        found = self._lookup(key)
+        if found:
+            value, age, entry_ttl, tier = found
+            if age <= entry_ttl:
+                self._stats[f"{tier}_hits"] += 1
+                return value
+            if age <= entry_ttl + self.stale_ttl:
+                self._stats["stale_hits"] += 1
+                self._schedule_refresh(key, fetch, ttl)
+                return value
+
+        self._stats["misses"] += 1
+        # Coalesce concurrent misses for the same key into one fetch
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+        future = asyncio.ensure_future(self._fetch_and_store(key, fetch, ttl))
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _fetch_and_store(self, key, fetch, ttl):
+        try:
+            value = await fetch()
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        self.set(key, value, ttl)
+        return value
+
+    def _schedule_refresh(self, key, fetch, ttl):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._fetch_and_store(key, fetch, ttl)
+                self._stats["refreshes"] += 1
+            except Exception as e:
+                print(f"Cache {self.name}: background refresh of {key} failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.ensure_future(refresh())
+
+    def stats(self):
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["stale_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk_bytes if self._db else 0,
+            "persistent": self._db is not None
+        }
+
+
+def all_stats():
+    """Hit/miss counters for every cache created in this process"""
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    from .storage import UploadTooLarge
+except ImportError:
+    # Running as a standalone script
+    from storage import UploadTooLarge
+
+# Local record of every object already uploaded, keyed by content hash
+CONTENT_INDEX_PATH = os.getenv(
+    "CONTENT_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "content_index.sqlite3")
+)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_key(sha256: str, original_filename: str = None, prefix: str = "uploads") -> str:
+    """
+    Storage path for content with this hash, e.g. uploads/3f/3fa9...c1.pdf
+
+    The original extension is kept so the stored object still opens with the right viewer.
+    """
+    ext = os.path.splitext(original_filename or "")[1].lower()
+    return f"{prefix}/{sha256[:2]}/{sha256}{ext}"
+
+
+def copy_and_hash(source, dest_path: str, max_bytes: int = None):
+    """
+    Copy a file object to dest_path in chunks, hashing on the way; returns (sha256, size)
+
+    Raises UploadTooLarge (and removes the partial copy) once more than max_bytes have been read.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                out.close()
+                os.remove(dest_path)
+                raise UploadTooLarge(size)
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest(), size
+
+
+async def hash_upload(upload_file, max_bytes: int = None):
+    """
+    Hash an incoming UploadFile chunk by chunk, then rewind it; returns (sha256, size)
+
+    Raises UploadTooLarge once more than max_bytes have been read.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await upload_file.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise UploadTooLarge(size)
+        digest.update(chunk)
+    await upload_file.seek(0)
+    return digest.hexdigest(), size
+
+
+class ContentIndex:
+    """SQLite index of uploaded objects: sha256 -> storage path (and public URL)"""
+
+    def __init__(self, path: str = CONTENT_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS stored_objects (
+                    sha256 TEXT NOT NULL,
+                    storage_path TEXT NOT NULL,
+                    public_url TEXT NOT NULL,
+                    size INTEGER,
+                    content_type TEXT,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (sha256, storage_path)
+                )
+            """)
+        except Exception as e:
+            # Without the index every upload still dedupes on the content-addressed path in storage
+            print(f"Content index disabled ({e})")
+            self._db = None
+        self._stats = {"hits": 0, "misses": 0}
+
+    def lookup(self, sha256: str, storage_path: str) -> Optional[Dict]:
+        row = None
+        if self._db:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT public_url, size, content_type FROM stored_objects WHERE sha256 = ? AND storage_path = ?",
+                    (sha256, storage_path)
+                ).fetchone()
+        self._stats["hits" if row else "misses"] += 1
+        if not row:
+            return None
+        return {"public_url": row[0], "size": row[1], "content_type": row[2]}
+
+    def remember(self, sha256: str, storage_path: str, public_url: str, size: int = None, content_type: str = None):
+        if not self._db:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stored_objects (sha256, storage_path, public_url, size, content_type, stored_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, storage_path, public_url, size, content_type, time.time())
+            )
+
+    def stats(self):
+        count = 0
+        if self._db:
+            with self._lock:
+                count = self._db.execute("SELECT COUNT(*) FROM stored_objects").fetchone()[0]
+        return {**self._stats, "objects": count}
+
+
+content_index = ContentIndex()
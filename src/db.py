@@ -0,0 +1,34 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# The supabase-py client is synchronous. Every PostgREST / storage round trip is run on this
+# bounded pool so a slow query never blocks the event loop (and the other requests on it).
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=SUPABASE_MAX_WORKERS, thread_name_prefix="supabase")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking Supabase call on the database thread pool
+
+    Args:
+        fn: Callable doing the network round trip
+        *args, **kwargs: Passed to fn
+
+    Returns:
+        Whatever fn returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def execute(query):
+    """Execute a prepared supabase query builder (e.g. supabase.table(...).select(...)) off the event loop"""
+    return await run_blocking(query.execute)
+
+
+def shutdown():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,188 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    from .qr_decode import QR_DECODE_AVAILABLE, decode_image, is_license_url, pick_license_url
+except ImportError:
+    # Running as a standalone script
+    from qr_decode import QR_DECODE_AVAILABLE, decode_image, is_license_url, pick_license_url
+
+if QR_DECODE_AVAILABLE:
+    import cv2
+    import numpy as np
+
+try:
+    import fitz  # PyMuPDF
+    PDF_RASTER_AVAILABLE = True
+except ImportError:
+    fitz = None
+    PDF_RASTER_AVAILABLE = False
+
+PDF_RENDER_DPI = int(os.getenv("QR_PDF_RENDER_DPI", "200"))
+PDF_MAX_PAGES = int(os.getenv("QR_PDF_MAX_PAGES", "5"))
+
+# CPU-bound document work runs in separate processes so it neither blocks the event loop nor holds the GIL
+DOC_PREP_WORKERS = int(os.getenv("DOC_PREP_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages and photos are downscaled to this many px on the longest side before scanning
+DOC_PREP_MAX_SIDE = int(os.getenv("DOC_PREP_MAX_SIDE", "3000"))
+# What the Gemini fallback receives for an image or single-page PDF: one JPEG, at most this size
+DOC_PREP_MODEL_MAX_SIDE = int(os.getenv("DOC_PREP_MODEL_MAX_SIDE", "2000"))
+DOC_PREP_MODEL_JPEG_QUALITY = int(os.getenv("DOC_PREP_MODEL_JPEG_QUALITY", "85"))
+# Wall-clock budget for scanning one document
+DOC_PREP_TIMEOUT = float(os.getenv("DOC_PREP_TIMEOUT", "20"))
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=DOC_PREP_WORKERS)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _is_pdf(file_path: str) -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(4) == b"%PDF" or file_path.lower().endswith(".pdf")
+
+
+def _downscale(image, max_side: int):
+    longest = max(image.shape[:2])
+    if longest <= max_side:
+        return image
+    factor = max_side / longest
+    return cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+
+def _trim_margins(image):
+    # Crop the blank border scanners and phone photos of paper leave around the document
+    ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    if not cv2.countNonZero(ink):
+        return image
+    x, y, width, height = cv2.boundingRect(ink)
+    pad = max(image.shape[:2]) // 50
+    return image[max(0, y - pad):y + height + pad, max(0, x - pad):x + width + pad]
+
+
+def page_count(file_path: str) -> int:
+    if not _is_pdf(file_path):
+        return 1
+    if not PDF_RASTER_AVAILABLE:
+        return 0
+    with fitz.open(file_path) as document:
+        return min(len(document), PDF_MAX_PAGES)
+
+
+def load_page(file_path: str, index: int, max_side: int = DOC_PREP_MAX_SIDE):
+    """One page of a document as a trimmed, size-bounded greyscale image (None if unreadable)"""
+    if _is_pdf(file_path):
+        with fitz.open(file_path) as document:
+            page = document[index]
+            # Render at the scale that lands on max_side instead of rendering big and shrinking
+            dpi = min(PDF_RENDER_DPI, int(72 * max_side / max(page.rect.width, page.rect.height)))
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            image = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width)
+    else:
+        image = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            return None
+    return _trim_margins(_downscale(image, max_side))
+
+
+def scan_page(file_path: str, index: int) -> Optional[str]:
+    """Worker: decode the license URL from one page"""
+    image = load_page(file_path, index)
+    if image is None:
+        return None
+    return pick_license_url(decode_image(image))
+
+
+def render_for_model(file_path: str, output_path: str) -> Optional[str]:
+    """Worker: write a single-page document as a bounded JPEG for the model fallback"""
+    image = load_page(file_path, 0, max_side=DOC_PREP_MODEL_MAX_SIDE)
+    if image is None:
+        return None
+    cv2.imwrite(output_path, image, [cv2.IMWRITE_JPEG_QUALITY, DOC_PREP_MODEL_JPEG_QUALITY])
+    return output_path
+
+
+async def scan_document(file_path: str) -> Optional[str]:
+    """
+    Find the license URL in an uploaded image or PDF
+
+    Pages are rasterised, trimmed and downscaled in the process pool and scanned concurrently.
+    A license verification URL (see LICENSE_URL_HOSTS) is returned as soon as any page yields
+    one, and pages not yet started are cancelled. Otherwise every page is scanned and the URL of
+    the lowest-numbered page wins, so a document with several codes always gives the same answer.
+
+    Returns:
+        str: The decoded URL, or None if no page had a readable code (or decoding is unavailable)
+    """
+    if not QR_DECODE_AVAILABLE:
+        return None
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    try:
+        pages = await loop.run_in_executor(executor, page_count, file_path)
+    except Exception as e:
+        print(f"Could not open {file_path} for QR scanning: {e}")
+        return None
+
+    futures = {loop.run_in_executor(executor, scan_page, file_path, index): index for index in range(pages)}
+    other_urls = {}
+    pending = set(futures)
+    deadline = loop.time() + DOC_PREP_TIMEOUT
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"QR scan of {file_path} timed out after {DOC_PREP_TIMEOUT}s")
+                break
+            for future in done:
+                try:
+                    url = future.result()
+                except Exception as e:
+                    print(f"QR scan of page {futures[future]} in {file_path} failed: {e}")
+                    continue
+                if url and is_license_url(url):
+                    return url
+                if url:
+                    other_urls[futures[future]] = url
+    finally:
+        for future in pending:
+            future.cancel()
+    return other_urls[min(other_urls)] if other_urls else None
+
+
+async def prepare_for_model(file_path: str) -> str:
+    """
+    Path of the document to send to Gemini
+
+    Images and single-page PDFs become a bounded-size JPEG. A multi-page PDF is sent as is, so the
+    model sees every page and not just the first; falls back to the original file as well when
+    it can't be rendered locally.
+    """
+    if not QR_DECODE_AVAILABLE or (_is_pdf(file_path) and not PDF_RASTER_AVAILABLE):
+        return file_path
+    try:
+        if await asyncio.get_running_loop().run_in_executor(get_executor(), page_count, file_path) > 1:
+            return file_path
+    except Exception as e:
+        print(f"Could not open {file_path} for the model: {e}")
+        return file_path
+    output_path = f"{file_path}.model.jpg"
+    try:
+        rendered = await asyncio.get_running_loop().run_in_executor(get_executor(), render_for_model, file_path, output_path)
+        return rendered or file_path
+    except Exception as e:
+        print(f"Could not prepare {file_path} for the model: {e}")
+        return file_path
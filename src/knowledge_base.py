@@ -0,0 +1,193 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+try:
+    from .text_normalize import fold
+except ImportError:
+    # Running as a standalone script
+    from text_normalize import fold
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs")
+KNOWLEDGE_BASE_FILES = [
+    os.path.join(DOCS_DIR, "knowledge-base.md"),
+    os.path.join(DOCS_DIR, "conversation-flow.md"),
+]
+
+# Sections longer than this are split on paragraph (and, for big tables, line) boundaries
+KB_CHUNK_MAX_CHARS = int(os.getenv("KB_CHUNK_MAX_CHARS", "1500"))
+KB_TOP_K = int(os.getenv("KB_TOP_K", "4"))
+# How often (seconds) searches check the files' mtimes for a hot reload
+KB_RELOAD_CHECK_INTERVAL = float(os.getenv("KB_RELOAD_CHECK_INTERVAL", "5"))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "is", "are", "be", "it", "this", "that",
+    "with", "as", "at", "by", "from", "do", "does", "i", "my", "me", "we", "you", "your", "what", "how",
+    "can", "if", "not", "will", "should", "which", "when", "why", "there", "their", "have", "has"
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+
+
+def _terms(text: str) -> List[str]:
+    return [token for token in fold(text).split() if token not in STOPWORDS]
+
+
+def _split_long(body: str) -> List[str]:
+    if len(body) <= KB_CHUNK_MAX_CHARS:
+        return [body]
+    pieces, current = [], ""
+    # Paragraphs first; a single oversized paragraph (e.g. a glossary table) falls back to its lines
+    units = []
+    for paragraph in body.split("\n\n"):
+        units.extend(paragraph.split("\n") if len(paragraph) > KB_CHUNK_MAX_CHARS else [paragraph])
+    for unit in units:
+        if current and len(current) + len(unit) > KB_CHUNK_MAX_CHARS:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n{unit}" if current else unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_markdown(text: str, source: str) -> List[Dict]:
+    """
+    Split a markdown document into sections by heading
+
+    Each chunk carries its heading path below the document title (e.g. "Step 3: Document Upload &
+    Verification > Screen 3.1: Trade License Upload") so that a section retrieved on its own still says
+    where it belongs. Tables of contents are skipped.
+    """
+    chunks = []
+    path: List[str] = []
+    lines: List[str] = []
+
+    def flush():
+        body = "\n".join(lines).strip().strip("-").strip()
+        # path[0] is the document title, which every section shares
+        if body and len(path) > 1 and path[-1].lower() != "table of contents":
+            title = " > ".join(path[1:])
+            for piece in _split_long(body):
+                chunks.append({"source": source, "title": title, "text": piece})
+        lines.clear()
+
+    for line in text.splitlines():
+        heading = _HEADING.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            path[:] = path[:level - 1] + [heading.group(2).strip()]
+        else:
+            lines.append(line)
+    flush()
+    return chunks
+
+
+class KnowledgeBase:
+    """
+    In-memory BM25 index over the onboarding docs, chunked by heading.
+
+    Loaded once and reloaded when any of the files' mtimes change (checked at most every
+    KB_RELOAD_CHECK_INTERVAL seconds during searches).
+    """
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self._lock = threading.Lock()
+        self._mtimes = {}
+        self._last_check = 0.0
+        self.chunks: List[Dict] = []
+        self._term_freqs: List[Counter] = []
+        self._lengths: List[int] = []
+        self._doc_freqs: Counter = Counter()
+        self._avg_length = 0.0
+
+    def _current_mtimes(self):
+        return {path: os.path.getmtime(path) for path in self.paths if os.path.exists(path)}
+
+    def load(self):
+        mtimes = self._current_mtimes()
+        chunks = []
+        for path in mtimes:
+            try:
+                with open(path, 'r') as f:
+                    chunks.extend(chunk_markdown(f.read(), os.path.basename(path)))
+            except Exception as e:
+                print(f"Error reading knowledge base file {path}: {e}")
+
+        term_freqs = [Counter(_terms(f"{chunk['title']} {chunk['text']}")) for chunk in chunks]
+        doc_freqs = Counter()
+        for freqs in term_freqs:
+            doc_freqs.update(freqs.keys())
+        lengths = [sum(freqs.values()) for freqs in term_freqs]
+
+        with self._lock:
+            self.chunks = chunks
+            self._term_freqs = term_freqs
+            self._lengths = lengths
+            self._doc_freqs = doc_freqs
+            self._avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+            self._mtimes = mtimes
+            self._last_check = time.monotonic()
+        print(f"Knowledge base loaded: {len(chunks)} sections from {len(mtimes)} files")
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if self._mtimes and now - self._last_check < KB_RELOAD_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        if self._current_mtimes() != self._mtimes:
+            self.load()
+
+    def search(self, query: str, k: int = KB_TOP_K) -> List[Dict]:
+        """
+        Return the k sections most relevant to the query
+
+        Returns:
+            list: [{"source", "title", "text", "score"}] ordered by BM25 score; empty if nothing matches
+        """
+        self._reload_if_changed()
+        terms = set(_terms(query))
+        with self._lock:
+            chunks, term_freqs, lengths = self.chunks, self._term_freqs, self._lengths
+            doc_freqs, avg_length = self._doc_freqs, self._avg_length
+        if not terms or not chunks:
+            return []
+
+        total = len(chunks)
+        idf = {
+            term: math.log(1 + (total - doc_freqs[term] + 0.5) / (doc_freqs[term] + 0.5))
+            for term in terms if doc_freqs[term]
+        }
+        scored = []
+        for i, freqs in enumerate(term_freqs):
+            score = 0.0
+            for term, weight in idf.items():
+                tf = freqs.get(term)
+                if tf:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[i] / avg_length)
+                    score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [{**chunks[i], "score": round(score, 3)} for score, i in scored[:k]]
+
+    def stats(self):
+        return {"sections": len(self.chunks), "files": list(self._mtimes), "terms": len(self._doc_freqs)}
+
+
+knowledge_base = KnowledgeBase(KNOWLEDGE_BASE_FILES)
+
+
+def format_sections(sections: List[Dict]) -> str:
+    """Render retrieved sections for a prompt, each under its heading path"""
+    return "\n\n".join(f"### {section['title']} ({section['source']})\n{section['text']}" for section in sections)
@@ -1,5 +1,197 @@
-import requests
-from typing import Dict, Optional
+import asyncio
+import json
+import os
+import httpx
+from typing import AsyncIterator, Dict, List, Optional
+
+try:
+    from .cache import TieredCache
+    from .lei_index import get_index
+except ImportError:
+    # Running as a standalone script
+    from cache import TieredCache
+    from lei_index import get_index
+
+GLEIF_API_URL = os.getenv("GLEIF_API_URL", "https://api.gleif.org/api/v1")
+# The client below only talks to GLEIF, so its pool limits are effectively per-host limits
+GLEIF_MAX_CONNECTIONS = int(os.getenv("GLEIF_MAX_CONNECTIONS", "20"))
+GLEIF_MAX_KEEPALIVE = int(os.getenv("GLEIF_MAX_KEEPALIVE", "10"))
+
+GLEIF_HEADERS = {
+    "Accept": "application/vnd.api+json",
+    "User-Agent": "Zamp-KYB/1.0"
+}
+
+# Codes per multi-LEI filter query (GLEIF caps page[size] at 200) and concurrent batch queries
+GLEIF_BATCH_SIZE = min(int(os.getenv("GLEIF_BATCH_SIZE", "100")), 200)
+GLEIF_BATCH_CONCURRENCY = int(os.getenv("GLEIF_BATCH_CONCURRENCY", "4"))
+
+# LEI records change rarely: serve cached copies for a day, and stale ones for up to a week
+# while they are refreshed in the background
+LEI_CACHE_TTL = float(os.getenv("LEI_CACHE_TTL", str(24 * 3600)))
+LEI_CACHE_STALE_TTL = float(os.getenv("LEI_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+LEI_CACHE_MAX_ENTRIES = int(os.getenv("LEI_CACHE_MAX_ENTRIES", "5000"))
+
+lei_record_cache = TieredCache("gleif_record", ttl=LEI_CACHE_TTL, stale_ttl=LEI_CACHE_STALE_TTL, max_entries=LEI_CACHE_MAX_ENTRIES)
+lei_parent_cache = TieredCache("gleif_parent", ttl=LEI_CACHE_TTL, stale_ttl=LEI_CACHE_STALE_TTL, max_entries=LEI_CACHE_MAX_ENTRIES)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared GLEIF HTTP client (called once on app startup)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            headers=GLEIF_HEADERS,
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=GLEIF_MAX_CONNECTIONS,
+                max_keepalive_connections=GLEIF_MAX_KEEPALIVE,
+                keepalive_expiry=30
+            ),
+            timeout=httpx.Timeout(10.0)
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def get_http_client() -> httpx.AsyncClient:
+    # Lazily created when used outside the FastAPI app (scripts, tests)
+    return _http_client or await start_http_client()
+
+class GleifStatusError(Exception):
+    """Non-200 response from the GLEIF API"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"GLEIF API returned status {status_code}")
+        self.status_code = status_code
+
+async def _fetch_lei_record(lei_code: str) -> Dict:
+    client = await get_http_client()
+    response = await client.get(f"{GLEIF_API_URL}/lei-records/{lei_code}", timeout=10)
+    if response.status_code != 200:
+        raise GleifStatusError(response.status_code)
+    return response.json().get("data", {})
+
+async def _fetch_parent_name(relationships_url: str) -> str:
+    client = await get_http_client()
+    response = await client.get(relationships_url, timeout=5)
+    if response.status_code != 200:
+        raise GleifStatusError(response.status_code)
+    parent_entity = response.json().get("data", {}).get("attributes", {}).get("entity", {})
+    return parent_entity.get("legalName", {}).get("name", "Not Found")
+
+async def get_lei_record(lei_code: str) -> Dict:
+    """GLEIF `data` object for an LEI, served from cache when possible"""
+    return await lei_record_cache.get_or_fetch(lei_code.upper(), lambda: _fetch_lei_record(lei_code))
+
+async def get_parent_name(relationships_url: str) -> str:
+    """Legal name behind an ultimate-parent relationship URL, served from cache when possible"""
+    return await lei_parent_cache.get_or_fetch(relationships_url, lambda: _fetch_parent_name(relationships_url))
+
+def build_lei_data(lei_code: str, lei_record: Dict) -> Dict:
+    """Map a GLEIF `data` object onto our LEI response format (without the ultimate parent)"""
+    attributes = lei_record.get("attributes", {})
+    entity = attributes.get("entity", {})
+    legal_address = entity.get("legalAddress", {})
+    registration = attributes.get("registration", {})
+    
+    return {
+        "LEGAL NAME": entity.get("legalName", {}).get("name", "Not Found"),
+        "LEI CODE": lei_code,
+        "LEI STATUS": registration.get("status", "Unknown"),
+        "ENTITY CATEGORY": entity.get("category", "Not Found"),
+        "LEGAL ADDRESS": format_address(legal_address),
+        "COUNTRY": legal_address.get("country", "Not Found"),
+        "JURISDICTION": legal_address.get("country", "Not Found"),
+        "REGISTRATION AUTHORITY": registration.get("registrationAuthority", {}).get("name", "Not Found"),
+        "REGISTRATION NUMBER": registration.get("registrationNumber", "Not Found"),
+    }
+
+def build_lei_data_from_index(lei_code: str, record: Dict) -> Dict:
+    """Map a local golden-copy index record onto our LEI response format"""
+    legal_address = record["legal_address"]
+    chain = record["parent_chain"]
+    lei_data = {
+        "LEGAL NAME": record["legal_name"] or "Not Found",
+        "LEI CODE": lei_code,
+        "LEI STATUS": record["registration_status"] or "Unknown",
+        "ENTITY CATEGORY": record["category"] or "Not Found",
+        "LEGAL ADDRESS": format_address(legal_address),
+        "COUNTRY": legal_address.get("country", "Not Found"),
+        "JURISDICTION": legal_address.get("country", "Not Found"),
+        "REGISTRATION AUTHORITY": record["registration_authority"] or "Not Found",
+        "REGISTRATION NUMBER": record["registration_number"] or "Not Found",
+    }
+    if chain:
+        lei_data["ULTIMATE PARENT"] = chain[-1]["legal_name"] or "Not Found"
+        lei_data["PARENT CHAIN"] = [parent["legal_name"] or parent["lei"] for parent in chain]
+    else:
+        lei_data["ULTIMATE PARENT"] = "None (Self)"
+    return lei_data
+
+def lookup_lei_index(lei_code: str) -> Optional[Dict]:
+    """LEI details from the local golden-copy index, or None if there is no index or the LEI is missing"""
+    index = get_index()
+    if not index:
+        return None
+    try:
+        record = index.lookup(lei_code)
+    except Exception as e:
+        print(f"LEI index lookup failed: {e}")
+        return None
+    return build_lei_data_from_index(lei_code, record) if record else None
+
+def lookup_lei_index_many(lei_codes: List[str]) -> Dict[str, Dict]:
+    """lookup_lei_index for several codes, keyed by code (codes not in the index are left out)"""
+    results = {}
+    for code in lei_codes:
+        lei_data = lookup_lei_index(code)
+        if lei_data:
+            results[code] = lei_data
+    return results
+
+async def search_lei_by_name(name: str, limit: int = 10) -> Optional[List[Dict]]:
+    """
+    Fuzzy search of the local LEI index by legal name
+    
+    Args:
+        name: Company name (legal suffixes such as LLC, DMCC, FZE, FZCO are ignored)
+        limit: Maximum number of candidates
+        
+    Returns:
+        list: Candidates in the extract_lei_info_api format plus "MATCH SCORE", best first,
+              or None when no local index is available
+    """
+    index = get_index()
+    if not index:
+        return None
+    # The search and the record lookups all hit SQLite, so they run together off the event loop
+    return await asyncio.to_thread(_search_index_by_name, index, name, limit)
+
+def _search_index_by_name(index, name: str, limit: int) -> List[Dict]:
+    results = []
+    for lei, score in index.search_names(name, limit):
+        record = index.lookup(lei)
+        if record:
+            lei_data = build_lei_data_from_index(lei, record)
+            lei_data["MATCH SCORE"] = score
+            results.append(lei_data)
+    return results
+
+def parent_relationship_url(lei_record: Dict) -> Optional[str]:
+    return lei_record.get("relationships", {}).get("ultimate-parent", {}).get("links", {}).get("related")
 
 async def extract_lei_info_api(lei_code: str) -> Dict:
     """
@@ -11,59 +203,30 @@ async def extract_lei_info_api(lei_code: str) -> Dict:
     Returns:
         dict: Extracted company details
     """
+    # Walking the parent chain is a series of SQLite queries, so it runs off the event loop
+    indexed = await asyncio.to_thread(lookup_lei_index, lei_code) if get_index() else None
+    if indexed:
+        return indexed
+
     try:
-        # GLEIF API endpoint
-        url = f"https://api.gleif.org/api/v1/lei-records/{lei_code}"
-        
-        headers = {
-            "Accept": "application/vnd.api+json",
-            "User-Agent": "Zamp-KYB/1.0"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
+        try:
+            lei_record = await get_lei_record(lei_code)
+        except GleifStatusError as e:
             return {
-                "error": f"LEI not found or API error (status {response.status_code})",
+                "error": f"LEI not found or API error (status {e.status_code})",
                 "LEI CODE": lei_code,
                 "LEI STATUS": "Not Found"
             }
         
-        data = response.json()
-        
-        # Extract relevant fields from GLEIF response
-        lei_record = data.get("data", {})
-        attributes = lei_record.get("attributes", {})
-        entity = attributes.get("entity", {})
-        legal_address = entity.get("legalAddress", {})
-        headquarters_address = entity.get("headquartersAddress", {})
-        registration = attributes.get("registration", {})
-        
         # Build structured response matching the old format
-        lei_data = {
-            "LEGAL NAME": entity.get("legalName", {}).get("name", "Not Found"),
-            "LEI CODE": lei_code,
-            "LEI STATUS": registration.get("status", "Unknown"),
-            "ENTITY CATEGORY": entity.get("category", "Not Found"),
-            "LEGAL ADDRESS": format_address(legal_address),
-            "COUNTRY": legal_address.get("country", "Not Found"),
-            "JURISDICTION": legal_address.get("country", "Not Found"),
-            "REGISTRATION AUTHORITY": registration.get("registrationAuthority", {}).get("name", "Not Found"),
-            "REGISTRATION NUMBER": registration.get("registrationNumber", "Not Found"),
-        }
+        lei_data = build_lei_data(lei_code, lei_record)
         
         # Add ultimate parent if available
-        relationships_url = lei_record.get("relationships", {}).get("ultimate-parent", {}).get("links", {}).get("related")
+        relationships_url = parent_relationship_url(lei_record)
         if relationships_url:
             try:
-                parent_response = requests.get(relationships_url, headers=headers, timeout=5)
-                if parent_response.status_code == 200:
-                    parent_data = parent_response.json()
-                    parent_entity = parent_data.get("data", {}).get("attributes", {}).get("entity", {})
-                    lei_data["ULTIMATE PARENT"] = parent_entity.get("legalName", {}).get("name", "Not Found")
-                else:
-                    lei_data["ULTIMATE PARENT"] = "Not Found"
-            except:
+                lei_data["ULTIMATE PARENT"] = await get_parent_name(relationships_url)
+            except Exception:
                 lei_data["ULTIMATE PARENT"] = "Not Found"
         else:
             lei_data["ULTIMATE PARENT"] = "None (Self)"
@@ -71,7 +234,7 @@ async def extract_lei_info_api(lei_code: str) -> Dict:
         print(f"Successfully fetched LEI data for {lei_code}")
         return lei_data
         
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return {
             "error": "API request timed out",
             "LEI CODE": lei_code,
@@ -85,6 +248,113 @@ async def extract_lei_info_api(lei_code: str) -> Dict:
             "LEI STATUS": "Error"
         }
 
+async def _fetch_lei_records_bulk(lei_codes: List[str]) -> Dict[str, Dict]:
+    """Fetch many LEI records with a single multi-value filter query, keyed by upper-case LEI"""
+    client = await get_http_client()
+    response = await client.get(
+        f"{GLEIF_API_URL}/lei-records",
+        params={"filter[lei]": ",".join(lei_codes), "page[size]": len(lei_codes)},
+        timeout=15
+    )
+    if response.status_code != 200:
+        raise GleifStatusError(response.status_code)
+    return {record.get("id", "").upper(): record for record in response.json().get("data", [])}
+
+async def _extract_lei_chunk(lei_codes: List[str]) -> List[Dict]:
+    # Serve what we can from the local index and cache, and fetch the rest in one query.
+    # The index lookups for the whole chunk run in one worker thread
+    indexed = await asyncio.to_thread(lookup_lei_index_many, lei_codes) if get_index() else {}
+    records = {}
+    missing = []
+    for code in lei_codes:
+        if code in indexed:
+            continue
+        cached = lei_record_cache.get(code.upper())
+        if cached is not None:
+            records[code.upper()] = cached
+        else:
+            missing.append(code)
+
+    error = None
+    if missing:
+        try:
+            fetched = await _fetch_lei_records_bulk(missing)
+        except httpx.TimeoutException:
+            fetched, error = {}, ("API request timed out", "API Timeout")
+        except Exception as e:
+            print(f"Error fetching LEI batch: {e}")
+            fetched, error = {}, (str(e), "Error")
+        for code, record in fetched.items():
+            lei_record_cache.set(code, record)
+        records.update(fetched)
+
+    # Resolve each distinct parent URL once, concurrently for the whole chunk; the parent cache
+    # also coalesces lookups that overlap with other chunks and requests
+    parent_urls = list({url for url in (parent_relationship_url(r) for r in records.values()) if url})
+    parent_names = dict(zip(
+        parent_urls,
+        await asyncio.gather(*[get_parent_name(url) for url in parent_urls], return_exceptions=True)
+    ))
+
+    results = []
+    for code in lei_codes:
+        if code in indexed:
+            results.append(indexed[code])
+            continue
+        record = records.get(code.upper())
+        if record is None:
+            if error:
+                results.append({"error": error[0], "LEI CODE": code, "LEI STATUS": error[1]})
+            else:
+                results.append({"error": "LEI not found", "LEI CODE": code, "LEI STATUS": "Not Found"})
+            continue
+        results.append(_with_parent(code, record, parent_names))
+    return results
+
+def _with_parent(lei_code: str, lei_record: Dict, parent_names: Dict) -> Dict:
+    lei_data = build_lei_data(lei_code, lei_record)
+    url = parent_relationship_url(lei_record)
+    if not url:
+        lei_data["ULTIMATE PARENT"] = "None (Self)"
+    else:
+        name = parent_names.get(url)
+        lei_data["ULTIMATE PARENT"] = name if isinstance(name, str) else "Not Found"
+    return lei_data
+
+async def extract_lei_info_batch(lei_codes: List[str]) -> AsyncIterator[List[Dict]]:
+    """
+    Extract LEI details for many codes using multi-LEI GLEIF queries
+    
+    Args:
+        lei_codes: LEI codes (duplicates are looked up once)
+        
+    Yields:
+        list: Results for one chunk of codes, in the same format as extract_lei_info_api,
+              as soon as that chunk completes
+    """
+    unique_codes = list(dict.fromkeys(code.strip() for code in lei_codes if code and code.strip()))
+    chunks = [unique_codes[i:i + GLEIF_BATCH_SIZE] for i in range(0, len(unique_codes), GLEIF_BATCH_SIZE)]
+    semaphore = asyncio.Semaphore(GLEIF_BATCH_CONCURRENCY)
+
+    async def run_chunk(chunk):
+        async with semaphore:
+            return await _extract_lei_chunk(chunk)
+
+    tasks = [asyncio.ensure_future(run_chunk(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away (or the caller stopped iterating): don't keep querying GLEIF
+        for task in tasks:
+            task.cancel()
+
+async def extract_lei_info_batch_ndjson(lei_codes: List[str]) -> AsyncIterator[str]:
+    """extract_lei_info_batch as NDJSON, one record per line, each chunk sent as soon as it completes"""
+    async for chunk in extract_lei_info_batch(lei_codes):
+        for lei_data in chunk:
+            yield json.dumps(lei_data) + "\n"
+
 def format_address(address_dict: Dict) -> str:
     """Format GLEIF address dict into a single string"""
     if not address_dict:
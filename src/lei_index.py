@@ -0,0 +1,451 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .text_normalize import normalize_legal_name, trigrams
+except ImportError:
+    # Running as a standalone script
+    from text_normalize import normalize_legal_name, trigrams
+
+# Local copy of the GLEIF golden copy (level 1 records + level 2 relationships)
+LEI_INDEX_PATH = os.getenv(
+    "LEI_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "lei_index.sqlite3")
+)
+
+IMPORT_BATCH_SIZE = 10000
+MAX_PARENT_DEPTH = 25
+
+# Name search: candidates are generated from the rarest query trigrams only (short posting lists),
+# then re-ranked by trigram similarity on the full normalised name
+SEARCH_CANDIDATE_GRAMS = 8
+SEARCH_MIN_CANDIDATE_GRAMS = 3
+SEARCH_MAX_POSTINGS = 200000
+SEARCH_MAX_CANDIDATES = 1000
+SEARCH_MIN_SCORE = 0.3
+
+DIRECT_PARENT = "IS_DIRECTLY_CONSOLIDATED_BY"
+ULTIMATE_PARENT = "IS_ULTIMATELY_CONSOLIDATED_BY"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lei_entities (
+    lei TEXT PRIMARY KEY,
+    legal_name TEXT NOT NULL,
+    legal_address TEXT NOT NULL,
+    jurisdiction TEXT,
+    category TEXT,
+    registration_status TEXT,
+    registration_authority TEXT,
+    registration_number TEXT,
+    last_update TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS lei_relationships (
+    child_lei TEXT NOT NULL,
+    relationship_type TEXT NOT NULL,
+    parent_lei TEXT NOT NULL,
+    status TEXT,
+    PRIMARY KEY (child_lei, relationship_type)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_lei_relationships_parent ON lei_relationships (parent_lei);
+
+CREATE TABLE IF NOT EXISTS lei_names (
+    lei TEXT PRIMARY KEY,
+    normalized_name TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS lei_name_trigrams (
+    trigram TEXT NOT NULL,
+    lei TEXT NOT NULL,
+    PRIMARY KEY (trigram, lei)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_lei_name_trigrams_lei ON lei_name_trigrams (lei);
+
+CREATE TABLE IF NOT EXISTS lei_trigram_df (
+    trigram TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS lei_index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _open_csv(path: str) -> Iterator[Dict]:
+    """Iterate the rows of a golden-copy CSV, either plain or inside the published .zip"""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next(name for name in archive.namelist() if name.endswith(".csv"))
+            with archive.open(member) as raw:
+                yield from csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8"))
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+def _level1_row(row: Dict) -> tuple:
+    # Address stored with the same keys the GLEIF API uses, so lei_api.format_address works on both
+    prefix = "Entity.LegalAddress."
+    address = {
+        "addressLine1": row.get(prefix + "FirstAddressLine", ""),
+        "addressLine2": row.get(prefix + "AdditionalAddressLine.1", ""),
+        "addressLine3": row.get(prefix + "AdditionalAddressLine.2", ""),
+        "addressLine4": row.get(prefix + "AdditionalAddressLine.3", ""),
+        "city": row.get(prefix + "City", ""),
+        "region": row.get(prefix + "Region", ""),
+        "postalCode": row.get(prefix + "PostalCode", ""),
+        "country": row.get(prefix + "Country", "")
+    }
+    return (
+        row["LEI"].strip().upper(),
+        row.get("Entity.LegalName", ""),
+        json.dumps({k: v for k, v in address.items() if v}),
+        row.get("Entity.LegalJurisdiction", ""),
+        row.get("Entity.EntityCategory", ""),
+        row.get("Registration.RegistrationStatus", ""),
+        row.get("Entity.RegistrationAuthority.RegistrationAuthorityID", ""),
+        row.get("Entity.RegistrationAuthority.RegistrationAuthorityEntityID", ""),
+        row.get("Registration.LastUpdateDate", "")
+    )
+
+
+def _level2_row(row: Dict) -> tuple:
+    return (
+        row["Relationship.StartNode.NodeID"].strip().upper(),
+        row["Relationship.RelationshipType"].strip(),
+        row["Relationship.EndNode.NodeID"].strip().upper(),
+        row.get("Relationship.RelationshipStatus", "")
+    )
+
+
+class LeiIndex:
+    """SQLite index over the GLEIF golden copy with primary-key lookups for LEIs and parents"""
+
+    def __init__(self, path: str = LEI_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    # --- Lookups ---
+
+    def _entity(self, lei: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute("SELECT * FROM lei_entities WHERE lei = ?", (lei,)).fetchone()
+
+    def _parent(self, lei: str, relationship_type: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT parent_lei FROM lei_relationships WHERE child_lei = ? AND relationship_type = ? AND COALESCE(status, '') != 'INACTIVE'",
+            (lei, relationship_type)
+        ).fetchone()
+        return row[0] if row else None
+
+    def parent_chain(self, lei: str) -> List[str]:
+        """LEIs of the direct parent, its parent and so on up to the top of the group"""
+        chain = []
+        current = lei.upper()
+        with self._lock:
+            while len(chain) < MAX_PARENT_DEPTH:
+                parent = self._parent(current, DIRECT_PARENT)
+                if not parent or parent in chain or parent == lei.upper():
+                    break
+                chain.append(parent)
+                current = parent
+            # Some entities only report their ultimate parent
+            ultimate = self._parent(lei.upper(), ULTIMATE_PARENT)
+        if ultimate and (not chain or chain[-1] != ultimate):
+            chain.append(ultimate)
+        return chain
+
+    def lookup(self, lei: str) -> Optional[Dict]:
+        """
+        Resolve an LEI from the local index
+
+        Args:
+            lei: The 20-character LEI code
+
+        Returns:
+            dict: Entity fields plus the parent chain, or None if the LEI is not indexed
+        """
+        lei = lei.strip().upper()
+        with self._lock:
+            row = self._entity(lei)
+        if not row:
+            return None
+        record = dict(row)
+        record["legal_address"] = json.loads(record["legal_address"])
+        chain = []
+        for parent_lei in self.parent_chain(lei):
+            with self._lock:
+                parent = self._entity(parent_lei)
+            chain.append({"lei": parent_lei, "legal_name": parent["legal_name"] if parent else None})
+        record["parent_chain"] = chain
+        return record
+
+    def search_names(self, name: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Fuzzy legal-name search
+
+        Args:
+            name: Company name as typed by a reviewer (legal suffixes are ignored)
+            limit: Maximum number of candidates to return
+
+        Returns:
+            list: (lei, score) pairs, best first, with score in [0, 1]
+        """
+        query = normalize_legal_name(name)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            grams = list(query_grams)
+            df = dict(self._conn.execute(
+                f"SELECT trigram, df FROM lei_trigram_df WHERE trigram IN ({','.join('?' * len(grams))})", grams
+            ).fetchall())
+            # Rarest trigrams first, stopping once the posting lists to scan get too long
+            rare = []
+            postings = 0
+            for gram in sorted(df, key=df.get):
+                if len(rare) >= SEARCH_CANDIDATE_GRAMS:
+                    break
+                if len(rare) >= SEARCH_MIN_CANDIDATE_GRAMS and postings + df[gram] > SEARCH_MAX_POSTINGS:
+                    break
+                rare.append(gram)
+                postings += df[gram]
+            if not rare:
+                return []
+            candidates = [row[0] for row in self._conn.execute(
+                f"""SELECT lei FROM lei_name_trigrams WHERE trigram IN ({','.join('?' * len(rare))})
+                    GROUP BY lei ORDER BY COUNT(*) DESC LIMIT ?""",
+                rare + [SEARCH_MAX_CANDIDATES]
+            )]
+            if not candidates:
+                return []
+            names = self._conn.execute(
+                f"SELECT lei, normalized_name FROM lei_names WHERE lei IN ({','.join('?' * len(candidates))})", candidates
+            ).fetchall()
+
+        scored = []
+        for lei, normalized in names:
+            if normalized == query:
+                score = 1.0
+            else:
+                candidate_grams = trigrams(normalized)
+                # Dice coefficient over trigram sets
+                score = 2 * len(query_grams & candidate_grams) / (len(query_grams) + len(candidate_grams))
+            if score >= SEARCH_MIN_SCORE:
+                scored.append((lei, round(score, 4)))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM lei_entities").fetchone()[0]
+
+    def meta(self) -> Dict:
+        with self._lock:
+            return {row[0]: row[1] for row in self._conn.execute("SELECT key, value FROM lei_index_meta")}
+
+    # --- Imports ---
+
+    def _bulk(self, sql: str, rows: Iterator[tuple]) -> int:
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                self._conn.executemany(sql, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self._conn.executemany(sql, batch)
+            total += len(batch)
+        return total
+
+    def import_files(self, level1_path: str = None, level2_path: str = None, delta: bool = False) -> Dict:
+        """
+        Load golden-copy (or delta) files into the index
+
+        Args:
+            level1_path: LEI2 CSV (or .zip) with level 1 records
+            level2_path: RR CSV (or .zip) with level 2 relationships
+            delta: Upsert into the existing index instead of replacing it
+
+        Returns:
+            dict: Number of rows loaded per level
+        """
+        started = time.time()
+        loaded = {}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("BEGIN")
+            try:
+                if level1_path:
+                    if not delta:
+                        self._conn.execute("DELETE FROM lei_entities")
+                    upserted = [] if delta else None
+
+                    def level1_rows():
+                        for row in _open_csv(level1_path):
+                            if row.get("LEI"):
+                                entity = _level1_row(row)
+                                if upserted is not None:
+                                    upserted.append(entity[0])
+                                yield entity
+
+                    loaded["level1"] = self._bulk(
+                        "INSERT OR REPLACE INTO lei_entities VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        level1_rows()
+                    )
+                    self._index_names(upserted)
+                if level2_path:
+                    if not delta:
+                        self._conn.execute("DELETE FROM lei_relationships")
+                    loaded["level2"] = self._bulk(
+                        "INSERT OR REPLACE INTO lei_relationships VALUES (?, ?, ?, ?)",
+                        (_level2_row(row) for row in _open_csv(level2_path) if row.get("Relationship.StartNode.NodeID"))
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO lei_index_meta VALUES (?, ?)",
+                    ("last_delta" if delta else "last_full_import", time.strftime("%Y-%m-%dT%H:%M:%S"))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+        if not delta:
+            self._conn.execute("ANALYZE")
+        loaded["seconds"] = round(time.time() - started, 1)
+        return loaded
+
+    def _index_names(self, leis: Optional[List[str]] = None):
+        """
+        (Re)build the name search postings, for every entity or only for the given LEIs.
+        Caller holds the lock and an open transaction.
+        """
+        touched = set()
+        if leis is None:
+            for table in ("lei_names", "lei_name_trigrams", "lei_trigram_df"):
+                self._conn.execute(f"DELETE FROM {table}")
+            entities = self._conn.execute("SELECT lei, legal_name FROM lei_entities")
+        else:
+            for chunk in _chunks(leis, 500):
+                placeholders = ",".join("?" * len(chunk))
+                touched.update(row[0] for row in self._conn.execute(
+                    f"SELECT trigram FROM lei_name_trigrams WHERE lei IN ({placeholders})", chunk
+                ))
+                self._conn.execute(f"DELETE FROM lei_name_trigrams WHERE lei IN ({placeholders})", chunk)
+                self._conn.execute(f"DELETE FROM lei_names WHERE lei IN ({placeholders})", chunk)
+            entities = (
+                row for chunk in _chunks(leis, 500)
+                for row in self._conn.execute(
+                    f"SELECT lei, legal_name FROM lei_entities WHERE lei IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            )
+
+        names = []
+        postings = []
+        for lei, legal_name in entities:
+            normalized = normalize_legal_name(legal_name)
+            names.append((lei, normalized))
+            for gram in trigrams(normalized):
+                postings.append((gram, lei))
+                if leis is not None:
+                    touched.add(gram)
+            if len(postings) >= IMPORT_BATCH_SIZE:
+                self._conn.executemany("INSERT OR REPLACE INTO lei_names VALUES (?, ?)", names)
+                self._conn.executemany("INSERT OR IGNORE INTO lei_name_trigrams VALUES (?, ?)", postings)
+                names, postings = [], []
+        self._conn.executemany("INSERT OR REPLACE INTO lei_names VALUES (?, ?)", names)
+        self._conn.executemany("INSERT OR IGNORE INTO lei_name_trigrams VALUES (?, ?)", postings)
+
+        # Document frequencies drive candidate selection in search_names
+        if leis is None:
+            self._conn.execute(
+                "INSERT INTO lei_trigram_df SELECT trigram, COUNT(*) FROM lei_name_trigrams GROUP BY trigram"
+            )
+        else:
+            for chunk in _chunks(list(touched), 500):
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM lei_trigram_df WHERE trigram IN ({placeholders})", chunk)
+                self._conn.execute(
+                    f"""INSERT INTO lei_trigram_df SELECT trigram, COUNT(*) FROM lei_name_trigrams
+                        WHERE trigram IN ({placeholders}) GROUP BY trigram""",
+                    chunk
+                )
+
+    def reindex_names(self):
+        """Rebuild the name search index from the entities already imported"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._index_names()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+_index: Optional[LeiIndex] = None
+
+
+def get_index() -> Optional[LeiIndex]:
+    """The shared index, or None when no golden copy has been imported on this node"""
+    global _index
+    if _index is None and os.path.exists(LEI_INDEX_PATH):
+        try:
+            _index = LeiIndex(LEI_INDEX_PATH)
+        except Exception as e:
+            print(f"Failed to open LEI index: {e}")
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the GLEIF golden copy into the local LEI index")
+    parser.add_argument("command", choices=["import", "delta", "reindex-names", "info"], help="import = full rebuild, delta = upsert a delta file")
+    parser.add_argument("--level1", help="LEI2 (level 1) CSV or .zip")
+    parser.add_argument("--level2", help="RR (level 2 relationship) CSV or .zip")
+    parser.add_argument("--index", default=LEI_INDEX_PATH, help="Index path")
+    args = parser.parse_args()
+
+    index = LeiIndex(args.index)
+    if args.command == "info":
+        print(json.dumps({"entities": index.count(), **index.meta()}, indent=2))
+        return
+    if args.command == "reindex-names":
+        index.reindex_names()
+        print(json.dumps({"entities": index.count()}, indent=2))
+        return
+    if not args.level1 and not args.level2:
+        parser.error("pass --level1 and/or --level2")
+    result = index.import_files(args.level1, args.level2, delta=args.command == "delta")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+import os
+
+try:
+    from .cache import TieredCache
+except ImportError:
+    # Running as a standalone script
+    from cache import TieredCache
+
+DAY = 24 * 60 * 60
+
+# Total serialised size of cached responses per tier before least recently used entries are evicted
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# How long a response stays valid, per calling endpoint. Document and matching verdicts don't
+# change for the same input; help answers follow the knowledge base, so they expire sooner.
+LLM_CACHE_TTLS = {
+    "extract_qr_url": float(os.getenv("LLM_CACHE_TTL_QR", str(30 * DAY))),
+    "match_addresses": float(os.getenv("LLM_CACHE_TTL_MATCH", str(7 * DAY))),
+    "match_names": float(os.getenv("LLM_CACHE_TTL_MATCH", str(7 * DAY))),
+    "match_names_batch": float(os.getenv("LLM_CACHE_TTL_MATCH", str(7 * DAY))),
+    "chat_help": float(os.getenv("LLM_CACHE_TTL_CHAT", str(60 * 60))),
+}
+
+llm_response_cache = TieredCache(
+    "llm_responses", ttl=DAY, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES
+)
+
+_endpoint_stats = {}
+
+
+def content_key(model_name: str, prompt: str, *inputs: bytes) -> str:
+    """SHA-256 over the model name, prompt and any input bytes (length-prefixed so parts can't run together)"""
+    digest = hashlib.sha256()
+    for part in (model_name.encode(), prompt.encode(), *inputs):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def parse_json_response(text: str):
+    """Parse a Gemini reply that should be JSON, tolerating ```json fences"""
+    return json.loads(text.replace('```json', '').replace('```', '').strip())
+
+
+def _is_verdict(value) -> bool:
+    return isinstance(value, dict) and isinstance(value.get("match"), bool)
+
+
+def parse_verdict(text: str) -> dict:
+    """A {"match": bool, ...} reply; raises ValueError for any other shape, so it is never cached"""
+    value = parse_json_response(text)
+    if not _is_verdict(value):
+        raise ValueError(f"Expected a {{\"match\": bool}} object, got: {text[:200]!r}")
+    return value
+
+
+def verdict_list_parser(count: int):
+    """Parser for a JSON array of exactly `count` {"match": bool, ...} verdicts (ValueError otherwise)"""
+    def parse(text: str) -> list:
+        value = parse_json_response(text)
+        if not isinstance(value, list) or len(value) != count or not all(_is_verdict(item) for item in value):
+            raise ValueError(f"Expected a list of {count} {{\"match\": bool}} objects, got: {text[:200]!r}")
+        return value
+    return parse
+
+
+def parse_json_object(text: str) -> dict:
+    """A JSON object reply; raises ValueError for any other shape"""
+    value = parse_json_response(text)
+    if not isinstance(value, dict):
+        raise ValueError(f"Expected a JSON object, got: {text[:200]!r}")
+    return value
+
+
+async def cached_generate(endpoint: str, model_name: str, prompt: str, generate, inputs=(), parse=parse_json_response):
+    """
+    Return the parsed model response for this exact model/prompt/input, calling Gemini only on a miss
+
+    Args:
+        endpoint: Calling endpoint; selects the TTL and the bucket in endpoint_stats()
+        model_name: Gemini model the prompt is sent to
+        prompt: Full prompt text
+        generate: Blocking callable returning the raw response text; run in a worker thread on a miss
+        inputs: Extra bytes that go to the model alongside the prompt (e.g. an uploaded document)
+        parse: Turns the raw text into the value to cache; if it raises, nothing is cached
+
+    Returns:
+        The parsed (possibly cached) response
+    """
+    key = content_key(model_name, prompt, *inputs)
+    stats = _endpoint_stats.setdefault(endpoint, {"hits": 0, "misses": 0})
+    called = False
+
+    async def fetch():
+        nonlocal called
+        called = True
+        text = await asyncio.to_thread(generate)
+        return parse(text)
+
+    value = await llm_response_cache.get_or_fetch(key, fetch, ttl=LLM_CACHE_TTLS.get(endpoint))
+    stats["misses" if called else "hits"] += 1
+    return value
+
+
+def get_cached(endpoint: str, model_name: str, prompt: str, inputs=()):
+    """Cached response for a streamed call, or None (streams can't go through get_or_fetch)"""
+    value = llm_response_cache.get(content_key(model_name, prompt, *inputs))
+    stats = _endpoint_stats.setdefault(endpoint, {"hits": 0, "misses": 0})
+    stats["misses" if value is None else "hits"] += 1
+    return value
+
+
+def store_response(endpoint: str, model_name: str, prompt: str, value, inputs=()):
+    """Cache a response assembled from a completed stream"""
+    llm_response_cache.set(content_key(model_name, prompt, *inputs), value, ttl=LLM_CACHE_TTLS.get(endpoint))
+
+
+def endpoint_stats():
+    """Hit/miss counters per calling endpoint"""
+    return {
+        endpoint: {**counts, "hit_rate": round(counts["hits"] / (counts["hits"] + counts["misses"]), 4)}
+        for endpoint, counts in _endpoint_stats.items()
+        if counts["hits"] + counts["misses"]
+    }
@@ -0,0 +1,74 @@
+import json
+
+try:
+    from .llm_cache import get_cached, store_response
+except ImportError:
+    # Running as a standalone script
+    from llm_cache import get_cached, store_response
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def close_stream(stream):
+    """
+    End a model response stream that won't be read to the end
+
+    Async generators (and the stub) are closed with aclose(). google-generativeai's async
+    response keeps the streaming RPC in `_iterator`, whose cancel() ends the call on the server.
+    """
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        await aclose()
+        return
+    cancel = getattr(getattr(stream, "_iterator", None), "cancel", None)
+    if cancel is not None:
+        cancel()
+
+
+async def stream_events(endpoint: str, model_name: str, prompt: str, start_stream, is_disconnected):
+    """
+    Server-Sent Events for a streamed model answer, replayed from the LLM cache when possible
+
+    Args:
+        endpoint: Calling endpoint, for the cache TTL and stats
+        model_name: Model the prompt is sent to (part of the cache key)
+        prompt: Full prompt text
+        start_stream: Async callable returning the model's async chunk stream
+        is_disconnected: Async callable, True once the client has gone away
+
+    Emits `data: {"text": ...}` per chunk, then `event: done` (or `event: error`). Only a stream
+    read to the end is cached; one abandoned by the client is closed and discarded.
+    """
+    cached = get_cached(endpoint, model_name, prompt)
+    if cached is not None:
+        yield sse_event({"text": cached})
+        yield sse_event({"cached": True}, event="done")
+        return
+
+    parts = []
+    stream = None
+    finished = False
+    try:
+        stream = await start_stream()
+        async for chunk in stream:
+            if await is_disconnected():
+                print(f"{endpoint} client disconnected, closing the model stream")
+                return
+            parts.append(chunk.text)
+            yield sse_event({"text": chunk.text})
+        finished = True
+    except Exception as e:
+        print(f"Error streaming {endpoint}: {e}")
+        yield sse_event({"detail": str(e)}, event="error")
+        return
+    finally:
+        # Also reached when the server cancels the response task because the connection dropped
+        # mid-write, or closes this generator early
+        if stream is not None and not finished:
+            await close_stream(stream)
+
+    store_response(endpoint, model_name, prompt, "".join(parts))
+    yield sse_event({"cached": False}, event="done")
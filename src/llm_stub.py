@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+# Delay between streamed chunks, so streaming and client-disconnect handling can be exercised locally
+STUB_CHUNK_DELAY = float(os.getenv("LLM_STUB_CHUNK_DELAY", "0.05"))
+
+
+class StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubStream:
+    def __init__(self, words):
+        self._words = words
+        self.chunks_sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or self.chunks_sent >= len(self._words):
+            raise StopAsyncIteration
+        await asyncio.sleep(STUB_CHUNK_DELAY)
+        word = self._words[self.chunks_sent]
+        self.chunks_sent += 1
+        return StubChunk(word)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StubModel:
+    """
+    Stand-in for genai.GenerativeModel that needs no API key or network.
+
+    Answers deterministically from the prompt's last line (the query), so tests can assert on the output.
+    Only the subset of the API used by the help chat is implemented.
+    """
+
+    def __init__(self, model_name: str = "stub"):
+        self.model_name = model_name
+
+    def _answer(self, prompt: str) -> str:
+        lines = [line.strip() for line in str(prompt).strip().splitlines() if line.strip()]
+        query = lines[-1] if lines else ""
+        return f"Stub answer ({len(str(prompt))} prompt chars) to: {query}"
+
+    def generate_content(self, prompt, stream: bool = False):
+        return StubChunk(self._answer(prompt))
+
+    async def generate_content_async(self, prompt, stream: bool = False):
+        answer = self._answer(prompt)
+        if not stream:
+            return StubChunk(answer)
+        words = answer.split(" ")
+        return StubStream([word if i == 0 else f" {word}" for i, word in enumerate(words)])
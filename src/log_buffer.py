@@ -0,0 +1,175 @@
+import asyncio
+import os
+from typing import Dict, List
+
+# /zamp/log calls for a process arriving within this many seconds are written together, and
+# repeated updates to the same step in that window are merged into one (0 disables buffering)
+ZAMP_LOG_COALESCE_WINDOW = float(os.getenv("ZAMP_LOG_COALESCE_WINDOW", "0.05"))
+# A process's buffer is written early once it holds this many entries
+ZAMP_LOG_COALESCE_MAX_ENTRIES = int(os.getenv("ZAMP_LOG_COALESCE_MAX_ENTRIES", "100"))
+
+
+def merge_entries(earlier: Dict, later: Dict) -> Dict:
+    """
+    One entry with the effect of applying `earlier` then `later` to the same step
+
+    The logs merge key by key like the database upsert does. Artifacts of the earlier log are
+    kept under "artifacts" so they still reach the sidebar if the later log replaces the list
+    (the sidebar ignores artifact ids it already has).
+    """
+    merged_log = {**earlier["log"], **later["log"]}
+    artifacts = list(earlier.get("artifacts") or []) + list(earlier["log"].get("artifacts") or []) + list(later.get("artifacts") or [])
+
+    key_details = _as_list(earlier.get("keyDetails")) + _as_list(later.get("keyDetails"))
+    metadata = {**(earlier.get("metadata") or {}), **(later.get("metadata") or {})}
+    return {
+        "stepId": later.get("stepId"),
+        "log": merged_log,
+        "keyDetails": key_details or None,
+        "metadata": metadata or None,
+        "artifacts": artifacts or None,
+    }
+
+
+def coalesce(entries: List[Dict]) -> List[Dict]:
+    """Merge entries for the same step into the first one for it, keeping the order otherwise"""
+    result: List[Dict] = []
+    steps: Dict[str, int] = {}
+    for entry in entries:
+        step_id = entry.get("stepId")
+        if step_id and step_id in steps:
+            result[steps[step_id]] = merge_entries(result[steps[step_id]], entry)
+            continue
+        if step_id:
+            steps[step_id] = len(result)
+        result.append(entry)
+    return result
+
+
+def _as_list(value) -> List:
+    if not value:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+class LogCoalescer:
+    """
+    Buffers log entries per process and writes each buffer with one `flush(process_id, entries)`
+    call, an async callable returning False if the process doesn't exist.
+
+    Entries are {"stepId", "log", "keyDetails", "metadata"} dicts, applied in submission order;
+    an entry for a step that is already buffered is merged into it (see merge_entries).
+    Writes for a process, buffered or direct (see write), run one at a time in the order they
+    were started, so a later update of a step can never be overtaken by an earlier one.
+    """
+
+    def __init__(self, flush, window: float = ZAMP_LOG_COALESCE_WINDOW, max_entries: int = ZAMP_LOG_COALESCE_MAX_ENTRIES):
+        self.flush = flush
+        self.window = window
+        self.max_entries = max_entries
+        self._pending: Dict[str, Dict] = {}
+        # Last write started for each process; the next one waits for it
+        self._tails: Dict[str, asyncio.Task] = {}
+        self._stats = {"submitted": 0, "merged": 0, "flushes": 0, "written": 0}
+
+    async def submit(self, process_id: str, entry: Dict) -> bool:
+        """Buffer an entry and wait until it is written; returns False if the process doesn't exist"""
+        self._stats["submitted"] += 1
+        if self.window <= 0:
+            return await asyncio.shield(self._enqueue(process_id, [entry]))
+
+        buffer = self._pending.get(process_id)
+        if buffer is None:
+            buffer = {"entries": [], "steps": {}, "future": asyncio.get_running_loop().create_future()}
+            self._pending[process_id] = buffer
+            buffer["task"] = asyncio.create_task(self._flush_later(process_id, buffer))
+
+        step_id = entry.get("stepId")
+        if step_id and step_id in buffer["steps"]:
+            index = buffer["steps"][step_id]
+            buffer["entries"][index] = merge_entries(buffer["entries"][index], entry)
+            self._stats["merged"] += 1
+        else:
+            if step_id:
+                buffer["steps"][step_id] = len(buffer["entries"])
+            buffer["entries"].append(entry)
+
+        future = buffer["future"]
+        if len(buffer["entries"]) >= self.max_entries:
+            # Later entries start a new buffer
+            self._flush_now(process_id, buffer)
+        # Shielded so a client disconnecting doesn't cancel the write shared with other callers
+        return await asyncio.shield(future)
+
+    async def write(self, process_id: str, entries: List[Dict]) -> bool:
+        """
+        Write entries now, without buffering, but after everything already submitted for the
+        process (its open buffer is flushed first); returns False if the process doesn't exist
+        """
+        buffer = self._pending.get(process_id)
+        if buffer is not None:
+            self._flush_now(process_id, buffer)
+        return await asyncio.shield(self._enqueue(process_id, entries))
+
+    async def _flush_later(self, process_id: str, buffer: Dict):
+        await asyncio.sleep(self.window)
+        self._flush_buffer(process_id, buffer)
+
+    def _flush_now(self, process_id: str, buffer: Dict):
+        # An untaken buffer's timer is still sleeping, so cancelling it can't interrupt a write
+        if not buffer.get("taken"):
+            buffer["task"].cancel()
+            self._flush_buffer(process_id, buffer)
+
+    def _flush_buffer(self, process_id: str, buffer: Dict):
+        if buffer.get("taken"):
+            return
+        buffer["taken"] = True
+        if self._pending.get(process_id) is buffer:
+            del self._pending[process_id]
+        self._enqueue(process_id, buffer["entries"]).add_done_callback(
+            lambda task: _settle(buffer["future"], task)
+        )
+
+    def _enqueue(self, process_id: str, entries: List[Dict]) -> asyncio.Task:
+        # Queued synchronously, so writes run in the order they were enqueued. Each write is its
+        # own task: a cancelled caller can't abandon it, or break the chain for later writes
+        task = asyncio.create_task(self._write_after(self._tails.get(process_id), process_id, entries))
+        self._tails[process_id] = task
+        task.add_done_callback(lambda done: self._tails.get(process_id) is done and self._tails.pop(process_id))
+        return task
+
+    async def _write_after(self, previous, process_id: str, entries: List[Dict]) -> bool:
+        if previous is not None:
+            # wait() doesn't propagate the previous write's outcome, and never cancels it
+            await asyncio.wait([previous])
+        self._stats["flushes"] += 1
+        self._stats["written"] += len(entries)
+        return bool(await self.flush(process_id, entries))
+
+    async def flush_all(self):
+        """Write every buffer now and wait for all writes to finish (at shutdown)"""
+        for process_id, buffer in list(self._pending.items()):
+            self._flush_now(process_id, buffer)
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+    def stats(self):
+        return {
+            **self._stats,
+            "pending_processes": len(self._pending),
+            "writing_processes": len(self._tails),
+            "window": self.window,
+        }
+
+
+def _settle(future: asyncio.Future, task: asyncio.Task):
+    # Pass a write's outcome on to everyone waiting on its buffer
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
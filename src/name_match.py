@@ -0,0 +1,206 @@
+import os
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Batch scoring is vectorised with numpy when it is installed, and falls back to pairwise scoring
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from .text_normalize import fold, normalize_legal_name, LEGAL_SUFFIXES, TRANSLITERATIONS
+except ImportError:
+    # Running as a standalone script
+    from text_normalize import fold, normalize_legal_name, LEGAL_SUFFIXES, TRANSLITERATIONS
+
+# Scores at or above ACCEPT are matches, at or below REJECT are non-matches.
+# Pairs in between form the uncertainty band that may be escalated to Gemini.
+NAME_MATCH_ACCEPT = float(os.getenv("NAME_MATCH_ACCEPT", "0.92"))
+NAME_MATCH_REJECT = float(os.getenv("NAME_MATCH_REJECT", "0.75"))
+
+# Arabic name particles that are written inconsistently (or dropped) across person names.
+# "abu" is not one of them: it starts place names and kunyas ("Abu Dhabi", "Abu Bakr").
+PARTICLES = {"al", "bin", "bint", "ibn", "bn", "binti"}
+
+# Words that mark a company or organisation name, whose particles are part of the name
+# ("Bin Hendi Enterprises") and are kept
+ORGANISATION_WORDS = {
+    "bank", "trading", "group", "holding", "holdings", "company", "co", "est", "establishment",
+    "enterprises", "investment", "investments", "industries", "services", "properties", "contracting",
+    "international", "insurance", "capital", "partners", "consultancy", "consulting", "technologies",
+    "technology", "solutions", "branch", "exchange", "foundation", "authority",
+}
+
+# A token whose best counterpart in the other name scores below this is unmatched (a missing
+# surname, an extra word), and a pair with an unmatched token is never accepted outright
+NAME_TOKEN_MATCH = 0.85
+UNMATCHED_TOKEN_CAP = round(NAME_MATCH_ACCEPT - 0.01, 4)
+
+# Upper bound on the token-pair cells score_matrix holds at once (float64, so 8 bytes each)
+SCORE_MATRIX_MAX_CELLS = int(os.getenv("SCORE_MATRIX_MAX_CELLS", str(4_000_000)))
+
+
+@lru_cache(maxsize=65536)
+def prepare_name(name: str) -> Tuple[str, ...]:
+    """Normalised tokens of a person or company name, without particles for person names (cached)"""
+    tokens = [TRANSLITERATIONS.get(token, token) for token in normalize_legal_name(name).split()]
+    if any(token in LEGAL_SUFFIXES or token in ORGANISATION_WORDS for token in fold(name).split()):
+        return tuple(tokens)
+    meaningful = [token for token in tokens if token not in PARTICLES]
+    return tuple(meaningful or tokens)
+
+
+@lru_cache(maxsize=262144)
+def jaro_winkler(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    a_matched = [False] * len(a)
+    b_matched = [False] * len(b)
+    matches = 0
+    for i, ca in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == ca:
+                a_matched[i] = b_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+    transpositions = 0
+    j = 0
+    for i, ca in enumerate(a):
+        if a_matched[i]:
+            while not b_matched[j]:
+                j += 1
+            if ca != b[j]:
+                transpositions += 1
+            j += 1
+    m = matches
+    jaro = (m / len(a) + m / len(b) + (m - transpositions / 2) / m) / 3
+    prefix = 0
+    for ca, cb in zip(a[:4], b[:4]):
+        if ca != cb:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def _best_matches(tokens: Tuple[str, ...], others: Tuple[str, ...]) -> List[float]:
+    # Best Jaro-Winkler of each token against the other name's tokens (order independent)
+    return [max(jaro_winkler(token, other) for other in others) for token in tokens]
+
+
+@lru_cache(maxsize=262144)
+def score_prepared(tokens1: Tuple[str, ...], tokens2: Tuple[str, ...]) -> float:
+    if not tokens1 or not tokens2:
+        return 0.0
+    if tokens1 == tokens2 or sorted(tokens1) == sorted(tokens2):
+        return 1.0
+    shorter, longer = (tokens1, tokens2) if len(tokens1) <= len(tokens2) else (tokens2, tokens1)
+    best_shorter = _best_matches(shorter, longer)
+    best_longer = _best_matches(longer, shorter)
+    # Coverage of the shorter name weighs most, so spelling differences cost little
+    score = 0.7 * sum(best_shorter) / len(shorter) + 0.3 * sum(best_longer) / len(longer)
+    # ...but a token with no counterpart (e.g. a surname only one side has) leaves the pair uncertain
+    if min(best_shorter + best_longer) < NAME_TOKEN_MATCH:
+        score = min(score, UNMATCHED_TOKEN_CAP)
+    return round(score, 4)
+
+
+def score_names(name1: str, name2: str) -> float:
+    return score_prepared(prepare_name(name1), prepare_name(name2))
+
+
+def score_matrix(names: List[str], candidates: List[str]) -> List[List[float]]:
+    """
+    Score every name against every candidate in one pass (same scores as score_names)
+
+    Each distinct name is normalised once and Jaro-Winkler runs once per distinct token pair;
+    with numpy the coverage and scoring of all pairs is then done on arrays.
+    """
+    prepared_names = [prepare_name(name) for name in names]
+    prepared_candidates = [prepare_name(candidate) for candidate in candidates]
+    if np is None or not prepared_names or not prepared_candidates:
+        return [[score_prepared(n, c) for c in prepared_candidates] for n in prepared_names]
+
+    name_vocab = sorted({token for tokens in prepared_names for token in tokens}) or [""]
+    candidate_vocab = sorted({token for tokens in prepared_candidates for token in tokens}) or [""]
+    similarity = np.array([[jaro_winkler(a, b) for b in candidate_vocab] for a in name_vocab])
+    name_index, name_mask = _token_index(prepared_names, name_vocab)
+    candidate_index, candidate_mask = _token_index(prepared_candidates, candidate_vocab)
+
+    # Candidates are scored in blocks so the name x candidate x token x token array stays bounded
+    cells_per_candidate = len(prepared_names) * name_index.shape[1] * candidate_index.shape[1]
+    block = max(1, SCORE_MATRIX_MAX_CELLS // cells_per_candidate)
+    scores = np.hstack([
+        _score_block(similarity, name_index, name_mask, candidate_index[start:start + block], candidate_mask[start:start + block])
+        for start in range(0, len(prepared_candidates), block)
+    ])
+    return np.round(scores, 4).tolist()
+
+
+def _score_block(similarity, name_index, name_mask, candidate_index, candidate_mask):
+    # pairs[i, j, k, l]: token k of name i against token l of candidate j
+    pairs = similarity[name_index[:, None, :, None], candidate_index[None, :, None, :]]
+    valid = name_mask[:, None, :, None] & candidate_mask[None, :, None, :]
+    pairs = np.where(valid, pairs, -1.0)
+    best_name = pairs.max(axis=3)
+    best_candidate = pairs.max(axis=2)
+
+    name_lengths = name_mask.sum(axis=1)[:, None]
+    candidate_lengths = candidate_mask.sum(axis=1)[None, :]
+    coverage_name = np.where(name_mask[:, None, :], best_name, 0.0).sum(axis=2) / np.maximum(name_lengths, 1)
+    coverage_candidate = np.where(candidate_mask[None, :, :], best_candidate, 0.0).sum(axis=2) / np.maximum(candidate_lengths, 1)
+    weakest = np.minimum(
+        np.where(name_mask[:, None, :], best_name, np.inf).min(axis=2),
+        np.where(candidate_mask[None, :, :], best_candidate, np.inf).min(axis=2),
+    )
+
+    scores = np.where(
+        name_lengths <= candidate_lengths,
+        0.7 * coverage_name + 0.3 * coverage_candidate,
+        0.7 * coverage_candidate + 0.3 * coverage_name,
+    )
+    scores = np.where(weakest < NAME_TOKEN_MATCH, np.minimum(scores, UNMATCHED_TOKEN_CAP), scores)
+    return np.where((name_lengths == 0) | (candidate_lengths == 0), 0.0, scores)
+
+
+def _token_index(prepared: List[Tuple[str, ...]], vocab: List[str]):
+    # Each name's tokens as vocab indices, padded to the longest name, plus a mask of real tokens
+    positions = {token: i for i, token in enumerate(vocab)}
+    width = max(max(len(tokens) for tokens in prepared), 1)
+    index = np.zeros((len(prepared), width), dtype=np.intp)
+    mask = np.zeros((len(prepared), width), dtype=bool)
+    for row, tokens in enumerate(prepared):
+        index[row, :len(tokens)] = [positions[token] for token in tokens]
+        mask[row, :len(tokens)] = True
+    return index, mask
+
+
+def classify(score: float) -> str:
+    """Map a similarity score to match / no_match / uncertain"""
+    if score >= NAME_MATCH_ACCEPT:
+        return "match"
+    if score <= NAME_MATCH_REJECT:
+        return "no_match"
+    return "uncertain"
+
+
+def match_names_local(name1: str, name2: str) -> Dict:
+    """
+    Compare two names locally
+
+    Returns:
+        dict: {"match": bool | None, "confidence": float, "reason": str}; match is None when the
+              score falls in the uncertainty band
+    """
+    score = score_names(name1, name2)
+    decision = classify(score)
+    if decision == "match":
+        return {"match": True, "confidence": score, "reason": "Names match after normalisation"}
+    if decision == "no_match":
+        return {"match": False, "confidence": score, "reason": "Names differ"}
+    return {"match": None, "confidence": score, "reason": "Uncertain"}
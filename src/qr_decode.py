@@ -0,0 +1,125 @@
+import re
+from typing import Iterator, List, Optional
+from urllib.parse import urlparse
+
+# Local decoding is optional: without OpenCV every document goes straight to the Gemini fallback
+try:
+    import cv2
+    import numpy as np
+    QR_DECODE_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    np = None
+    QR_DECODE_AVAILABLE = False
+
+try:
+    from pyzbar import pyzbar
+    PYZBAR_AVAILABLE = True
+except ImportError:
+    pyzbar = None
+    PYZBAR_AVAILABLE = False
+
+# Hosts of the license verification pages the browser agent knows how to read
+LICENSE_URL_HOSTS = ("invest.dubai.ae",)
+
+# Detection runs on copies scaled to these sizes (px, longest side), in order: small QR codes on
+# large scans need the larger sizes, blurry phone photos often detect better at the smaller ones
+DETECT_SIZES = (1600, 1000, 2400)
+# Each detected code is cropped from the full-resolution page and resized to this for decoding
+CROP_SIZE = 600
+CROP_MARGIN = 0.15
+
+_URL = re.compile(r"https?://\S+", re.IGNORECASE)
+
+
+def is_license_url(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in LICENSE_URL_HOSTS)
+
+
+def pick_license_url(texts: List[str]) -> Optional[str]:
+    """Prefer a license verification URL among the decoded payloads, else any URL"""
+    urls = []
+    for text in texts:
+        urls.extend(match.rstrip(".,;)") for match in _URL.findall(text or ""))
+    for url in urls:
+        if is_license_url(url):
+            return url
+    return urls[0] if urls else None
+
+
+def _resize(image, factor: float):
+    if abs(factor - 1.0) < 0.05:
+        return image
+    interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC
+    return cv2.resize(image, None, fx=factor, fy=factor, interpolation=interpolation)
+
+
+def _rotate(image, degrees: float):
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), degrees, 1.0)
+    # Expand the canvas so the corners are not cut off
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+    matrix[0, 2] += new_width / 2 - width / 2
+    matrix[1, 2] += new_height / 2 - height / 2
+    return cv2.warpAffine(image, matrix, (new_width, new_height), borderValue=255)
+
+
+def _detector():
+    # The ArUco-based detector (OpenCV >= 4.8) copes much better with rotation, blur and perspective
+    factory = getattr(cv2, "QRCodeDetectorAruco", None) or cv2.QRCodeDetector
+    return factory()
+
+
+def _crop_variants(crop) -> Iterator["np.ndarray"]:
+    yield crop
+    # Binarisation helps with low-contrast scans and uneven lighting
+    _, binary = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    yield binary
+    # Unsharp mask for out-of-focus phone photos
+    yield cv2.addWeighted(crop, 2.0, cv2.GaussianBlur(crop, (0, 0), 3), -1.0, 0)
+    yield _rotate(crop, 45)
+
+
+def _decode_crop(detector, crop) -> List[str]:
+    for candidate in _crop_variants(crop):
+        if PYZBAR_AVAILABLE:
+            texts = [symbol.data.decode("utf-8", "replace") for symbol in pyzbar.decode(candidate)]
+            if texts:
+                return texts
+        text = detector.detectAndDecode(candidate)[0]
+        if text:
+            return [text]
+    return []
+
+
+def decode_image(image) -> List[str]:
+    """
+    All QR payloads found in a greyscale image (empty list if none)
+
+    Codes are located on downscaled copies (fast, and tolerant of rotation and perspective), then each
+    one is decoded from a crop of the full-resolution image, so small codes on large scans keep
+    their detail.
+    """
+    detector = _detector()
+    longest = max(image.shape[:2])
+    for size in DETECT_SIZES:
+        factor = size / longest
+        found, quads = detector.detectMulti(_resize(image, factor))
+        if not found:
+            continue
+        texts = []
+        for quad in quads:
+            quad = quad / factor
+            (x0, y0), (x1, y1) = quad.min(axis=0), quad.max(axis=0)
+            margin = CROP_MARGIN * max(x1 - x0, y1 - y0)
+            crop = image[max(0, int(y0 - margin)):int(y1 + margin), max(0, int(x0 - margin)):int(x1 + margin)]
+            if crop.size:
+                texts.extend(_decode_crop(detector, _resize(crop, CROP_SIZE / max(crop.shape[:2]))))
+        if texts:
+            return texts
+    if PYZBAR_AVAILABLE:
+        # zbar also reads 1D barcodes, which the QR detector never locates
+        return [symbol.data.decode("utf-8", "replace") for symbol in pyzbar.decode(image)]
+    return []
@@ -11,14 +11,16 @@ if sys.version_info < (3, 10):
     except ImportError:
         pass
 
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, Form, UploadFile, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Literal, Optional
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
 import os
 import json
-import shutil
+import uuid
 from datetime import datetime
 
 # Browser automation imports (optional - not available on Vercel due to size limits)
@@ -26,17 +28,29 @@ try:
     from .browser import extract_license_info
     from .browser_lei import extract_lei_info
     from .browser2 import extract_website_data
+    from .browser_pool import browser_pool, BROWSER_POOL_ENGINES, DEFAULT_EVIDENCE
     BROWSER_AVAILABLE = True
 except ImportError:
     # Gracefully handle missing browser modules
     extract_license_info = None
     extract_lei_info = None
     extract_website_data = None
+    browser_pool = None
+    DEFAULT_EVIDENCE = "video"
     BROWSER_AVAILABLE = False
     print("Warning: Browser automation modules not available (Playwright not installed)")
 
 import google.generativeai as genai
 from supabase import create_client, Client
+from . import db
+from .upload_queue import UploadQueue
+from .video_processing import VIDEO_PROCESSING_AVAILABLE, process_video
+from . import video_processing
+from . import storage
+from .storage import UploadTooLarge, UPLOAD_MAX_BYTES
+from .content_store import content_index, content_key, copy_and_hash, hash_upload
+from .artifact_store import artifact_store
+from .log_buffer import LogCoalescer, coalesce
 
 # --- Supabase Configuration ---
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
@@ -60,6 +74,7 @@ if SUPABASE_URL and SUPABASE_KEY:
         supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
     except Exception as e:
         print(f"Failed to initialize Supabase client: {e}")
+    storage.configure(SUPABASE_URL, SUPABASE_KEY)
 
 # Configure Gemini
 GENAI_API_KEY = os.getenv("VITE_GEMINI_API_KEY") 
@@ -88,30 +103,204 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_browser_pool():
+    # Warm up the shared browsers so the first verification doesn't pay for a launch
+    if browser_pool:
+        try:
+            await browser_pool.start(BROWSER_POOL_ENGINES)
+        except Exception as e:
+            print(f"Failed to start browser pool: {e}")
+
+@app.on_event("shutdown")
+async def stop_browser_pool():
+    if browser_pool:
+        await browser_pool.stop()
+
+@app.on_event("shutdown")
+async def stop_db_pool():
+    # Buffered /zamp/log writes go out before the pool closes
+    await log_buffer.flush_all()
+    db.shutdown()
+
+@app.get("/browser-pool/status")
+async def browser_pool_status():
+    if not browser_pool:
+        return {"started": False}
+    return browser_pool.status()
+
 class LEIRequest(BaseModel):
     leiCode: str
 
-# Helper to upload bytes/file to Supabase
-async def upload_to_supabase(file_data, filename, content_type=None):
-    if not supabase:
-        raise Exception("Supabase not configured")
-    try:
-        # Check if file exists (optional, overwrite logic)
-        # Just upload, Supabase defaults to overwrite=False usually, but we can manage filenames
-        res = supabase.storage.from_("zamp-uploads").upload(
-            filename,
-            file_data,
-            {"content-type": content_type} if content_type else None
-        )
-        # Get public URL
-        public_url = supabase.storage.from_("zamp-uploads").get_public_url(filename)
-        return public_url
-    except Exception as e:
-        print(f"Supabase upload error: {e}")
-        # Fallback: if already exists, return URL
-        return supabase.storage.from_("zamp-uploads").get_public_url(filename)
+def storage_public_url(filename):
+    # Public URLs are derived from the path alone, so they are known before the upload finishes
+    return storage.public_url(filename)
+
+async def store_file(path, filename, content_type=None):
+    """
+    Stream a local file to storage; raises on failure so the upload queue can retry.
+    An existing object counts as success: a retry after a lost response finds it already stored,
+    and content-addressed paths only ever hold identical bytes.
+    """
+    await storage.upload_path(path, filename, content_type)
+
+upload_queue = UploadQueue(store_file, storage_public_url)
 
-from .lei_api import extract_lei_info_api
+@app.on_event("startup")
+async def start_upload_queue():
+    await upload_queue.start()
+
+@app.on_event("shutdown")
+async def stop_upload_queue():
+    await upload_queue.stop()
+    await storage.close_http_client()
+
+@app.on_event("startup")
+async def scan_artifacts():
+    # Pick up (and cap) whatever earlier runs left on disk
+    await asyncio.to_thread(artifact_store.scan)
+
+def submit_upload(path, filename, content_type=None, on_uploaded=None, prepare=None):
+    """
+    Queue a local file for upload, holding it (and any file `prepare` substitutes for it) in the
+    artifact store until the upload is done: deleted on success, left to the size cap on failure.
+    """
+    artifact_store.acquire(path)
+    prepared = []
+
+    async def prepare_tracked(source):
+        result = await prepare(source)
+        if result and result != source:
+            artifact_store.track(result, hold=True)
+            prepared.append(result)
+        return result
+
+    def release(delete):
+        for local_path in [path, *prepared]:
+            artifact_store.release(local_path, delete=delete)
+
+    def uploaded(job):
+        if on_uploaded:
+            on_uploaded(job)
+        release(True)
+
+    return upload_queue.submit(
+        path, filename, content_type,
+        on_uploaded=uploaded,
+        on_failed=lambda job: release(False),
+        prepare=prepare_tracked if prepare else None
+    )
+
+def queue_upload(data, key, path, filename, content_type=None, sha256=None, prepare=None):
+    """
+    Queue a local file for background upload and record where it will live
+
+    Sets data[key] to the final public URL right away and data[f"{key}_upload"] to the job
+    (id + status) the dashboard can poll at /uploads/{id}. With `sha256`, `filename` is a
+    content-addressed path: content already stored is not uploaded again. `prepare` is passed on
+    to the queue (see UploadQueue.submit). The local file is deleted once uploaded.
+    """
+    if not path or not os.path.exists(path) or not supabase:
+        return
+    if sha256:
+        known = content_index.lookup(sha256, filename)
+        if known:
+            data[key] = known["public_url"]
+            data[f"{key}_upload"] = {"id": None, "status": "deduplicated"}
+            return
+        on_uploaded = lambda job: content_index.remember(sha256, filename, job["public_url"], os.path.getsize(path), content_type)
+    else:
+        on_uploaded = None
+    job = submit_upload(path, filename, content_type, on_uploaded=on_uploaded, prepare=prepare)
+    data[key] = job["public_url"]
+    data[f"{key}_upload"] = {"id": job["id"], "status": job["status"]}
+
+def queue_video(data, name):
+    """
+    Queue the recording for upload after post-processing (compression, idle trim) in the video pool
+
+    The poster frame and keyframe strip produced along the way are queued as separate uploads;
+    their URLs (public_poster_path, public_strip_path) are set up front like the video's. If
+    processing fails the raw recording is uploaded and the preview images never appear.
+    """
+    path = data.get("video_path")
+    if not path or not os.path.exists(path) or not supabase:
+        return
+    previews = {"poster": f"{name}_poster.jpg", "strip": f"{name}_strip.jpg"}
+
+    async def compress(video_path):
+        result = await process_video(video_path)
+        if not result:
+            return video_path
+        for kind, filename in previews.items():
+            if artifact_store.track(result.get(kind), job=name):
+                submit_upload(result[kind], filename, "image/jpeg")
+        return result.get("video", video_path)
+
+    queue_upload(data, "public_video_path", path, f"{name}.webm", "video/webm",
+                 prepare=compress if VIDEO_PROCESSING_AVAILABLE else None)
+    if VIDEO_PROCESSING_AVAILABLE:
+        for kind, filename in previews.items():
+            data[f"public_{kind}_path"] = storage_public_url(filename)
+
+def queue_evidence(data, name):
+    """Queue whatever evidence the agent recorded: the video, or the screenshot and DOM snapshot"""
+    for key in ("video_path", "screenshot_path", "snapshot_path", "debug_screenshot_path"):
+        artifact_store.track(data.get(key), job=name)
+    queue_video(data, name)
+    queue_upload(data, "public_screenshot_path", data.get("screenshot_path"), f"{name}.png", "image/png")
+    queue_upload(data, "public_snapshot_path", data.get("snapshot_path"), f"{name}.html", "text/html")
+
+@app.get("/uploads/{job_id}")
+async def upload_status(job_id: str):
+    job = upload_queue.status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return job
+
+@app.get("/uploads")
+async def upload_queue_stats():
+    return {**upload_queue.stats(), "content_index": content_index.stats()}
+
+@app.get("/artifacts/stats")
+async def artifact_stats():
+    return await asyncio.to_thread(artifact_store.stats)
+
+from .address_match import match_addresses_local
+from .name_match import match_names_local, score_matrix, classify
+
+# Upper bound on uncertain pairs sent to Gemini per /match-names-batch request
+NAME_MATCH_GEMINI_MAX_PAIRS = int(os.getenv("NAME_MATCH_GEMINI_MAX_PAIRS", "50"))
+# Upper bound on names and on candidates per /match-names-batch request (each side)
+NAME_MATCH_MAX_NAMES = int(os.getenv("NAME_MATCH_MAX_NAMES", "500"))
+from .lei_api import extract_lei_info_api, extract_lei_info_batch_ndjson, search_lei_by_name, start_http_client, close_http_client
+from . import cache
+from .document_prep import scan_document, prepare_for_model
+from . import document_prep
+from .knowledge_base import knowledge_base, format_sections
+from .llm_cache import cached_generate, parse_verdict, verdict_list_parser, parse_json_object, endpoint_stats as llm_endpoint_stats
+from .llm_stream import stream_events
+from .llm_stub import StubModel
+
+@app.on_event("startup")
+async def start_gleif_client():
+    await start_http_client()
+
+@app.on_event("shutdown")
+async def stop_gleif_client():
+    await close_http_client()
+
+@app.on_event("shutdown")
+async def stop_document_pool():
+    document_prep.shutdown()
+
+@app.on_event("shutdown")
+async def stop_video_pool():
+    video_processing.shutdown()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**cache.all_stats(), "llm_endpoints": llm_endpoint_stats()}
 
 @app.post("/verify-lei")
 async def verify_lei(request: LEIRequest):
@@ -121,19 +310,9 @@ async def verify_lei(request: LEIRequest):
         # Use API-based extraction (no browser automation required)
         data = await extract_lei_info_api(request.leiCode)
         
-        # Handle Video
-        video_path = data.get("video_path")
-        public_video_path = None
-        
-        if video_path and os.path.exists(video_path) and supabase:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            video_filename = f"lei_check_{request.leiCode}_{timestamp}.webm"
-            
-            with open(video_path, 'rb') as f:
-                public_video_path = await upload_to_supabase(f.read(), video_filename, "video/webm")
-            
-            data["public_video_path"] = public_video_path
-            print(f"Video uploaded to: {public_video_path}")
+        # Handle Video (uploaded in the background; the URL is final immediately)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        queue_evidence(data, f"lei_check_{request.leiCode}_{timestamp}")
             
         return data
 
@@ -141,11 +320,34 @@ async def verify_lei(request: LEIRequest):
         print(f"Error verifying LEI: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class LEIBatchRequest(BaseModel):
+    leiCodes: List[str]
+
+@app.post("/verify-lei-batch")
+async def verify_lei_batch(request: LEIBatchRequest):
+    """Verify many LEIs at once; results are streamed back as NDJSON, one record per line, as chunks complete"""
+    print(f"Received batch request for {len(request.leiCodes)} LEIs")
+    return StreamingResponse(extract_lei_info_batch_ndjson(request.leiCodes), media_type="application/x-ndjson")
+
+@app.get("/lei/search")
+async def lei_search(name: str, limit: int = 10):
+    if not name.strip():
+        raise HTTPException(status_code=400, detail="name is required")
+    results = await search_lei_by_name(name, min(max(limit, 1), 100))
+    if results is None:
+        raise HTTPException(status_code=503, detail="LEI index not available")
+    return {"query": name, "results": results}
+
+# What a browser agent records as evidence (see browser_pool.EVIDENCE_LEVELS); None uses the default
+Evidence = Literal["video", "video_low", "snapshot", "none"]
+
 class LicenseRequest(BaseModel):
     licenseNumber: str
+    evidence: Optional[Evidence] = None
 
 class WebsiteRequest(BaseModel):
     url: str
+    evidence: Optional[Evidence] = None
 
 class ZampInitRequest(BaseModel):
     processName: str
@@ -158,20 +360,49 @@ class ZampLogRequest(BaseModel):
     keyDetails: dict = None # Optional updates to key details
     metadata: dict = None # Optional updates to top-level process metadata (e.g. status, applicantName)
 
+class ZampLogBatchRequest(BaseModel):
+    entries: List[ZampLogRequest] # Applied in order, grouped per process
+
 class HelpChatRequest(BaseModel):
     query: str
     contextData: dict = {}
     stepInfo: str = ""
 
-def get_knowledge_base():
-    try:
-        kb_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "docs", "knowledge-base.md")
-        if os.path.exists(kb_path):
-            with open(kb_path, 'r') as f:
-                return f.read()
-    except Exception as e:
-        print(f"Error reading knowledge base: {e}")
-    return ""
+# Model behind the help chat; "stub" answers locally without an API key (for tests and offline dev)
+HELP_CHAT_MODEL = os.getenv("HELP_CHAT_MODEL", "gemini-1.5-flash")
+
+def get_help_model():
+    if HELP_CHAT_MODEL == "stub":
+        return StubModel()
+    return genai.GenerativeModel(HELP_CHAT_MODEL)
+
+# Upper bound on the user data pasted into a help prompt
+HELP_CHAT_MAX_CONTEXT_CHARS = int(os.getenv("HELP_CHAT_MAX_CONTEXT_CHARS", "2000"))
+
+@app.on_event("startup")
+async def load_knowledge_base():
+    knowledge_base.load()
+
+def build_help_prompt(request: HelpChatRequest) -> str:
+    """
+    Prompt for the help assistant: only the knowledge-base sections relevant to the query
+    (and current step) are included, plus the non-empty user data, capped in size.
+    """
+    sections = knowledge_base.search(f"{request.query} {request.stepInfo}")
+    context_data = {k: v for k, v in (request.contextData or {}).items() if v not in (None, "", [], {})}
+    user_data = json.dumps(context_data, separators=(",", ":"), default=str)
+    if len(user_data) > HELP_CHAT_MAX_CONTEXT_CHARS:
+        user_data = user_data[:HELP_CHAT_MAX_CONTEXT_CHARS] + "...(truncated)"
+
+    return f"""You are a helpful assistant for Wio Business Onboarding.
+        Answer using the knowledge base sections below; if they don't cover the question, say so.
+        KNOWLEDGE BASE:
+        {format_sections(sections)}
+        CONTEXT STEP: {request.stepInfo}
+        USER DATA: {user_data}
+
+        QUERY: {request.query}
+        """
 
 @app.post("/extract-license")
 async def extract_license(request: LicenseRequest):
@@ -179,22 +410,11 @@ async def extract_license(request: LicenseRequest):
         print(f"Received request for license: {request.licenseNumber}")
         
         # Run the extraction logic
-        data = await extract_license_info(request.licenseNumber)
+        data = await extract_license_info(request.licenseNumber, evidence=request.evidence or DEFAULT_EVIDENCE)
         
-        # Handle Video
-        video_path = data.get("video_path")
-        public_video_path = None
-        
-        if video_path and os.path.exists(video_path) and supabase:
-            # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            video_filename = f"license_check_{request.licenseNumber}_{timestamp}.webm"
-            
-            with open(video_path, 'rb') as f:
-                public_video_path = await upload_to_supabase(f.read(), video_filename, "video/webm")
-            
-            data["public_video_path"] = public_video_path
-            print(f"Video uploaded to: {public_video_path}")
+        # Handle Video / snapshot (uploaded in the background; the URLs are final immediately)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        queue_evidence(data, f"license_check_{request.licenseNumber}_{timestamp}")
         
         return data
         
@@ -202,21 +422,18 @@ async def extract_license(request: LicenseRequest):
         print(f"Error processing request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def extract_qr_url(file_path: str):
+async def extract_qr_url(file_path: str, content_id: str):
     """
     Uses Gemini to identify QR code in the image and extract the URL.
+
+    content_id identifies the file's content (its sha256, plus how it was rendered) and keys the
+    cache, so the file isn't read into memory or hashed again.
     """
     try:
         if not GENAI_API_KEY:
             print("Gemini API Key missing")
             return None
 
-        # Upload file to Gemini
-        sample_file = genai.upload_file(file_path)
-        print(f"Uploaded file to Gemini: {sample_file.uri}")
-
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        
         prompt = """
         Extract the URL encoded in the QR code within this image. 
         Also extract the "License Number" from the text.
@@ -228,65 +445,84 @@ async def extract_qr_url(file_path: str):
             "licenseNumber": "123..." 
         }
         """
-        
-        response = model.generate_content([sample_file, prompt])
-        print(f"Gemini QR Response: {response.text}")
-        
-        text = response.text.replace('```json', '').replace('```', '').strip()
-        data = json.loads(text)
-        
-        return data
+
+        def generate():
+            # Upload file to Gemini
+            sample_file = genai.upload_file(file_path)
+            print(f"Uploaded file to Gemini: {sample_file.uri}")
+            model = genai.GenerativeModel("gemini-1.5-flash")
+            response = model.generate_content([sample_file, prompt])
+            print(f"Gemini QR Response: {response.text}")
+            return response.text
+
+        # The same document re-uploaded (retries, re-opened steps) is answered from the cache
+        return await cached_generate(
+            "extract_qr_url", "gemini-1.5-flash", prompt, generate,
+            inputs=(content_id.encode(),), parse=parse_json_object
+        )
 
     except Exception as e:
         print(f"Error extracting QR URL with Gemini: {e}")
         return None
 
 @app.post("/verify-trade-license-file")
-async def verify_trade_license_file(file: UploadFile = File(...)):
+async def verify_trade_license_file(file: UploadFile = File(...), evidence: Optional[Evidence] = Form(None)):
+    temp_path = None
     try:
         # Save locally temporarily for processing (Gemini needs a path or bytes)
         # We can pass bytes to Gemini later, but let's stick to temp file for now
-        temp_filename = f"temp_upload_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
+        temp_filename = f"temp_upload_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}_{file.filename}"
         # Use /tmp for serverless envs
         temp_path = os.path.join("/tmp", temp_filename)
         
-        with open(temp_path, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
+        # Hash while saving, so the original can be stored under a content-addressed path
+        sha256, _ = await asyncio.to_thread(copy_and_hash, file.file, temp_path, UPLOAD_MAX_BYTES)
+        # Held until the request ends; a queued upload keeps it until it is stored
+        artifact_store.track(temp_path, kind="upload", hold=True)
             
         print(f"File saved for QR scan: {temp_path}")
         
-        # 1. Extract URL via Gemini
-        qr_data = await extract_qr_url(temp_path)
-        
-        url = qr_data.get("url") if qr_data else None
+        # 1. Decode the QR code locally; Gemini only reads images the decoder can't
+        url = await scan_document(temp_path)
+        qr_source = "local"
+        if not url:
+            # Gemini gets a downscaled JPEG of an image or single-page PDF, and multi-page PDFs whole
+            model_path = await prepare_for_model(temp_path)
+            try:
+                # The rendition depends only on the original and the rendering settings
+                content_id = sha256 if model_path == temp_path else (
+                    f"{sha256}:jpeg:{document_prep.DOC_PREP_MODEL_MAX_SIDE}:{document_prep.DOC_PREP_MODEL_JPEG_QUALITY}"
+                )
+                qr_data = await extract_qr_url(model_path, content_id)
+            finally:
+                if model_path != temp_path and os.path.exists(model_path):
+                    os.remove(model_path)
+            url = qr_data.get("url") if qr_data else None
+            qr_source = "gemini"
         
         if not url:
             return {"error": "Could not identify a QR code URL."}
             
-        print(f"Extracted URL from QR: {url}")
+        print(f"Extracted URL from QR ({qr_source}): {url}")
         
         # 2. Run Browser Agent
-        data = await extract_license_info(direct_url=url)
+        data = await extract_license_info(direct_url=url, evidence=evidence or DEFAULT_EVIDENCE)
+        data["qr_source"] = qr_source
         
-        # 3. Handle Video upload to Supabase
-        video_path = data.get("video_path")
-        if video_path and os.path.exists(video_path) and supabase:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            video_filename = f"license_check_qr_{timestamp}.webm"
-            
-            with open(video_path, 'rb') as f:
-                data["public_video_path"] = await upload_to_supabase(f.read(), video_filename, "video/webm")
-        
-        # Upload the original file as well
-        if supabase:
-            with open(temp_path, 'rb') as f:
-                data["uploaded_file_path"] = await upload_to_supabase(f.read(), temp_filename)
+        # 3. Queue the evidence and the original file for upload to Supabase
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        queue_evidence(data, f"license_check_qr_{timestamp}")
+        queue_upload(data, "uploaded_file_path", temp_path, content_key(sha256, file.filename), file.content_type, sha256=sha256)
         
         return data
 
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"Error verifying trade license file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        artifact_store.release(temp_path)
 
 @app.post("/verify-website")
 async def verify_website(request: WebsiteRequest):
@@ -294,17 +530,11 @@ async def verify_website(request: WebsiteRequest):
         print(f"Received request for website: {request.url}")
         
         # Run extraction
-        data = await extract_website_data(request.url)
-        
-        # Handle Video
-        video_path = data.get("video_path")
+        data = await extract_website_data(request.url, evidence=request.evidence or DEFAULT_EVIDENCE)
         
-        if video_path and os.path.exists(video_path) and supabase:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            video_filename = f"website_check_{timestamp}.webm"
-            
-            with open(video_path, 'rb') as f:
-                data["public_video_path"] = await upload_to_supabase(f.read(), video_filename, "video/webm")
+        # Handle Video / snapshot (uploaded in the background; the URLs are final immediately)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        queue_evidence(data, f"website_check_{timestamp}")
             
         return data
 
@@ -318,11 +548,18 @@ class AddressMatchRequest(BaseModel):
 
 @app.post("/match-addresses")
 async def match_addresses(request: AddressMatchRequest):
+    tier = "local"
     try:
+        # Confident matches / non-matches are decided locally; only ambiguous pairs reach Gemini
+        local_result = match_addresses_local(request.address1, request.address2)
+        if local_result:
+            return {**local_result, "tier": "local"}
+
+        tier = "gemini"
+
         if not GENAI_API_KEY:
-             return {"match": False, "reason": "No API Key"}
+             return {"match": False, "reason": "No API Key", "tier": "gemini"}
 
-        model = genai.GenerativeModel('gemini-1.5-flash')
         prompt = f"""
         Compare these two addresses and determine if they refer to the same location/building/entity.
         Address 1: "{request.address1}"
@@ -332,14 +569,16 @@ async def match_addresses(request: AddressMatchRequest):
         Return ONLY valid JSON with format: {{ "match": boolean, "reason": "short explanation" }}
         """
         
-        response = model.generate_content(prompt)
-        text = response.text.replace('```json', '').replace('```', '').strip()
-        data = json.loads(text)
-        return data
+        data = await cached_generate(
+            "match_addresses", "gemini-1.5-flash", prompt,
+            lambda: genai.GenerativeModel('gemini-1.5-flash').generate_content(prompt).text,
+            parse=parse_verdict
+        )
+        return {**data, "tier": "gemini"}
 
     except Exception as e:
         print(f"Error matching addresses: {e}")
-        return {"match": False, "reason": str(e)}
+        return {"match": False, "reason": str(e), "tier": tier}
 
 class NameMatchRequest(BaseModel):
     name1: str
@@ -347,29 +586,106 @@ class NameMatchRequest(BaseModel):
 
 @app.post("/match-names")
 async def match_names(request: NameMatchRequest):
+    tier = "local"
     try:
         n1 = request.name1.lower().strip()
         n2 = request.name2.lower().strip()
         
         if n1 == n2:
-             return {"match": True, "confidence": 1.0, "reason": "Exact match"}
+             return {"match": True, "confidence": 1.0, "reason": "Exact match", "tier": "local"}
+
+        # Only names in the local engine's uncertainty band go to Gemini
+        local_result = match_names_local(request.name1, request.name2)
+        if local_result["match"] is not None:
+            return {**local_result, "tier": "local"}
+        tier = "gemini"
              
         if not GENAI_API_KEY:
-             return {"match": False, "reason": "No AI Key"}
+             return {"match": False, "confidence": local_result["confidence"], "reason": "No AI Key", "tier": "gemini"}
 
-        model = genai.GenerativeModel('gemini-1.5-flash')
         prompt = f"""
         Compare these two names:
         Name 1: "{request.name1}"
         Name 2: "{request.name2}"
         Return ONLY valid JSON with format: {{ "match": boolean, "confidence": float, "reason": "explanation" }}
         """
-        response = model.generate_content(prompt)
-        text = response.text.replace('```json', '').replace('```', '').strip()
-        return json.loads(text)
+        data = await cached_generate(
+            "match_names", "gemini-1.5-flash", prompt,
+            lambda: genai.GenerativeModel('gemini-1.5-flash').generate_content(prompt).text,
+            parse=parse_verdict
+        )
+        return {**data, "tier": "gemini"}
 
     except Exception as e:
-        return {"match": False, "confidence": 0.0, "reason": str(e)}
+        return {"match": False, "confidence": 0.0, "reason": str(e), "tier": tier}
+
+class NameBatchMatchRequest(BaseModel):
+    names: List[str]
+    candidates: List[str]
+    useGemini: bool = True
+
+@app.post("/match-names-batch")
+async def match_names_batch(request: NameBatchMatchRequest):
+    """
+    Score every name against every candidate (e.g. website directors vs. license / LEI names).
+    Pairs are decided locally; only pairs inside the uncertainty band are sent to Gemini, in one prompt.
+    Uncertain pairs Gemini doesn't decide (disabled, over the pair limit, or failed) keep match None.
+    """
+    if len(request.names) > NAME_MATCH_MAX_NAMES or len(request.candidates) > NAME_MATCH_MAX_NAMES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {NAME_MATCH_MAX_NAMES} names and {NAME_MATCH_MAX_NAMES} candidates per request"
+        )
+    try:
+        scores = score_matrix(request.names, request.candidates)
+        results = []
+        uncertain = []
+        for i, name in enumerate(request.names):
+            for j, candidate in enumerate(request.candidates):
+                score = scores[i][j]
+                decision = classify(score)
+                result = {
+                    "name": name,
+                    "candidate": candidate,
+                    "match": decision == "match" if decision != "uncertain" else None,
+                    "confidence": score,
+                    "tier": "local"
+                }
+                if decision == "uncertain":
+                    uncertain.append(result)
+                results.append(result)
+
+        if uncertain and request.useGemini and GENAI_API_KEY:
+            escalated = uncertain[:NAME_MATCH_GEMINI_MAX_PAIRS]
+            try:
+                pairs = "\n".join(f'{k}. "{r["name"]}" vs "{r["candidate"]}"' for k, r in enumerate(escalated))
+                prompt = f"""
+                For each numbered pair of names below, decide whether both names refer to the same person or company.
+                {pairs}
+                Return ONLY a valid JSON array with one object per pair, in order: [{{ "match": boolean, "reason": "short explanation" }}]
+                """
+                verdicts = await cached_generate(
+                    "match_names_batch", "gemini-1.5-flash", prompt,
+                    lambda: genai.GenerativeModel('gemini-1.5-flash').generate_content(prompt).text,
+                    parse=verdict_list_parser(len(escalated))
+                )
+                for result, verdict in zip(escalated, verdicts):
+                    result["match"] = bool(verdict.get("match"))
+                    result["reason"] = verdict.get("reason", "")
+                    result["tier"] = "gemini"
+            except Exception as e:
+                print(f"Error escalating name matches to Gemini: {e}")
+
+        best_matches = {}
+        for result in results:
+            best = best_matches.get(result["name"])
+            if best is None or result["confidence"] > best["confidence"]:
+                best_matches[result["name"]] = result
+        return {"results": results, "bestMatches": best_matches}
+
+    except Exception as e:
+        print(f"Error matching names in batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 # --- Zamp Integration Endpoints (Supabase Backed) ---
 
@@ -378,118 +694,126 @@ async def zamp_init(request: ZampInitRequest):
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured")
     try:
-        # Check for latest ID logic (optional in DB, can use serial or count)
-        res = supabase.table("processes").select("id", count="exact").execute()
-        count = len(res.data) # Simple count-based ID (ok for demo)
-        new_id = str(count + 1)
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        # Initial Details Structure
+        # Initial Details Structure (create_process fills in the id; the sections' items are
+        # rows of their own and are added when the document is read)
         initial_details = {
-            "id": new_id,
             "sections": {
                 "overview": {"title": "Overview", "content": "Process Overview"},
-                "activityLogs": {"title": "Activity Logs", "items": []},
-                "keyDetails": {"title": "Key Details", "items": []},
-                "messages": {"title": "Messages", "items": []},
-                "sidebarArtifacts": {"title": "Artifacts", "items": []}
+                "activityLogs": {"title": "Activity Logs"},
+                "keyDetails": {"title": "Key Details"},
+                "messages": {"title": "Messages"},
+                "sidebarArtifacts": {"title": "Artifacts"}
             }
         }
 
-        # Insert new process
-        new_process = {
-            "id": new_id,
-            "stock_id": f"{request.processName} #{new_id}",
-            "applicant_name": "Wio Applicant",
-            "status": "In Progress",
-            "created_at": datetime.now().isoformat(),
-            "details": initial_details
-        }
-        
-        supabase.table("processes").insert(new_process).execute()
+        # The ID comes from a database sequence and the row is inserted in the same call
+        # (supabase/migrations/*_process_id_sequence.sql), so concurrent inits never collide
+        res = await db.execute(supabase.rpc("create_process", {
+            "p_process_name": request.processName,
+            "p_applicant_name": "Wio Applicant",
+            "p_status": "In Progress",
+            "p_details": initial_details
+        }))
+        new_id = str(res.data)
         return {"processId": new_id}
         
     except Exception as e:
         print(f"Error initializing Zamp process: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def stamp_log(request: ZampLogRequest) -> dict:
+    """The log item as stored: request.log with a display time and its stepId"""
+    log = dict(request.log)
+    if "time" not in log:
+        log["time"] = datetime.now().strftime("%I:%M %p")
+    if request.stepId:
+        log["stepId"] = request.stepId
+    return log
+
+def log_entry(request: ZampLogRequest) -> dict:
+    return {"stepId": request.stepId, "log": stamp_log(request), "keyDetails": request.keyDetails, "metadata": request.metadata}
+
+async def write_log_entries(process_id: str, entries: list) -> bool:
+    """
+    Apply log entries to one process in a single call and transaction
+    (log_process_steps in supabase/migrations/); False if the process doesn't exist
+    """
+    res = await db.execute(supabase.rpc("log_process_steps", {"p_process_id": process_id, "p_entries": entries}))
+    return bool(res.data)
+
+# Rapid /zamp/log calls for a process are written together, with repeated updates of a step merged
+log_buffer = LogCoalescer(write_log_entries)
+
 @app.post("/zamp/log")
 async def zamp_log(request: ZampLogRequest):
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured")
     try:
-        # Fetch current details
-        res = supabase.table("processes").select("details").eq("id", request.processId).execute()
-        if not res.data:
+        # Returns once the buffered write this entry went into has been applied
+        if not await log_buffer.submit(request.processId, log_entry(request)):
             raise HTTPException(status_code=404, detail="Process not found")
-            
-        process_data = res.data[0]["details"]
-        if not process_data:
-            process_data = {"id": request.processId, "sections": {"activityLogs": {"items": []}, "keyDetails": {"items": []}, "sidebarArtifacts": {"items": []}}}
-        
-        # Ensure timestamp
-        if "time" not in request.log:
-            request.log["time"] = datetime.now().strftime("%I:%M %p")
-        if request.stepId:
-            request.log["stepId"] = request.stepId
-
-        # Update Activity Logs
-        logs = process_data["sections"]["activityLogs"]["items"]
-        updated = False
-        if request.stepId:
-            for i, item in enumerate(logs):
-                if item.get("stepId") == request.stepId:
-                    logs[i].update(request.log)
-                    updated = True
-                    break
-        if not updated:
-            logs.append(request.log)
-
-        # Sync Artifacts
-        if "artifacts" in request.log and request.log["artifacts"]:
-            if "sidebarArtifacts" not in process_data["sections"]:
-                 process_data["sections"]["sidebarArtifacts"] = {"title": "Artifacts", "items": []}
-            
-            existing_ids = set(item.get("id") for item in process_data["sections"]["sidebarArtifacts"]["items"])
-            for artifact in request.log["artifacts"]:
-                if artifact.get("id") not in existing_ids:
-                    process_data["sections"]["sidebarArtifacts"]["items"].append(artifact)
-
-        # Update Key Details
-        if request.keyDetails:
-             if isinstance(request.keyDetails, dict):
-                 process_data["sections"]["keyDetails"]["items"].append(request.keyDetails)
-             elif isinstance(request.keyDetails, list):
-                  process_data["sections"]["keyDetails"]["items"].extend(request.keyDetails)
-
-        # Update Database
-        update_payload = {"details": process_data}
-        
-        # Update Meta fields if present
-        if request.metadata:
-            if "status" in request.metadata:
-                update_payload["status"] = request.metadata["status"]
-            if "applicantName" in request.metadata:
-                update_payload["applicant_name"] = request.metadata["applicantName"]
-
-        supabase.table("processes").update(update_payload).eq("id", request.processId).execute()
         return {"status": "success"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error logging to Zamp: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/zamp/log-batch")
+async def zamp_log_batch(request: ZampLogBatchRequest):
+    """
+    Apply a list of /zamp/log entries: one call (and transaction) per process, entries in order,
+    updates of the same step merged first. Each process's write is ordered after its /zamp/log
+    entries submitted earlier (see LogCoalescer.write).
+
+    Returns:
+        dict: {"status": "success" | "partial", "results": {processId: "success" | "not_found" | "error"}}
+    """
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured")
+    by_process = {}
+    for entry in request.entries:
+        by_process.setdefault(entry.processId, []).append(log_entry(entry))
+
+    outcomes = await asyncio.gather(
+        *(log_buffer.write(process_id, coalesce(entries)) for process_id, entries in by_process.items()),
+        return_exceptions=True
+    )
+    results = {}
+    for process_id, outcome in zip(by_process, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Error logging batch to Zamp process {process_id}: {outcome}")
+            results[process_id] = "error"
+        else:
+            results[process_id] = "success" if outcome else "not_found"
+    status = "success" if all(result == "success" for result in results.values()) else "partial"
+    return {"status": status, "results": results}
+
+@app.get("/zamp/log-buffer")
+async def log_buffer_stats():
+    return log_buffer.stats()
+
 @app.post("/zamp/upload")
 async def zamp_upload(file: UploadFile = File(...)):
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured")
     try:
-        file_content = await file.read()
-        filename = f"uploads/{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-        public_url = await upload_to_supabase(file_content, filename, file.content_type)
+        # Same bytes -> same path, so a re-uploaded document is only stored once
+        sha256, size = await hash_upload(file, UPLOAD_MAX_BYTES)
+        filename = content_key(sha256, file.filename)
+        known = content_index.lookup(sha256, filename)
+        if known:
+            return {"path": known["public_url"], "deduplicated": True}
+
+        # Streamed from the spooled request body in fixed-size chunks, never read whole into memory
+        await storage.upload_fileobj(file.file, size, filename, file.content_type)
+        public_url = storage_public_url(filename)
+        content_index.remember(sha256, filename, public_url, size, file.content_type)
         return {"path": public_url}
-        
+
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -497,28 +821,47 @@ async def zamp_upload(file: UploadFile = File(...)):
 @app.post("/chat/help")
 async def chat_help(request: HelpChatRequest):
     try:
-        if not GENAI_API_KEY:
+        if not GENAI_API_KEY and HELP_CHAT_MODEL != "stub":
             raise HTTPException(status_code=500, detail="Gemini API Key not configured")
 
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        knowledge_base_content = get_knowledge_base()
-        
-        system_instruction = f"""You are a helpful assistant for Wio Business Onboarding.
-        KNOWLEDGE BASE: {knowledge_base_content}
-        CONTEXT STEP: {request.stepInfo}
-        USER DATA: {json.dumps(request.contextData)}
-        """
-        
-        chat = model.start_chat(history=[
-            {"role": "user", "parts": [system_instruction + f"\n\nQUERY: {request.query}"]}
-        ])
-        
-        response = chat.send_message(request.query)
-        return {"response": response.text}
+        # One round trip with the query in the prompt (it used to be sent a second time via a chat session)
+        prompt = build_help_prompt(request)
+
+        # The prompt carries the retrieved sections and the user's data, so it is part of the cache key
+        text = await cached_generate(
+            "chat_help", HELP_CHAT_MODEL, prompt,
+            lambda: get_help_model().generate_content(prompt).text,
+            parse=lambda text: text
+        )
+        return {"response": text}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/help/stream")
+async def chat_help_stream(request: HelpChatRequest, http_request: Request):
+    """
+    Streaming variant of /chat/help as Server-Sent Events.
+
+    Emits `data: {"text": ...}` per chunk, then `event: done` (or `event: error`).
+    The model stream is closed as soon as the client disconnects.
+    """
+    if not GENAI_API_KEY and HELP_CHAT_MODEL != "stub":
+        raise HTTPException(status_code=500, detail="Gemini API Key not configured")
+
+    prompt = build_help_prompt(request)
+    events = stream_events(
+        "chat_help", HELP_CHAT_MODEL, prompt,
+        lambda: get_help_model().generate_content_async(prompt, stream=True),
+        http_request.is_disconnected
+    )
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 class MessageRequest(BaseModel):
     processId: str
     sender: str
@@ -529,27 +872,23 @@ async def send_message(request: MessageRequest):
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured")
     try:
-        res = supabase.table("processes").select("details").eq("id", request.processId).execute()
-        if not res.data:
-            raise HTTPException(status_code=404, detail="Process not found")
-            
-        process_data = res.data[0]["details"]
-        if "messages" not in process_data["sections"]:
-             process_data["sections"]["messages"] = {"title": "Messages", "items": []}
-
         new_message = {
-            "id": f"msg-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            # Suffixed so two messages sent in the same second keep distinct ids
+            "id": f"msg-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}",
             "sender": request.sender,
             "content": request.content,
             "time": datetime.now().strftime("%I:%M %p"),
             "timestamp": datetime.now().isoformat()
         }
 
-        process_data["sections"]["messages"]["items"].append(new_message)
-        
-        supabase.table("processes").update({"details": process_data}).eq("id", request.processId).execute()
+        # One appended row; concurrent senders can't overwrite each other's messages
+        res = await db.execute(supabase.rpc("post_process_message", {"p_process_id": request.processId, "p_message": new_message}))
+        if not res.data:
+            raise HTTPException(status_code=404, detail="Process not found")
         return {"status": "success", "message": new_message}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -558,10 +897,8 @@ async def get_messages(processId: str):
     if not supabase:
          return {"messages": []}
     try:
-        res = supabase.table("processes").select("details").eq("id", processId).execute()
-        if res.data:
-            return {"messages": res.data[0]["details"].get("sections", {}).get("messages", {}).get("items", [])}
-        return {"messages": []}
+        res = await db.execute(supabase.table("process_messages").select("item").eq("process_id", processId).order("id"))
+        return {"messages": [row["item"] for row in res.data]}
     except Exception:
         return {"messages": []}
 
@@ -570,7 +907,7 @@ async def get_process_status(processId: str):
     if not supabase:
          return {"status": "Unknown"}
     try:
-        res = supabase.table("processes").select("status").eq("id", processId).execute()
+        res = await db.execute(supabase.table("processes").select("status").eq("id", processId))
         if res.data:
             return {"status": res.data[0]["status"]}
         return {"status": "Unknown"}
@@ -582,14 +919,6 @@ async def approve_application(processId: str):
     if not supabase:
          raise HTTPException(status_code=500, detail="Supabase not configured")
     try:
-        # Fetch, Update Log, Update Status
-        res = supabase.table("processes").select("details").eq("id", processId).execute()
-        if not res.data:
-             raise HTTPException(status_code=404, detail="Process not found")
-        
-        process_data = res.data[0]["details"]
-        
-        # Add Log
         approval_log = {
             "title": "Application Approved",
             "status": "success",
@@ -597,23 +926,15 @@ async def approve_application(processId: str):
             "time": datetime.now().strftime("%I:%M %p"),
             "description": "Application has been approved by the Zamp team."
         }
-        process_data["sections"]["activityLogs"]["items"].append(approval_log)
-        
-        # Update Key Details
-        kd_items = process_data["sections"]["keyDetails"].get("items", [])
-        if kd_items:
-            kd_items[-1]["status"] = "Done"
-        else:
-            kd_items.append({"status": "Done"})
-
-        # Update DB
-        supabase.table("processes").update({
-            "status": "Done",
-            "details": process_data
-        }).eq("id", processId).execute()
 
+        # Status, approval log and key details are updated together in one call
+        res = await db.execute(supabase.rpc("approve_process", {"p_process_id": processId, "p_log": approval_log}))
+        if not res.data:
+             raise HTTPException(status_code=404, detail="Process not found")
         return {"status": "success"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error approving application: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -625,62 +946,36 @@ async def get_all_processes():
     if not supabase:
         return []
     try:
-        # Fetch all processes
-        res = supabase.table("processes").select("*").order("id", desc=False).execute()
+        # Only the summary columns: log_process_step keeps them up to date as logs and key details
+        # are written (supabase/migrations/*_process_summary_columns.sql, *_process_task_counts.sql)
+        res = await db.execute(
+            supabase.table("processes")
+            .select("id, stock_id, applicant_name, status, created_at, customer_name, entity_name, license_entity_name, location, tasks_completed, tasks_total")
+            .order("id", desc=False)
+        )
         processes = []
         for p in res.data:
-            # Transform to match old processes.json structure if needed
             # Old structure: { id, customerName, entityName, status, processingDate, location, tasks: { completed, total } }
-            # Since we store 'details' which has keyDetails, we can extract from there.
-            
-            details = p.get("details", {})
-            key_details = details.get("sections", {}).get("keyDetails", {}).get("items", [])
-            
-            # Helper to find value in keyDetails list
-            def get_val(key):
-                for item in key_details:
-                    if key in item: return item[key]
-                return ""
+            customer_name = p.get("applicant_name") or p.get("customer_name") or "Unknown"
 
-            customer_name = p.get("applicant_name") or get_val("customerName") or "Unknown"
-            
-            # Extract entity name from trade license verification if available
-            entity_name = get_val("entityName")
+            # Fall back to the business name from trade license verification; blank instead of "New Entity"
+            entity_name = p.get("entity_name")
             if not entity_name or entity_name == "New Entity":
-                # Try to extract from trade license verification artifacts
-                activity_logs = details.get("sections", {}).get("activityLogs", {}).get("items", [])
-                for log in activity_logs:
-                    if log.get("title") == "Document Verification Complete":
-                        # Found the trade license verification log
-                        artifacts = log.get("artifacts", [])
-                        for artifact in artifacts:
-                            if artifact.get("label") == "Verified License Data" and artifact.get("type") == "table":
-                                artifact_data = artifact.get("data", {})
-                                business_name = artifact_data.get("Business Name", "")
-                                if business_name:
-                                    entity_name = business_name
-                                    break
-                        if entity_name and entity_name != "New Entity":
-                            break
-                
-                # If still not found, leave blank instead of "New Entity"
-                if not entity_name or entity_name == "New Entity":
-                    entity_name = ""
-            
-            processing_date = p.get("created_at", "").split("T")[0]
+                entity_name = p.get("license_entity_name") or ""
+
+            processing_date = (p.get("created_at") or "").split("T")[0]
             status = p.get("status")
             stock_id = p.get("stock_id")
-            
-            # Simple task completion logic (mock)
-            tasks = {"completed": 8, "total": 10} 
-            if status == "Done": tasks = {"completed": 10, "total": 10}
-            
+
+            # Counted from the activity logs as they are written (*_process_task_counts.sql)
+            tasks = {"completed": p.get("tasks_completed") or 0, "total": p.get("tasks_total") or 0}
+
             processes.append({
                 "id": int(p["id"]),
                 "stockId": stock_id,
                 "customerName": customer_name,
                 "entityName": entity_name,
-                "location": get_val("location") or "UAE",
+                "location": p.get("location") or "UAE",
                 "processingDate": processing_date,
                 "status": status,
                 "tasks": tasks
@@ -695,7 +990,8 @@ async def get_process_details_endpoint(process_id: str):
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured")
     try:
-        res = supabase.table("processes").select("details").eq("id", process_id).execute()
+        # Same document shape as before; the sections' items are assembled from their rows
+        res = await db.execute(supabase.table("process_documents").select("details").eq("id", process_id))
         if not res.data:
             raise HTTPException(status_code=404, detail="Process not found")
             
@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import os
+from typing import BinaryIO, Optional
+from urllib.parse import quote
+
+import httpx
+
+# Streams files to the Supabase Storage REST API in fixed-size chunks so memory use does not grow
+# with file size; objects above the resumable threshold go through the TUS endpoint in 6 MB parts.
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET", "zamp-uploads")
+# Supabase requires every TUS part except the last to be exactly 6 MB
+STORAGE_CHUNK_SIZE = 6 * 1024 * 1024
+STORAGE_RESUMABLE_THRESHOLD = int(os.getenv("STORAGE_RESUMABLE_THRESHOLD", str(STORAGE_CHUNK_SIZE)))
+STORAGE_TUS_RETRIES = int(os.getenv("STORAGE_TUS_RETRIES", "3"))
+# Largest file accepted for upload, and the most upload bytes buffered in memory across the process
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv("UPLOAD_MAX_INFLIGHT_BYTES", str(48 * 1024 * 1024)))
+
+_base_url: Optional[str] = None
+_api_key: Optional[str] = None
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+class StorageError(Exception):
+    """Non-success response from Supabase Storage"""
+
+    def __init__(self, status_code: int, detail: str = ""):
+        super().__init__(f"Storage returned status {status_code}: {detail[:200]}")
+        self.status_code = status_code
+
+
+class UploadTooLarge(Exception):
+    """The file exceeds UPLOAD_MAX_BYTES"""
+
+    def __init__(self, size: int):
+        super().__init__(f"Upload of {size} bytes exceeds the {UPLOAD_MAX_BYTES} byte limit")
+        self.size = size
+
+
+class ByteBudget:
+    """Caps the number of bytes held in memory by concurrent uploads"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.available = capacity
+        self._condition = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, size: int) -> int:
+        size = min(size, self.capacity)
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.available >= size)
+            self.available -= size
+        return size
+
+    async def release(self, size: int):
+        condition = self._get_condition()
+        async with condition:
+            self.available += size
+            condition.notify_all()
+
+
+inflight_bytes = ByteBudget(UPLOAD_MAX_INFLIGHT_BYTES)
+
+
+def configure(base_url: str, api_key: str):
+    global _base_url, _api_key
+    _base_url = base_url.rstrip("/") if base_url else None
+    _api_key = api_key
+
+
+def is_configured() -> bool:
+    return bool(_base_url and _api_key)
+
+
+def public_url(object_name: str) -> str:
+    return f"{_base_url}/storage/v1/object/public/{STORAGE_BUCKET}/{quote(object_name)}"
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _headers(**extra) -> dict:
+    return {"Authorization": f"Bearer {_api_key}", "apikey": _api_key, **extra}
+
+
+def _already_exists(response: httpx.Response) -> bool:
+    return response.status_code == 409 or (
+        response.status_code == 400 and ("Duplicate" in response.text or "already exists" in response.text)
+    )
+
+
+async def _read_chunk(fileobj: BinaryIO, size: int) -> bytes:
+    return await asyncio.to_thread(fileobj.read, size)
+
+
+async def _stream(fileobj: BinaryIO, size: int):
+    # Each chunk is reserved against the in-flight budget until the client asks for the next one.
+    # Only what is left to send is reserved, so a small file doesn't tie up a whole chunk
+    remaining = size
+    while remaining > 0:
+        chunk_size = min(STORAGE_CHUNK_SIZE, remaining)
+        reserved = await inflight_bytes.acquire(chunk_size)
+        try:
+            chunk = await _read_chunk(fileobj, chunk_size)
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+        finally:
+            await inflight_bytes.release(reserved)
+
+
+async def _upload_simple(fileobj: BinaryIO, size: int, object_name: str, content_type: str) -> bool:
+    client = await get_http_client()
+    response = await client.post(
+        f"{_base_url}/storage/v1/object/{STORAGE_BUCKET}/{quote(object_name)}",
+        content=_stream(fileobj, size),
+        headers=_headers(**{"Content-Type": content_type, "Content-Length": str(size), "x-upsert": "false"})
+    )
+    if _already_exists(response):
+        return False
+    if response.status_code >= 300:
+        raise StorageError(response.status_code, response.text)
+    return True
+
+
+def _tus_metadata(object_name: str, content_type: str) -> str:
+    fields = {"bucketName": STORAGE_BUCKET, "objectName": object_name, "contentType": content_type}
+    return ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in fields.items())
+
+
+async def _upload_resumable(fileobj: BinaryIO, size: int, object_name: str, content_type: str) -> bool:
+    client = await get_http_client()
+    tus_headers = {"Tus-Resumable": "1.0.0"}
+    response = await client.post(
+        f"{_base_url}/storage/v1/upload/resumable",
+        headers=_headers(**tus_headers, **{
+            "Upload-Length": str(size),
+            "Upload-Metadata": _tus_metadata(object_name, content_type),
+            "x-upsert": "false"
+        })
+    )
+    if _already_exists(response):
+        return False
+    if response.status_code != 201:
+        raise StorageError(response.status_code, response.text)
+    location = response.headers["Location"]
+
+    offset = 0
+    failures = 0
+    while offset < size:
+        chunk_size = min(STORAGE_CHUNK_SIZE, size - offset)
+        reserved = await inflight_bytes.acquire(chunk_size)
+        try:
+            await asyncio.to_thread(fileobj.seek, offset)
+            chunk = await _read_chunk(fileobj, chunk_size)
+            response = await client.patch(
+                location,
+                content=chunk,
+                headers=_headers(**tus_headers, **{
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream"
+                })
+            )
+            if response.status_code != 204:
+                raise StorageError(response.status_code, response.text)
+            offset = int(response.headers.get("Upload-Offset", offset + len(chunk)))
+            failures = 0
+        except (httpx.TransportError, StorageError) as e:
+            failures += 1
+            if failures > STORAGE_TUS_RETRIES or (isinstance(e, StorageError) and e.status_code < 500 and e.status_code != 409):
+                raise
+            # Resume from wherever the server says the upload got to
+            await asyncio.sleep(failures)
+            head = await client.head(location, headers=_headers(**tus_headers))
+            offset = int(head.headers.get("Upload-Offset", offset))
+        finally:
+            await inflight_bytes.release(reserved)
+    return True
+
+
+async def upload_fileobj(fileobj: BinaryIO, size: int, object_name: str, content_type: str = None) -> bool:
+    """
+    Stream a seekable file object to storage without reading it into memory
+
+    Args:
+        fileobj: Open binary file positioned at the start
+        size: Total size in bytes
+        object_name: Path inside the bucket
+        content_type: MIME type stored with the object
+
+    Returns:
+        bool: True if uploaded, False if an object already existed at that path
+
+    Raises:
+        UploadTooLarge: size exceeds UPLOAD_MAX_BYTES
+        StorageError: storage rejected the upload
+    """
+    if not is_configured():
+        raise Exception("Supabase not configured")
+    if size > UPLOAD_MAX_BYTES:
+        raise UploadTooLarge(size)
+    content_type = content_type or "application/octet-stream"
+    if size > STORAGE_RESUMABLE_THRESHOLD:
+        return await _upload_resumable(fileobj, size, object_name, content_type)
+    return await _upload_simple(fileobj, size, object_name, content_type)
+
+
+async def upload_path(path: str, object_name: str, content_type: str = None) -> bool:
+    """Stream a local file to storage (see upload_fileobj)"""
+    with open(path, "rb") as f:
+        return await upload_fileobj(f, os.path.getsize(path), object_name, content_type)
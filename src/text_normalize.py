@@ -0,0 +1,64 @@
+import re
+import unicodedata
+from typing import List, Set
+
+# Legal-form tokens dropped from the end of company names before comparing them.
+# Dots are removed before matching, so "L.L.C." becomes "llc". Only actual legal forms belong
+# here: words like "holding", "group" or "branch" tell entities apart and stay in the name.
+LEGAL_SUFFIXES = {
+    "llc", "fze", "fzco", "fzc", "fzllc", "fz", "dmcc", "dwc",
+    "ltd", "limited", "plc", "inc", "incorporated", "corp", "corporation",
+    "pjsc", "psc", "jsc", "pvt", "private", "llp", "lp", "gmbh", "ag", "sa", "sarl", "bv", "nv", "spa"
+}
+
+# Common transliteration variants of Arabic words in names and addresses
+TRANSLITERATIONS = {
+    "shaikh": "sheikh", "shaykh": "sheikh", "sh": "sheikh",
+    "jumeira": "jumeirah", "jumaira": "jumeirah", "jumairah": "jumeirah",
+    "mohammad": "mohammed", "muhammad": "mohammed", "mohamed": "mohammed", "muhammed": "mohammed", "mohd": "mohammed",
+    "ahmad": "ahmed", "mahmoud": "mahmood", "mahmud": "mahmood", "yousef": "yusuf", "yousuf": "yusuf", "youssef": "yusuf",
+    "abdallah": "abdullah", "abdulla": "abdullah", "hussain": "hussein", "husain": "hussein", "hasan": "hassan",
+    "rashed": "rashid", "zayid": "zayed", "khaleefa": "khalifa", "qusis": "qusais", "barshaa": "barsha",
+    "el": "al",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold(text: str) -> str:
+    """Lower-case, strip accents and punctuation, and collapse whitespace"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = text.replace("&", " and ").replace(".", "")
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_legal_name(name: str) -> str:
+    """
+    Canonical form of a company name for matching
+
+    e.g. "Trafco D.M.C.C." and "TRAFCO DMCC" both become "trafco"
+    """
+    tokens = fold(name).split()
+    if tokens and tokens[0] == "the":
+        tokens = tokens[1:]
+    # Strip legal forms from the end ("... FZ LLC", "... Trading L.L.C")
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of an already normalised string, padded so word starts weigh more"""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def tokens(text: str) -> List[str]:
+    return text.split() if text else []
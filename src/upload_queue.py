@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+UPLOAD_QUEUE_WORKERS = int(os.getenv("UPLOAD_QUEUE_WORKERS", "3"))
+UPLOAD_QUEUE_MAX_ATTEMPTS = int(os.getenv("UPLOAD_QUEUE_MAX_ATTEMPTS", "5"))
+# Exponential backoff between attempts: base * 2^(attempt - 1) seconds, capped, with jitter
+UPLOAD_QUEUE_BACKOFF_BASE = float(os.getenv("UPLOAD_QUEUE_BACKOFF_BASE", "1"))
+UPLOAD_QUEUE_BACKOFF_MAX = float(os.getenv("UPLOAD_QUEUE_BACKOFF_MAX", "30"))
+# How long shutdown waits for queued uploads before abandoning them
+UPLOAD_QUEUE_DRAIN_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_DRAIN_TIMEOUT", "30"))
+# Finished jobs kept for status polling
+UPLOAD_QUEUE_MAX_JOBS = int(os.getenv("UPLOAD_QUEUE_MAX_JOBS", "2000"))
+
+
+class UploadQueue:
+    """
+    Uploads local files to storage in the background with a fixed number of workers.
+
+    `upload(path, filename, content_type)` is an async callable that raises on failure; failed
+    uploads are retried with exponential backoff. `public_url(filename)` must be computable before
+    the upload happens, so callers can return the final URL straight away and poll status().
+    A job's optional `prepare(path)` runs once before the first attempt and returns the path to
+    upload instead (e.g. a compressed copy); if it fails the original file is uploaded.
+    """
+
+    def __init__(self, upload, public_url, workers: int = UPLOAD_QUEUE_WORKERS, max_attempts: int = UPLOAD_QUEUE_MAX_ATTEMPTS):
+        self.upload = upload
+        self.public_url = public_url
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._jobs: Dict[str, Dict] = OrderedDict()
+        self._stats = {"submitted": 0, "uploaded": 0, "retries": 0, "failed": 0}
+
+    def _ensure_started(self):
+        # Must run on the event loop; the server starts the queue at startup, this covers other callers
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+            print(f"Upload queue started with {self.workers} workers")
+
+    async def start(self):
+        self._ensure_started()
+
+    async def stop(self, timeout: float = UPLOAD_QUEUE_DRAIN_TIMEOUT):
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Upload queue: {self._queue.qsize()} uploads still pending at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(self, path: str, filename: str, content_type: str = None, on_uploaded=None, prepare=None, on_failed=None) -> Dict:
+        """
+        Queue `path` for upload as `filename`
+
+        `on_uploaded(job)`, if given, is called once the upload has succeeded, `on_failed(job)` once
+        it has run out of attempts. `prepare(path)`, if given, is awaited by the worker first
+        (status "processing") and returns the file to upload.
+
+        Returns:
+            dict: The job ({"id", "status", "public_url", ...}); status starts as "queued"
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "filename": filename,
+            "public_url": self.public_url(filename),
+            "attempts": 0,
+            "error": None,
+            "queued_at": time.time(),
+            "finished_at": None,
+            "_path": path,
+            "_content_type": content_type,
+            "_on_uploaded": on_uploaded,
+            "_prepare": prepare,
+            "_on_failed": on_failed,
+        }
+        self._jobs[job["id"]] = job
+        self._prune()
+        self._stats["submitted"] += 1
+        self._ensure_started()
+        self._queue.put_nowait(job["id"])
+        return self.status(job["id"])
+
+    def _prune(self):
+        # Forget the oldest finished jobs; pending ones are kept however many there are
+        excess = len(self._jobs) - UPLOAD_QUEUE_MAX_JOBS
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"]][:excess]
+        for job_id in finished:
+            del self._jobs[job_id]
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def stats(self):
+        pending = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "processing", "uploading", "retrying"))
+        return {**self._stats, "pending": pending, "workers": len(self._tasks)}
+
+    async def _worker(self, number: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job:
+                    await self._run(job)
+            except Exception as e:
+                print(f"Upload worker {number} crashed on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _prepare(self, job: Dict):
+        job["status"] = "processing"
+        try:
+            job["_path"] = await job["_prepare"](job["_path"]) or job["_path"]
+        except Exception as e:
+            print(f"Preparing {job['filename']} for upload failed, uploading the original: {e}")
+
+    async def _run(self, job: Dict):
+        if job["_prepare"]:
+            await self._prepare(job)
+        while True:
+            job["attempts"] += 1
+            job["status"] = "uploading"
+            try:
+                await self.upload(job["_path"], job["filename"], job["_content_type"])
+                job["status"] = "uploaded"
+                job["error"] = None
+                job["finished_at"] = time.time()
+                self._stats["uploaded"] += 1
+                if job["_on_uploaded"]:
+                    job["_on_uploaded"](self.status(job["id"]))
+                return
+            except Exception as e:
+                job["error"] = str(e)
+                if job["attempts"] >= self.max_attempts:
+                    job["status"] = "failed"
+                    job["finished_at"] = time.time()
+                    self._stats["failed"] += 1
+                    print(f"Upload of {job['filename']} failed after {job['attempts']} attempts: {e}")
+                    if job["_on_failed"]:
+                        job["_on_failed"](self.status(job["id"]))
+                    return
+                delay = min(UPLOAD_QUEUE_BACKOFF_MAX, UPLOAD_QUEUE_BACKOFF_BASE * 2 ** (job["attempts"] - 1))
+                job["status"] = "retrying"
+                self._stats["retries"] += 1
+                print(f"Upload of {job['filename']} failed (attempt {job['attempts']}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+# Recordings are post-processed with ffmpeg before upload: re-encoded at a lower bitrate, with the
+# idle frames at either end (page still loading, final page left open) trimmed, plus a poster image
+# and a keyframe strip for the dashboard preview. Without ffmpeg the raw recording is uploaded.
+FFMPEG_BIN = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg")
+VIDEO_PROCESSING_AVAILABLE = bool(FFMPEG_BIN)
+
+VIDEO_PROCESSING_WORKERS = int(os.getenv("VIDEO_PROCESSING_WORKERS", "2"))
+# VP9 constant quality (higher = smaller) with a bitrate ceiling
+VIDEO_CRF = int(os.getenv("VIDEO_CRF", "42"))
+VIDEO_MAX_BITRATE = os.getenv("VIDEO_MAX_BITRATE", "400k")
+VIDEO_TIMEOUT = float(os.getenv("VIDEO_TIMEOUT", "300"))
+# Stretches without visible change at least this long (seconds) at the start or end are cut
+IDLE_MIN_SECONDS = float(os.getenv("VIDEO_IDLE_MIN_SECONDS", "1.5"))
+# Kept on each side of a cut so the viewer still sees the page settle
+IDLE_PADDING_SECONDS = 0.5
+STRIP_FRAMES = int(os.getenv("VIDEO_STRIP_FRAMES", "6"))
+STRIP_FRAME_WIDTH = 320
+
+_FREEZE = re.compile(r"lavfi\.freezedetect\.freeze_(start|end): ([\d.]+)")
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=VIDEO_PROCESSING_WORKERS)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _run(args, timeout: float = VIDEO_TIMEOUT) -> subprocess.CompletedProcess:
+    return subprocess.run(args, capture_output=True, text=True, timeout=timeout, check=True)
+
+
+def detect_active_range(path: str) -> Tuple[float, float, float]:
+    """
+    Duration of the recording and the start/end (seconds) of the part where something changes
+
+    One decoding pass with ffmpeg's freezedetect; the duration comes from the same pass because
+    Playwright's webm files usually carry no duration header. Only freezes touching the start or
+    the end of the recording are trimmed.
+    """
+    result = _run([
+        FFMPEG_BIN, "-hide_banner", "-i", path, "-map", "0:v",
+        "-vf", f"freezedetect=n=-50dB:d={IDLE_MIN_SECONDS}", "-f", "null", "-"
+    ])
+    times = re.findall(r"time=(\d+):(\d+):([\d.]+)", result.stderr)
+    if not times:
+        return 0.0, 0.0, 0.0
+    hours, minutes, seconds = times[-1]
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    freezes = []
+    for kind, value in _FREEZE.findall(result.stderr):
+        if kind == "start":
+            freezes.append([float(value), duration])
+        elif freezes:
+            freezes[-1][1] = float(value)
+
+    start, end = 0.0, duration
+    for freeze_start, freeze_end in freezes:
+        if freeze_start <= 0.1:
+            start = max(0.0, freeze_end - IDLE_PADDING_SECONDS)
+        if freeze_end >= duration - 0.1:
+            end = min(duration, freeze_start + IDLE_PADDING_SECONDS)
+    if end - start < 1.0:
+        # Nothing moved at all (or the detection is off): keep the whole recording
+        return duration, 0.0, duration
+    return duration, start, end
+
+
+def process_video_sync(path: str, output_dir: str = None) -> Dict:
+    """
+    Worker: compress and trim a recording and render its poster and keyframe strip
+
+    Returns:
+        dict: {"video", "poster", "strip"} output paths (missing keys for outputs that failed),
+              plus "original_bytes", "processed_bytes", "trimmed_from" and "trimmed_to"
+    """
+    output_dir = output_dir or os.path.dirname(path)
+    base = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+    duration, start, end = detect_active_range(path)
+    result = {"original_bytes": os.path.getsize(path), "trimmed_from": round(start, 2), "trimmed_to": round(end, 2)}
+
+    video_out = f"{base}.compressed.webm"
+    trim = ["-ss", f"{start:.2f}", "-to", f"{end:.2f}"] if duration else []
+    _run([
+        FFMPEG_BIN, "-hide_banner", "-y", "-i", path, *trim, "-an",
+        "-c:v", "libvpx-vp9", "-crf", str(VIDEO_CRF), "-b:v", VIDEO_MAX_BITRATE,
+        "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1",
+        video_out
+    ])
+    if os.path.getsize(video_out) < result["original_bytes"]:
+        result["video"] = video_out
+        result["processed_bytes"] = os.path.getsize(video_out)
+    else:
+        os.remove(video_out)
+        result["processed_bytes"] = result["original_bytes"]
+
+    source = result.get("video", path)
+    active = (end - start) if duration else 0
+    # The last active frame shows the page the agent ended on, the most useful single image
+    poster_out = f"{base}.poster.jpg"
+    try:
+        _run([FFMPEG_BIN, "-hide_banner", "-y", "-sseof", "-0.5", "-i", source, "-frames:v", "1", "-q:v", "4", poster_out])
+        result["poster"] = poster_out
+    except Exception as e:
+        print(f"Poster frame for {path} failed: {e}")
+
+    strip_out = f"{base}.strip.jpg"
+    if active > 0:
+        try:
+            _run([
+                FFMPEG_BIN, "-hide_banner", "-y", "-i", source,
+                "-vf", f"fps={STRIP_FRAMES / active:.4f},scale={STRIP_FRAME_WIDTH}:-2,tile={STRIP_FRAMES}x1",
+                "-frames:v", "1", "-q:v", "5", strip_out
+            ])
+            result["strip"] = strip_out
+        except Exception as e:
+            print(f"Keyframe strip for {path} failed: {e}")
+    return result
+
+
+async def process_video(path: str) -> Optional[Dict]:
+    """
+    Post-process a recording in the process pool (see process_video_sync)
+
+    Returns None when ffmpeg is unavailable or processing fails; callers then use the original.
+    """
+    if not VIDEO_PROCESSING_AVAILABLE:
+        return None
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), process_video_sync, path)
+    except Exception as e:
+        print(f"Video post-processing of {path} failed: {e}")
+        return None
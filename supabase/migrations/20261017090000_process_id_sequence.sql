@@ -0,0 +1,50 @@
+-- Process IDs come from a sequence instead of counting every row in the backend.
+-- create_process allocates the ID and inserts the row in one statement, so /zamp/init is a
+-- single round trip and concurrent calls can never be handed the same ID.
+
+CREATE TABLE IF NOT EXISTS public.processes (
+    id text PRIMARY KEY,
+    stock_id text,
+    applicant_name text,
+    status text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    details jsonb
+);
+
+CREATE SEQUENCE IF NOT EXISTS public.process_id_seq AS bigint;
+
+-- Continue after the IDs handed out by the old count-based scheme
+SELECT setval(
+    'public.process_id_seq',
+    GREATEST(COALESCE(MAX(CASE WHEN id::text ~ '^[0-9]+$' THEN id::text::bigint END), 0), 1),
+    COALESCE(MAX(CASE WHEN id::text ~ '^[0-9]+$' THEN id::text::bigint END), 0) > 0
+)
+FROM public.processes;
+
+CREATE OR REPLACE FUNCTION public.create_process(
+    p_process_name text,
+    p_applicant_name text,
+    p_status text,
+    p_details jsonb
+) RETURNS text
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    new_id text := nextval('public.process_id_seq')::text;
+BEGIN
+    INSERT INTO public.processes (id, stock_id, applicant_name, status, created_at, details)
+    VALUES (
+        new_id,
+        p_process_name || ' #' || new_id,
+        p_applicant_name,
+        p_status,
+        now(),
+        jsonb_set(COALESCE(p_details, '{}'::jsonb), '{id}', to_jsonb(new_id))
+    );
+    RETURN new_id;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.create_process(text, text, text, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.create_process(text, text, text, jsonb) TO service_role;
@@ -0,0 +1,118 @@
+-- Activity logs, key details, artifacts and messages are stored as rows instead of arrays inside
+-- processes.details, so a log call writes one row instead of rewriting the whole document.
+-- processes.details keeps everything else (overview, section titles); process_documents
+-- assembles the legacy details shape on read.
+
+CREATE TABLE IF NOT EXISTS public.process_activity_logs (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    process_id text NOT NULL REFERENCES public.processes(id) ON DELETE CASCADE,
+    -- Logs with a stepId are updated in place; logs without one are appended
+    step_id text,
+    item jsonb NOT NULL,
+    UNIQUE (process_id, step_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.process_key_details (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    process_id text NOT NULL REFERENCES public.processes(id) ON DELETE CASCADE,
+    item jsonb NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_process_key_details_process ON public.process_key_details (process_id, id);
+
+CREATE TABLE IF NOT EXISTS public.process_artifacts (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    process_id text NOT NULL REFERENCES public.processes(id) ON DELETE CASCADE,
+    artifact_id text,
+    item jsonb NOT NULL,
+    UNIQUE (process_id, artifact_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.process_messages (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    process_id text NOT NULL REFERENCES public.processes(id) ON DELETE CASCADE,
+    item jsonb NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_process_messages_process ON public.process_messages (process_id, id);
+
+-- Only the backend (service role, which bypasses RLS) reads and writes these
+ALTER TABLE public.process_activity_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.process_key_details ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.process_artifacts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.process_messages ENABLE ROW LEVEL SECURITY;
+
+-- Move the existing arrays out of the details documents, keeping their order
+INSERT INTO public.process_activity_logs (process_id, step_id, item)
+SELECT p.id, e.item->>'stepId', e.item
+FROM public.processes p,
+     jsonb_array_elements(COALESCE(p.details->'sections'->'activityLogs'->'items', '[]'::jsonb)) WITH ORDINALITY AS e(item, n)
+ORDER BY p.id, e.n
+ON CONFLICT (process_id, step_id) DO NOTHING;
+
+INSERT INTO public.process_key_details (process_id, item)
+SELECT p.id, e.item
+FROM public.processes p,
+     jsonb_array_elements(COALESCE(p.details->'sections'->'keyDetails'->'items', '[]'::jsonb)) WITH ORDINALITY AS e(item, n)
+ORDER BY p.id, e.n;
+
+INSERT INTO public.process_artifacts (process_id, artifact_id, item)
+SELECT p.id, e.item->>'id', e.item
+FROM public.processes p,
+     jsonb_array_elements(COALESCE(p.details->'sections'->'sidebarArtifacts'->'items', '[]'::jsonb)) WITH ORDINALITY AS e(item, n)
+ORDER BY p.id, e.n
+ON CONFLICT (process_id, artifact_id) DO NOTHING;
+
+INSERT INTO public.process_messages (process_id, item, created_at)
+SELECT p.id, e.item, COALESCE((e.item->>'timestamp')::timestamptz, p.created_at, now())
+FROM public.processes p,
+     jsonb_array_elements(COALESCE(p.details->'sections'->'messages'->'items', '[]'::jsonb)) WITH ORDINALITY AS e(item, n)
+ORDER BY p.id, e.n;
+
+UPDATE public.processes
+SET details = details
+    #- '{sections,activityLogs,items}'
+    #- '{sections,keyDetails,items}'
+    #- '{sections,sidebarArtifacts,items}'
+    #- '{sections,messages,items}'
+WHERE details ? 'sections';
+
+-- The legacy details document: processes.details with each section's items filled from its rows
+CREATE OR REPLACE FUNCTION public.process_details(p_process_id text, p_details jsonb)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    WITH base AS (
+        SELECT COALESCE(p_details, jsonb_build_object('id', p_process_id)) AS details
+    )
+    SELECT base.details || jsonb_build_object('sections',
+        COALESCE(base.details->'sections', '{}'::jsonb) || jsonb_build_object(
+            'activityLogs',
+            COALESCE(base.details->'sections'->'activityLogs', '{"title": "Activity Logs"}'::jsonb)
+                || jsonb_build_object('items', COALESCE(
+                    (SELECT jsonb_agg(item ORDER BY id) FROM process_activity_logs WHERE process_id = p_process_id),
+                    '[]'::jsonb)),
+            'keyDetails',
+            COALESCE(base.details->'sections'->'keyDetails', '{"title": "Key Details"}'::jsonb)
+                || jsonb_build_object('items', COALESCE(
+                    (SELECT jsonb_agg(item ORDER BY id) FROM process_key_details WHERE process_id = p_process_id),
+                    '[]'::jsonb)),
+            'sidebarArtifacts',
+            COALESCE(base.details->'sections'->'sidebarArtifacts', '{"title": "Artifacts"}'::jsonb)
+                || jsonb_build_object('items', COALESCE(
+                    (SELECT jsonb_agg(item ORDER BY id) FROM process_artifacts WHERE process_id = p_process_id),
+                    '[]'::jsonb)),
+            'messages',
+            COALESCE(base.details->'sections'->'messages', '{"title": "Messages"}'::jsonb)
+                || jsonb_build_object('items', COALESCE(
+                    (SELECT jsonb_agg(item ORDER BY id) FROM process_messages WHERE process_id = p_process_id),
+                    '[]'::jsonb))
+        ))
+    FROM base
+$$;
+
+CREATE OR REPLACE VIEW public.process_documents
+WITH (security_invoker = true) AS
+SELECT p.id, p.stock_id, p.applicant_name, p.status, p.created_at, public.process_details(p.id, p.details) AS details
+FROM public.processes p;
@@ -0,0 +1,103 @@
+-- Each Zamp mutation is one function call: a single round trip, applied atomically in the
+-- database, so concurrent writers (reviewer and applicant, parallel steps) can't lose updates.
+-- Every function returns NULL/false when the process doesn't exist.
+
+-- /zamp/log: merge the log into its step (or append it), add its artifacts and the key details,
+-- and apply status / applicantName from the metadata
+CREATE OR REPLACE FUNCTION public.log_process_step(
+    p_process_id text,
+    p_step_id text,
+    p_log jsonb,
+    p_key_details jsonb DEFAULT NULL,
+    p_metadata jsonb DEFAULT NULL
+) RETURNS boolean
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM 1 FROM processes WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    -- A NULL step_id never conflicts, so logs without a step are always appended
+    INSERT INTO process_activity_logs (process_id, step_id, item)
+    VALUES (p_process_id, p_step_id, p_log)
+    ON CONFLICT (process_id, step_id) DO UPDATE SET item = process_activity_logs.item || EXCLUDED.item;
+
+    IF jsonb_typeof(p_log->'artifacts') = 'array' THEN
+        INSERT INTO process_artifacts (process_id, artifact_id, item)
+        SELECT p_process_id, a.item->>'id', a.item
+        FROM jsonb_array_elements(p_log->'artifacts') WITH ORDINALITY AS a(item, n)
+        ORDER BY a.n
+        ON CONFLICT (process_id, artifact_id) DO NOTHING;
+    END IF;
+
+    INSERT INTO process_key_details (process_id, item)
+    SELECT p_process_id, k.item
+    FROM jsonb_array_elements(
+        CASE jsonb_typeof(p_key_details)
+            WHEN 'array' THEN p_key_details
+            WHEN 'object' THEN jsonb_build_array(p_key_details)
+            ELSE '[]'::jsonb
+        END
+    ) WITH ORDINALITY AS k(item, n)
+    ORDER BY k.n;
+
+    IF p_metadata ? 'status' OR p_metadata ? 'applicantName' THEN
+        UPDATE processes SET
+            status = CASE WHEN p_metadata ? 'status' THEN p_metadata->>'status' ELSE status END,
+            applicant_name = CASE WHEN p_metadata ? 'applicantName' THEN p_metadata->>'applicantName' ELSE applicant_name END
+        WHERE id = p_process_id;
+    END IF;
+
+    RETURN true;
+END;
+$$;
+
+-- /zamp/message: append a message; returns it as stored
+CREATE OR REPLACE FUNCTION public.post_process_message(p_process_id text, p_message jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM 1 FROM processes WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO process_messages (process_id, item) VALUES (p_process_id, p_message);
+    RETURN p_message;
+END;
+$$;
+
+-- /zamp/approve: status Done, the approval log, and Done on the latest key details entry
+CREATE OR REPLACE FUNCTION public.approve_process(p_process_id text, p_log jsonb)
+RETURNS boolean
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE processes SET status = 'Done' WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    INSERT INTO process_activity_logs (process_id, item) VALUES (p_process_id, p_log);
+
+    UPDATE process_key_details SET item = item || '{"status": "Done"}'::jsonb
+    WHERE id = (SELECT max(id) FROM process_key_details WHERE process_id = p_process_id);
+    IF NOT FOUND THEN
+        INSERT INTO process_key_details (process_id, item) VALUES (p_process_id, '{"status": "Done"}'::jsonb);
+    END IF;
+
+    RETURN true;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.log_process_step(text, text, jsonb, jsonb, jsonb) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.post_process_message(text, jsonb) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.approve_process(text, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.log_process_step(text, text, jsonb, jsonb, jsonb) TO service_role;
+GRANT EXECUTE ON FUNCTION public.post_process_message(text, jsonb) TO service_role;
+GRANT EXECUTE ON FUNCTION public.approve_process(text, jsonb) TO service_role;
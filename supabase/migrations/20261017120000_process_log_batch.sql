@@ -0,0 +1,39 @@
+-- /zamp/log-batch and the log write buffer: apply a list of log entries to one process in a
+-- single call (one transaction), in order, with the same step upsert as log_process_step.
+-- Entries are {"stepId", "log", "keyDetails", "metadata", "artifacts"}; "artifacts" holds
+-- sidebar artifacts carried over when the buffer merged two updates of the same step.
+CREATE OR REPLACE FUNCTION public.log_process_steps(p_process_id text, p_entries jsonb)
+RETURNS boolean
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    entry jsonb;
+BEGIN
+    PERFORM 1 FROM processes WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    FOR entry IN SELECT e.item FROM jsonb_array_elements(p_entries) WITH ORDINALITY AS e(item, n) ORDER BY e.n LOOP
+        IF jsonb_typeof(entry->'artifacts') = 'array' THEN
+            INSERT INTO process_artifacts (process_id, artifact_id, item)
+            SELECT p_process_id, a.item->>'id', a.item
+            FROM jsonb_array_elements(entry->'artifacts') WITH ORDINALITY AS a(item, n)
+            ORDER BY a.n
+            ON CONFLICT (process_id, artifact_id) DO NOTHING;
+        END IF;
+        PERFORM log_process_step(
+            p_process_id,
+            entry->>'stepId',
+            COALESCE(entry->'log', '{}'::jsonb),
+            entry->'keyDetails',
+            entry->'metadata'
+        );
+    END LOOP;
+    RETURN true;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.log_process_steps(text, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.log_process_steps(text, jsonb) TO service_role;
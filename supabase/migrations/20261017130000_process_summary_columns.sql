@@ -0,0 +1,130 @@
+-- Summary fields the process list shows, kept on processes at write time so the list endpoint
+-- reads narrow columns instead of every process's logs and key details.
+-- Each holds the first value seen, matching how the list used to pick them (NULL = not seen yet):
+--   customer_name, entity_name, location: from the first key details entry with that key
+--   license_entity_name: "Business Name" of the first "Verified License Data" table artifact
+--                        on a "Document Verification Complete" log
+
+ALTER TABLE public.processes
+    ADD COLUMN IF NOT EXISTS customer_name text,
+    ADD COLUMN IF NOT EXISTS entity_name text,
+    ADD COLUMN IF NOT EXISTS license_entity_name text,
+    ADD COLUMN IF NOT EXISTS location text;
+
+-- Value of p_key in the first of p_items (an array of key details entries) that has it
+CREATE OR REPLACE FUNCTION public.key_detail_value(p_items jsonb, p_key text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT k.item->>p_key
+    FROM jsonb_array_elements(CASE WHEN jsonb_typeof(p_items) = 'array' THEN p_items ELSE '[]'::jsonb END)
+         WITH ORDINALITY AS k(item, n)
+    WHERE jsonb_typeof(k.item) = 'object' AND k.item ? p_key
+    ORDER BY k.n
+    LIMIT 1
+$$;
+
+-- Business name from a license verification log, NULL for any other log
+CREATE OR REPLACE FUNCTION public.verified_business_name(p_log jsonb)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT a.item->'data'->>'Business Name'
+    FROM jsonb_array_elements(CASE WHEN jsonb_typeof(p_log->'artifacts') = 'array' THEN p_log->'artifacts' ELSE '[]'::jsonb END)
+         WITH ORDINALITY AS a(item, n)
+    WHERE p_log->>'title' = 'Document Verification Complete'
+      AND a.item->>'label' = 'Verified License Data'
+      AND a.item->>'type' = 'table'
+      AND COALESCE(a.item->'data'->>'Business Name', '') <> ''
+    ORDER BY a.n
+    LIMIT 1
+$$;
+
+-- log_process_step as before, now also filling in the summary columns from what it wrote
+CREATE OR REPLACE FUNCTION public.log_process_step(
+    p_process_id text,
+    p_step_id text,
+    p_log jsonb,
+    p_key_details jsonb DEFAULT NULL,
+    p_metadata jsonb DEFAULT NULL
+) RETURNS boolean
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    key_items jsonb := CASE jsonb_typeof(p_key_details)
+        WHEN 'array' THEN p_key_details
+        WHEN 'object' THEN jsonb_build_array(p_key_details)
+        ELSE '[]'::jsonb
+    END;
+    stored_log jsonb;
+BEGIN
+    PERFORM 1 FROM processes WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    -- A NULL step_id never conflicts, so logs without a step are always appended
+    INSERT INTO process_activity_logs (process_id, step_id, item)
+    VALUES (p_process_id, p_step_id, p_log)
+    ON CONFLICT (process_id, step_id) DO UPDATE SET item = process_activity_logs.item || EXCLUDED.item
+    RETURNING item INTO stored_log;
+
+    IF jsonb_typeof(p_log->'artifacts') = 'array' THEN
+        INSERT INTO process_artifacts (process_id, artifact_id, item)
+        SELECT p_process_id, a.item->>'id', a.item
+        FROM jsonb_array_elements(p_log->'artifacts') WITH ORDINALITY AS a(item, n)
+        ORDER BY a.n
+        ON CONFLICT (process_id, artifact_id) DO NOTHING;
+    END IF;
+
+    INSERT INTO process_key_details (process_id, item)
+    SELECT p_process_id, k.item
+    FROM jsonb_array_elements(key_items) WITH ORDINALITY AS k(item, n)
+    ORDER BY k.n;
+
+    IF p_metadata ? 'status' OR p_metadata ? 'applicantName' THEN
+        UPDATE processes SET
+            status = CASE WHEN p_metadata ? 'status' THEN p_metadata->>'status' ELSE status END,
+            applicant_name = CASE WHEN p_metadata ? 'applicantName' THEN p_metadata->>'applicantName' ELSE applicant_name END
+        WHERE id = p_process_id;
+    END IF;
+
+    IF jsonb_array_length(key_items) > 0 OR stored_log->>'title' = 'Document Verification Complete' THEN
+        UPDATE processes SET
+            customer_name = COALESCE(customer_name, key_detail_value(key_items, 'customerName')),
+            entity_name = COALESCE(entity_name, key_detail_value(key_items, 'entityName')),
+            location = COALESCE(location, key_detail_value(key_items, 'location')),
+            license_entity_name = COALESCE(license_entity_name, verified_business_name(stored_log))
+        WHERE id = p_process_id;
+    END IF;
+
+    RETURN true;
+END;
+$$;
+
+-- Existing processes
+UPDATE public.processes p SET
+    customer_name = s.customer_name,
+    entity_name = s.entity_name,
+    location = s.location,
+    license_entity_name = s.license_entity_name
+FROM (
+    SELECT p2.id,
+        public.key_detail_value(k.items, 'customerName') AS customer_name,
+        public.key_detail_value(k.items, 'entityName') AS entity_name,
+        public.key_detail_value(k.items, 'location') AS location,
+        (SELECT public.verified_business_name(l.item)
+         FROM public.process_activity_logs l
+         WHERE l.process_id = p2.id AND l.item->>'title' = 'Document Verification Complete'
+           AND public.verified_business_name(l.item) IS NOT NULL
+         ORDER BY l.id
+         LIMIT 1) AS license_entity_name
+    FROM public.processes p2
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(item ORDER BY id) AS items FROM public.process_key_details WHERE process_id = p2.id
+    ) k ON true
+) s
+WHERE p.id = s.id;
@@ -0,0 +1,148 @@
+-- Task progress for the process list, derived from the activity logs instead of mocked from
+-- the status: every activity log row is a task, and it is done once its status is "success"
+-- or "completed" (a step logged as "processing" and later updated counts once, as done).
+-- log_process_step (and so log_process_steps) and approve_process adjust the counts by the old
+-- and new status of the one row they write, so a write costs the same however long the
+-- process's history is.
+
+ALTER TABLE public.processes
+    ADD COLUMN IF NOT EXISTS tasks_completed integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS tasks_total integer NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION public.is_done_status(p_status text)
+RETURNS boolean
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(p_status IN ('success', 'completed'), false)
+$$;
+
+-- log_process_step as in *_process_summary_columns.sql, now also keeping the task counts
+CREATE OR REPLACE FUNCTION public.log_process_step(
+    p_process_id text,
+    p_step_id text,
+    p_log jsonb,
+    p_key_details jsonb DEFAULT NULL,
+    p_metadata jsonb DEFAULT NULL
+) RETURNS boolean
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    key_items jsonb := CASE jsonb_typeof(p_key_details)
+        WHEN 'array' THEN p_key_details
+        WHEN 'object' THEN jsonb_build_array(p_key_details)
+        ELSE '[]'::jsonb
+    END;
+    stored_log jsonb;
+    old_log jsonb;
+BEGIN
+    PERFORM 1 FROM processes WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    -- Upsert that knows the step's previous log, for the task counts. The existing row is
+    -- locked before it is read; if a concurrent call inserts the step first, the insert below
+    -- does nothing and the loop goes round to update that row instead.
+    -- A NULL step_id never conflicts, so logs without a step are always appended.
+    LOOP
+        old_log := NULL;
+        IF p_step_id IS NOT NULL THEN
+            SELECT item INTO old_log FROM process_activity_logs
+            WHERE process_id = p_process_id AND step_id = p_step_id
+            FOR UPDATE;
+        END IF;
+        IF old_log IS NOT NULL THEN
+            UPDATE process_activity_logs SET item = item || p_log
+            WHERE process_id = p_process_id AND step_id = p_step_id
+            RETURNING item INTO stored_log;
+            EXIT;
+        END IF;
+        INSERT INTO process_activity_logs (process_id, step_id, item)
+        VALUES (p_process_id, p_step_id, p_log)
+        ON CONFLICT (process_id, step_id) DO NOTHING
+        RETURNING item INTO stored_log;
+        EXIT WHEN FOUND;
+    END LOOP;
+
+    IF jsonb_typeof(p_log->'artifacts') = 'array' THEN
+        INSERT INTO process_artifacts (process_id, artifact_id, item)
+        SELECT p_process_id, a.item->>'id', a.item
+        FROM jsonb_array_elements(p_log->'artifacts') WITH ORDINALITY AS a(item, n)
+        ORDER BY a.n
+        ON CONFLICT (process_id, artifact_id) DO NOTHING;
+    END IF;
+
+    INSERT INTO process_key_details (process_id, item)
+    SELECT p_process_id, k.item
+    FROM jsonb_array_elements(key_items) WITH ORDINALITY AS k(item, n)
+    ORDER BY k.n;
+
+    IF p_metadata ? 'status' OR p_metadata ? 'applicantName' THEN
+        UPDATE processes SET
+            status = CASE WHEN p_metadata ? 'status' THEN p_metadata->>'status' ELSE status END,
+            applicant_name = CASE WHEN p_metadata ? 'applicantName' THEN p_metadata->>'applicantName' ELSE applicant_name END
+        WHERE id = p_process_id;
+    END IF;
+
+    IF jsonb_array_length(key_items) > 0 OR stored_log->>'title' = 'Document Verification Complete' THEN
+        UPDATE processes SET
+            customer_name = COALESCE(customer_name, key_detail_value(key_items, 'customerName')),
+            entity_name = COALESCE(entity_name, key_detail_value(key_items, 'entityName')),
+            location = COALESCE(location, key_detail_value(key_items, 'location')),
+            license_entity_name = COALESCE(license_entity_name, verified_business_name(stored_log))
+        WHERE id = p_process_id;
+    END IF;
+
+    UPDATE processes SET
+        tasks_total = tasks_total + CASE WHEN old_log IS NULL THEN 1 ELSE 0 END,
+        tasks_completed = tasks_completed
+            + is_done_status(stored_log->>'status')::integer
+            - is_done_status(old_log->>'status')::integer
+    WHERE id = p_process_id;
+
+    RETURN true;
+END;
+$$;
+
+-- approve_process as in *_process_mutation_functions.sql, now also counting the approval log as a task
+CREATE OR REPLACE FUNCTION public.approve_process(p_process_id text, p_log jsonb)
+RETURNS boolean
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE processes SET
+        status = 'Done',
+        tasks_total = tasks_total + 1,
+        tasks_completed = tasks_completed + is_done_status(p_log->>'status')::integer
+    WHERE id = p_process_id;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    INSERT INTO process_activity_logs (process_id, item) VALUES (p_process_id, p_log);
+
+    UPDATE process_key_details SET item = item || '{"status": "Done"}'::jsonb
+    WHERE id = (SELECT max(id) FROM process_key_details WHERE process_id = p_process_id);
+    IF NOT FOUND THEN
+        INSERT INTO process_key_details (process_id, item) VALUES (p_process_id, '{"status": "Done"}'::jsonb);
+    END IF;
+
+    RETURN true;
+END;
+$$;
+
+-- Existing processes
+UPDATE public.processes p SET
+    tasks_completed = t.completed,
+    tasks_total = t.total
+FROM (
+    SELECT process_id,
+           count(*) FILTER (WHERE public.is_done_status(item->>'status')) AS completed,
+           count(*) AS total
+    FROM public.process_activity_logs
+    GROUP BY process_id
+) t
+WHERE p.id = t.process_id;
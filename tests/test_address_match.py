@@ -0,0 +1,31 @@
+from address_match import labelled_numbers, match_addresses_local, score_addresses
+
+
+def test_numbers_are_bound_to_their_labels():
+    assert labelled_numbers("Unit 5, Building 12, 3rd Floor, DIC") == {("unit", "5"), ("building", "12"), ("floor", "3")}
+    assert labelled_numbers("Office No. 303, PO Box 1234") == {("unit", "303")}
+
+
+def test_swapped_unit_and_building_numbers_are_not_a_local_match():
+    result = score_addresses("Unit 5, Building 12, DIC", "Unit 12, Building 5, DIC")
+    assert result["score"] < 0.85
+    assert match_addresses_local("Unit 5, Building 12, DIC", "Unit 12, Building 5, DIC") is None
+    assert match_addresses_local("Flat 5, Villa 12, JVC", "Villa 5, Flat 12, JVC") is None
+
+
+def test_same_unit_in_different_wording_still_matches():
+    result = match_addresses_local("Office 303, Building 12, Dubai Internet City", "Unit 303, Bldg 12, DIC, Dubai")
+    assert result and result["match"] is True
+
+
+def test_contradicting_facts_are_rejected():
+    assert match_addresses_local("Office 1, Marina Plaza, Dubai", "Office 1, Marina Plaza, Sharjah")["match"] is False
+    assert match_addresses_local("PO Box 1234, Dubai", "PO Box 5678, Dubai")["match"] is False
+
+
+def test_emirate_only_address_is_left_to_the_model():
+    assert match_addresses_local("Dubai", "Business Bay, Dubai") is None
+    assert match_addresses_local("", "Office 303, Building 12, Dubai Internet City") is None
+    assert match_addresses_local("Dubai", "Dubai") is None
+    # A different emirate is still a confident mismatch
+    assert match_addresses_local("Sharjah", "Business Bay, Dubai")["match"] is False
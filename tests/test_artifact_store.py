@@ -0,0 +1,20 @@
+import os
+
+import artifact_store
+
+
+def test_repository_recordings_are_never_scanned():
+    src_videos = os.path.join(os.path.dirname(os.path.abspath(artifact_store.__file__)), "videos")
+    roots = [os.path.abspath(directory) for directory, _ in artifact_store.ARTIFACT_ROOTS]
+    assert src_videos not in roots
+    assert os.path.abspath(".") not in roots
+
+
+def test_scan_adopts_files_under_the_roots_only(tmp_path):
+    runtime = tmp_path / "videos"
+    runtime.mkdir()
+    (runtime / "recording.webm").write_bytes(b"x" * 10)
+    (tmp_path / "debug_error_1.png").write_bytes(b"x" * 10)
+    store = artifact_store.ArtifactStore(max_bytes=1000, roots=[(str(runtime), "*")])
+    store.scan()
+    assert store.stats()["bytes"] == 10
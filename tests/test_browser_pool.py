@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from browser_pool import BrowserPool
+
+
+class SlowBrowser:
+    def __init__(self, close_delay):
+        self.close_delay = close_delay
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        return SlowContext()
+
+    async def close(self):
+        await asyncio.sleep(self.close_delay)
+        self.connected = False
+
+
+class SlowContext:
+    async def close(self):
+        pass
+
+
+class SlowEngine:
+    def __init__(self, launch_delay, close_delay=0.0):
+        self.launch_delay = launch_delay
+        self.close_delay = close_delay
+        self.launches = 0
+
+    async def launch(self, **options):
+        self.launches += 1
+        await asyncio.sleep(self.launch_delay)
+        return SlowBrowser(self.close_delay)
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.firefox = SlowEngine(launch_delay=0.5)
+        self.chromium = SlowEngine(launch_delay=0.0, close_delay=0.5)
+
+
+def test_slow_launch_or_close_does_not_block_other_engines():
+    async def run():
+        pool = BrowserPool(size=4, max_jobs=1)
+        pool._playwright = FakePlaywright()
+        loop = asyncio.get_running_loop()
+
+        async def job(engine):
+            async with pool.new_context(engine):
+                pass
+            return loop.time()
+
+        started = loop.time()
+        slow_launch = asyncio.create_task(job("firefox"))
+        await asyncio.sleep(0.01)
+        # chromium launches instantly, and each job retires its browser (max_jobs=1), so these
+        # also recycle chromium while firefox is still launching
+        chromium_done = [await job("chromium") for _ in range(3)]
+        firefox_done = await slow_launch
+        return started, chromium_done, firefox_done, pool
+
+    started, chromium_done, firefox_done, pool = asyncio.run(run())
+    assert chromium_done[-1] - started < 0.3
+    assert firefox_done - started >= 0.5
+    assert pool._playwright.chromium.launches == 3
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import db
+from log_buffer import LogCoalescer
+
+# Latency of one simulated Supabase round trip
+ROUND_TRIP = 0.05
+CONCURRENT_LOGS = 16
+
+
+class FakeRpc:
+    """Stands in for a supabase-py rpc builder: execute() blocks like the real sync client"""
+
+    def __init__(self, calls, params):
+        self.calls = calls
+        self.params = params
+
+    def execute(self):
+        time.sleep(ROUND_TRIP)
+        self.calls.append(self.params["p_process_id"])
+        return type("Response", (), {"data": True})()
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        assert name == "log_process_steps"
+        return FakeRpc(self.calls, params)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Sized here rather than read from SUPABASE_MAX_WORKERS, which the environment may lower
+    executor = ThreadPoolExecutor(max_workers=CONCURRENT_LOGS, thread_name_prefix="supabase")
+    monkeypatch.setattr(db, "_executor", executor)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def pooled_writer(client):
+    # Same call as server_api.write_log_entries, the flush behind /zamp/log
+    async def write_log_entries(process_id, entries):
+        res = await db.execute(client.rpc("log_process_steps", {"p_process_id": process_id, "p_entries": entries}))
+        return bool(res.data)
+    return write_log_entries
+
+
+def serial_writer(client):
+    # What the endpoint did before: the blocking call ran on the event loop, one at a time
+    async def write_log_entries(process_id, entries):
+        res = client.rpc("log_process_steps", {"p_process_id": process_id, "p_entries": entries}).execute()
+        return bool(res.data)
+    return write_log_entries
+
+
+async def zamp_logs(log_buffer):
+    # One /zamp/log call for each of CONCURRENT_LOGS processes, as they arrive together
+    return await asyncio.gather(*(
+        log_buffer.submit(f"process-{i}", {"stepId": "step-1", "log": {"status": "in_progress"}})
+        for i in range(CONCURRENT_LOGS)
+    ))
+
+
+def timed(writer):
+    client = FakeClient()
+
+    async def run():
+        return await zamp_logs(LogCoalescer(writer(client), window=0.01))
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+    return time.monotonic() - started, results, client.calls
+
+
+def test_concurrent_log_writes_scale_with_the_pool(pool):
+    serial_time, serial_results, serial_calls = timed(serial_writer)
+    pooled_time, pooled_results, pooled_calls = timed(pooled_writer)
+
+    assert pooled_results == serial_results == [True] * CONCURRENT_LOGS
+    assert sorted(pooled_calls) == sorted(serial_calls) == sorted(f"process-{i}" for i in range(CONCURRENT_LOGS))
+    assert serial_time >= CONCURRENT_LOGS * ROUND_TRIP
+    # Round trips overlap on the pool instead of queueing behind each other
+    assert pooled_time < serial_time / 4, f"pooled {pooled_time:.3f}s vs serial {serial_time:.3f}s"
+
+
+def test_blocking_calls_leave_the_event_loop_free(pool):
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(ROUND_TRIP / 10)
+
+        task = asyncio.create_task(ticker())
+        await zamp_logs(LogCoalescer(pooled_writer(FakeClient()), window=0))
+        task.cancel()
+        return ticks
+
+    # The loop kept running other work while the round trips were in flight
+    assert asyncio.run(run()) >= 5
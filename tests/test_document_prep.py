@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+fitz = pytest.importorskip("fitz")
+
+import document_prep
+
+
+def _pdf_with_codes(path, urls):
+    # One A4 page per entry: a QR code with that URL, or a blank page for None
+    encoder = cv2.QRCodeEncoder.create()
+    with fitz.open() as document:
+        for index, url in enumerate(urls):
+            page = document.new_page()
+            if url:
+                image = cv2.resize(encoder.encode(url), None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+                image_path = f"{path}.{index}.png"
+                cv2.imwrite(image_path, image)
+                page.insert_image(fitz.Rect(150, 300, 450, 600), filename=image_path)
+        document.save(path)
+    return str(path)
+
+
+def _run(coroutine):
+    try:
+        return asyncio.run(coroutine)
+    finally:
+        document_prep.shutdown()
+
+
+def test_license_url_wins_over_earlier_pages(tmp_path):
+    path = _pdf_with_codes(tmp_path / "license.pdf", ["https://example.com/brochure", None, "https://invest.dubai.ae/license/123"])
+    assert _run(document_prep.scan_document(path)) == "https://invest.dubai.ae/license/123"
+
+
+def test_other_urls_are_taken_in_page_order(tmp_path):
+    path = _pdf_with_codes(tmp_path / "brochure.pdf", [None, "https://example.com/first", "https://example.com/second"])
+    assert _run(document_prep.scan_document(path)) == "https://example.com/first"
+
+
+def test_multi_page_pdfs_go_to_the_model_whole(tmp_path):
+    multi = _pdf_with_codes(tmp_path / "multi.pdf", [None, None])
+    single = _pdf_with_codes(tmp_path / "single.pdf", [None])
+    assert _run(document_prep.prepare_for_model(multi)) == multi
+    assert _run(document_prep.prepare_for_model(single)) == f"{single}.model.jpg"
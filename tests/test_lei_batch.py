@@ -0,0 +1,117 @@
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+
+import lei_api
+
+
+def make_code():
+    # Fresh codes per test, so the persistent record cache never answers for them
+    return uuid.uuid4().hex[:20].upper()
+
+
+def lei_record(code, parent_url=None):
+    record = {
+        "id": code,
+        "attributes": {
+            "entity": {"legalName": {"name": f"Company {code}"}, "legalAddress": {"country": "AE"}, "category": "GENERAL"},
+            "registration": {"status": "ISSUED"},
+        },
+        "relationships": {},
+    }
+    if parent_url:
+        record["relationships"]["ultimate-parent"] = {"links": {"related": parent_url}}
+    return record
+
+
+class FakeGleif:
+    """GLEIF API stand-in: serves `records`, and answers each parent URL with a parent entity"""
+
+    def __init__(self, records, fail_codes=(), hold_codes=()):
+        self.records = {record["id"]: record for record in records}
+        self.fail_codes = set(fail_codes)
+        self.hold_codes = set(hold_codes)
+        self.release = asyncio.Event()
+        self.batch_queries = []
+        self.parent_requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/lei-records"):
+            codes = request.url.params["filter[lei]"].split(",")
+            self.batch_queries.append(codes)
+            if self.hold_codes & set(codes):
+                await self.release.wait()
+            if self.fail_codes & set(codes):
+                return httpx.Response(500)
+            return httpx.Response(200, json={"data": [self.records[code] for code in codes if code in self.records]})
+        self.parent_requests.append(str(request.url))
+        return httpx.Response(200, json={"data": {"attributes": {"entity": {"legalName": {"name": "Parent Holding"}}}}})
+
+
+@pytest.fixture
+def gleif(monkeypatch):
+    monkeypatch.setattr(lei_api, "get_index", lambda: None)
+    monkeypatch.setattr(lei_api, "GLEIF_API_URL", "http://gleif.test/api/v1")
+
+    def install(fake):
+        monkeypatch.setattr(lei_api, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(fake)))
+        return fake
+
+    return install
+
+
+async def collect(codes):
+    return [json.loads(line) async for line in lei_api.extract_lei_info_batch_ndjson(codes)]
+
+
+def test_codes_are_queried_in_chunks_of_at_most_200(gleif, monkeypatch):
+    monkeypatch.setattr(lei_api, "GLEIF_BATCH_SIZE", 200)
+    codes = [make_code() for _ in range(450)]
+    fake = gleif(FakeGleif([lei_record(code) for code in codes]))
+    # Duplicates are looked up once
+    rows = asyncio.run(collect(codes + codes[:10]))
+    assert sorted(len(query) for query in fake.batch_queries) == [50, 200, 200]
+    assert sorted(row["LEI CODE"] for row in rows) == sorted(codes)
+    assert all(row["LEI STATUS"] == "ISSUED" for row in rows)
+
+
+def test_shared_parents_are_fetched_once(gleif):
+    parent_url = f"http://gleif.test/api/v1/lei-records/{make_code()}/ultimate-parent"
+    codes = [make_code() for _ in range(5)]
+    fake = gleif(FakeGleif([lei_record(code, parent_url) for code in codes]))
+    rows = asyncio.run(collect(codes))
+    assert fake.parent_requests == [parent_url]
+    assert {row["ULTIMATE PARENT"] for row in rows} == {"Parent Holding"}
+
+
+def test_not_found_codes_and_upstream_errors_get_rows(gleif, monkeypatch):
+    monkeypatch.setattr(lei_api, "GLEIF_BATCH_SIZE", 2)
+    monkeypatch.setattr(lei_api, "GLEIF_BATCH_CONCURRENCY", 1)
+    found, missing, failing, failing_too = make_code(), make_code(), make_code(), make_code()
+    gleif(FakeGleif([lei_record(found)], fail_codes=[failing]))
+    rows = {row["LEI CODE"]: row for row in asyncio.run(collect([found, missing, failing, failing_too]))}
+    assert rows[found]["LEGAL NAME"] == f"Company {found}"
+    assert rows[missing]["LEI STATUS"] == "Not Found"
+    assert rows[failing]["LEI STATUS"] == rows[failing_too]["LEI STATUS"] == "Error"
+    assert "500" in rows[failing]["error"]
+
+
+def test_chunks_are_streamed_as_they_complete(gleif, monkeypatch):
+    monkeypatch.setattr(lei_api, "GLEIF_BATCH_SIZE", 2)
+    fast, slow = [make_code(), make_code()], [make_code(), make_code()]
+    fake = gleif(FakeGleif([lei_record(code) for code in fast + slow], hold_codes=slow))
+
+    async def run():
+        lines = lei_api.extract_lei_info_batch_ndjson(slow + fast)
+        # The slow chunk is still waiting on GLEIF, yet the fast chunk's rows already arrive
+        first = [json.loads(await asyncio.wait_for(lines.__anext__(), 2)) for _ in range(2)]
+        fake.release.set()
+        rest = [json.loads(line) async for line in lines]
+        return first, rest
+
+    first, rest = asyncio.run(run())
+    assert [row["LEI CODE"] for row in first] == fast
+    assert [row["LEI CODE"] for row in rest] == slow
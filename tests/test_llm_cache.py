@@ -0,0 +1,31 @@
+import asyncio
+import uuid
+
+import pytest
+
+from llm_cache import cached_generate, parse_verdict, verdict_list_parser
+
+
+def test_badly_shaped_replies_are_not_cached():
+    prompt = f"Compare {uuid.uuid4()}"
+    replies = iter(['{"reason": "no verdict"}', '{"match": true, "reason": "same"}'])
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return next(replies)
+
+    with pytest.raises(ValueError):
+        asyncio.run(cached_generate("match_names", "stub", prompt, generate, parse=parse_verdict))
+    assert asyncio.run(cached_generate("match_names", "stub", prompt, generate, parse=parse_verdict))["match"] is True
+    # Served from the cache now
+    assert asyncio.run(cached_generate("match_names", "stub", prompt, generate, parse=parse_verdict))["match"] is True
+    assert len(calls) == 2
+
+
+def test_verdict_lists_must_have_one_verdict_per_pair():
+    parse = verdict_list_parser(2)
+    assert parse('```json\n[{"match": true}, {"match": false}]\n```') == [{"match": True}, {"match": False}]
+    for reply in ('[{"match": true}]', '{"match": true}', '[{"match": true}, {"reason": "?"}]', '[{"match": "yes"}, {"match": false}]'):
+        with pytest.raises(ValueError):
+            parse(reply)
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import uuid
+
+import llm_stub
+from llm_stream import stream_events
+from llm_stub import StubModel
+
+
+def _parse(events):
+    parsed = []
+    for event in events:
+        lines = event.strip().splitlines()
+        name = lines[0][len("event: "):] if lines[0].startswith("event: ") else None
+        parsed.append((name, json.loads(lines[-1][len("data: "):])))
+    return parsed
+
+
+def test_completed_stream_is_replayed_from_cache(monkeypatch):
+    monkeypatch.setattr(llm_stub, "STUB_CHUNK_DELAY", 0)
+    prompt = f"Help\nHow do I upload a license? {uuid.uuid4()}"
+    streams = []
+
+    async def start():
+        stream = await StubModel().generate_content_async(prompt, stream=True)
+        streams.append(stream)
+        return stream
+
+    async def connected():
+        return False
+
+    async def collect():
+        return [event async for event in stream_events("chat_help", "stub", prompt, start, connected)]
+
+    first = _parse(asyncio.run(collect()))
+    answer = "".join(data["text"] for name, data in first if name is None)
+    assert answer == StubModel()._answer(prompt)
+    assert first[-1] == ("done", {"cached": False})
+
+    second = _parse(asyncio.run(collect()))
+    assert second == [(None, {"text": answer}), ("done", {"cached": True})]
+    assert len(streams) == 1
+
+
+def test_disconnect_closes_the_stream_and_caches_nothing(monkeypatch):
+    monkeypatch.setattr(llm_stub, "STUB_CHUNK_DELAY", 0)
+    prompt = f"Help\nWhat documents do I need? {uuid.uuid4()}"
+    streams = []
+    checks = 0
+
+    async def start():
+        stream = await StubModel().generate_content_async(prompt, stream=True)
+        streams.append(stream)
+        return stream
+
+    async def disconnected_after_two_chunks():
+        nonlocal checks
+        checks += 1
+        return checks > 2
+
+    async def collect():
+        return [event async for event in stream_events("chat_help", "stub", prompt, start, disconnected_after_two_chunks)]
+
+    events = _parse(asyncio.run(collect()))
+    assert len(events) == 2 and all(name is None for name, _ in events)
+    assert streams[0].closed
+
+    # Nothing was cached, so the next request generates again
+    checks = -100
+    asyncio.run(collect())
+    assert len(streams) == 2
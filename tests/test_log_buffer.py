@@ -0,0 +1,117 @@
+import asyncio
+
+from log_buffer import LogCoalescer, coalesce, merge_entries
+
+
+def entry(step_id, **log):
+    return {"stepId": step_id, "log": log, "keyDetails": None, "metadata": None}
+
+
+class RecordingFlush:
+    """Flush callable that records each write and how long it overlapped with others"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.writes = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, process_id, entries):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.writes.append((process_id, [e["log"] for e in entries]))
+        self.active -= 1
+        return True
+
+
+def test_merge_entries_applies_the_later_entry_on_top():
+    earlier = {"stepId": "s1", "log": {"status": "processing", "artifacts": [{"id": "a1"}]},
+               "keyDetails": {"customerName": "Jane"}, "metadata": {"status": "In Progress"}}
+    later = {"stepId": "s1", "log": {"status": "success", "artifacts": [{"id": "a2"}]},
+             "keyDetails": [{"location": "Dubai"}], "metadata": {"applicantName": "Jane"}}
+    merged = merge_entries(earlier, later)
+    assert merged["log"] == {"status": "success", "artifacts": [{"id": "a2"}]}
+    # The earlier log's artifacts still reach the sidebar
+    assert merged["artifacts"] == [{"id": "a1"}]
+    assert merged["keyDetails"] == [{"customerName": "Jane"}, {"location": "Dubai"}]
+    assert merged["metadata"] == {"status": "In Progress", "applicantName": "Jane"}
+
+
+def test_coalesce_merges_steps_and_keeps_order():
+    entries = [entry("s1", n=1), entry(None, n=2), entry("s2", n=3), entry("s1", n=4), entry(None, n=5)]
+    assert [e["log"]["n"] for e in coalesce(entries)] == [4, 2, 3, 5]
+
+
+def test_entries_within_the_window_are_written_together():
+    async def run():
+        flush = RecordingFlush()
+        buffer = LogCoalescer(flush, window=0.05, max_entries=100)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(
+            buffer.submit("p1", entry("s1", status="processing")),
+            buffer.submit("p1", entry("s1", status="success")),
+            buffer.submit("p1", entry("s2", status="processing")),
+        )
+        return flush, results, loop.time() - started
+
+    flush, results, elapsed = asyncio.run(run())
+    assert results == [True, True, True]
+    assert flush.writes == [("p1", [{"status": "success"}, {"status": "processing"}])]
+    assert 0.05 <= elapsed < 0.5
+
+
+def test_full_buffer_is_written_without_waiting_for_the_window():
+    async def run():
+        flush = RecordingFlush()
+        buffer = LogCoalescer(flush, window=10, max_entries=2)
+        await asyncio.wait_for(asyncio.gather(buffer.submit("p1", entry("s1")), buffer.submit("p1", entry("s2"))), 1)
+        return flush
+
+    assert len(asyncio.run(run()).writes) == 1
+
+
+def test_writes_for_a_process_never_overlap_or_reorder():
+    async def run():
+        flush = RecordingFlush(delay=0.05)
+        buffer = LogCoalescer(flush, window=0.01, max_entries=100)
+        first = asyncio.create_task(buffer.submit("p1", entry("s1", status="processing")))
+        # Lands in a second buffer while the first one is still being written
+        await asyncio.sleep(0.03)
+        second = asyncio.create_task(buffer.submit("p1", entry("s1", status="success")))
+        await asyncio.gather(first, second)
+        return flush
+
+    flush = asyncio.run(run())
+    assert flush.max_active == 1
+    assert flush.writes == [("p1", [{"status": "processing"}]), ("p1", [{"status": "success"}])]
+
+
+def test_direct_writes_follow_entries_already_submitted():
+    async def run():
+        flush = RecordingFlush(delay=0.01)
+        buffer = LogCoalescer(flush, window=10, max_entries=100)
+        submitted = asyncio.create_task(buffer.submit("p1", entry("s1", status="processing")))
+        await asyncio.sleep(0)
+        assert await buffer.write("p1", [entry("s1", status="success")])
+        await submitted
+        return flush
+
+    flush = asyncio.run(run())
+    assert flush.writes == [("p1", [{"status": "processing"}]), ("p1", [{"status": "success"}])]
+
+
+def test_a_cancelled_caller_does_not_abandon_the_write():
+    async def run():
+        flush = RecordingFlush(delay=0.02)
+        buffer = LogCoalescer(flush, window=0.01, max_entries=100)
+        caller = asyncio.create_task(buffer.submit("p1", entry("s1")))
+        await asyncio.sleep(0.015)
+        caller.cancel()
+        await buffer.flush_all()
+        return flush, buffer.stats()
+
+    flush, stats = asyncio.run(run())
+    assert flush.writes == [("p1", [{}])]
+    assert stats["pending_processes"] == 0 and stats["writing_processes"] == 0
@@ -0,0 +1,42 @@
+import pytest
+
+from name_match import match_names_local, prepare_name, score_matrix, score_names
+
+
+def test_particles_are_dropped_from_person_names_only():
+    assert prepare_name("Mohammed bin Rashid Al Maktoum") == ("mohammed", "rashid", "maktoum")
+    assert prepare_name("Abu Dhabi Commercial Bank") == ("abu", "dhabi", "commercial", "bank")
+    assert prepare_name("Bin Hendi Enterprises LLC") == ("bin", "hendi", "enterprises")
+
+
+def test_transliterated_person_names_match():
+    assert match_names_local("Mohammed bin Rashid Al Maktoum", "Mohd Rashid Maktoum")["match"] is True
+    assert match_names_local("Ahmed Ali", "Ali Ahmed")["match"] is True
+
+
+def test_missing_token_is_uncertain():
+    assert match_names_local("Ahmed Ali", "Ahmed Ali Khan")["match"] is None
+    assert match_names_local("Abu Dhabi Bank", "Dhabi Bank")["match"] is None
+
+
+def test_different_names_are_rejected():
+    assert match_names_local("Ahmed Ali", "Omar Khan")["match"] is False
+
+
+def test_score_matrix_matches_pairwise_scores():
+    names = ["Abu Dhabi Bank", "Ahmed Ali", "Mohammed bin Rashid Al Maktoum", "John Smith", "", "Trafco DMCC"]
+    candidates = ["Dhabi Bank", "Ahmed Ali Khan", "Mohd Rashid Maktoum", "Jon Smith", "TRAFCO D.M.C.C.", "Sara"]
+    matrix = score_matrix(names, candidates)
+    for name, row in zip(names, matrix):
+        # Summation order differs, so the last rounded digit may too
+        assert row == pytest.approx([score_names(name, candidate) for candidate in candidates], abs=1e-4)
+
+
+def test_score_matrix_blocks_give_the_same_scores(monkeypatch):
+    import name_match
+
+    names = ["Ahmed Ali", "Sara Al Hashimi", "John Smith"]
+    candidates = ["Ahmed Ali Khan", "Sarah Hashimi", "Jon Smith", "Omar Khan", "Trafco DMCC"]
+    whole = score_matrix(names, candidates)
+    monkeypatch.setattr(name_match, "SCORE_MATRIX_MAX_CELLS", 1)
+    assert score_matrix(names, candidates) == whole
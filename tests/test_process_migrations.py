@@ -0,0 +1,82 @@
+import subprocess
+
+LEGACY_PROCESSES = """
+    CREATE TABLE processes (id text PRIMARY KEY, stock_id text, applicant_name text, status text,
+                            created_at timestamptz DEFAULT now(), details jsonb);
+    INSERT INTO processes (id, stock_id, status, details) VALUES
+        ('1', 'KYB #1', 'Done', '{"id": "1"}'),
+        ('7', 'KYB #7', 'In Progress', '{"id": "7"}');
+"""
+
+
+def test_parallel_inits_get_distinct_ids(make_database):
+    database = make_database(LEGACY_PROCESSES)
+    calls = 20
+    # Separate psql processes, i.e. separate connections, all calling create_process at once
+    inits = [
+        subprocess.Popen(
+            database.command(f"SELECT create_process('KYB', 'Applicant {n}', 'In Progress', '{{}}'::jsonb)"),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for n in range(calls)
+    ]
+    ids = []
+    for init in inits:
+        stdout, stderr = init.communicate(timeout=60)
+        assert init.returncode == 0, stderr
+        ids.append(stdout.strip())
+
+    assert len(set(ids)) == calls
+    # Numbering continues after the IDs of the old count-based scheme
+    assert sorted(int(process_id) for process_id in ids) == list(range(8, 8 + calls))
+    rows = database.run("SELECT count(*) FROM processes WHERE details->>'id' = id AND stock_id = 'KYB #' || id")
+    assert rows == str(calls + 2)
+
+
+def test_task_counts_follow_the_activity_logs(make_database):
+    database = make_database(LEGACY_PROCESSES)
+
+    def tasks(process_id="7"):
+        return database.run(f"SELECT tasks_completed || '/' || tasks_total FROM processes WHERE id = '{process_id}'")
+
+    assert tasks() == "0/0"
+    database.run("""SELECT log_process_step('7', 'license', '{"title": "Checking license", "status": "processing"}')""")
+    database.run("""SELECT log_process_step('7', NULL, '{"title": "Note", "status": "success"}')""")
+    assert tasks() == "1/2"
+    database.run("""
+        SELECT log_process_steps('7', '[
+            {"stepId": "license", "log": {"status": "success"}},
+            {"stepId": "lei", "log": {"title": "Checking LEI", "status": "processing"}}
+        ]')
+    """)
+    assert tasks() == "2/3"
+    database.run("""SELECT approve_process('7', '{"title": "Application Approved", "status": "success"}')""")
+    assert tasks() == "3/4"
+    assert tasks("1") == "0/0"
+
+
+def test_task_counts_are_backfilled(make_database):
+    database = make_database("""
+        CREATE TABLE processes (id text PRIMARY KEY, stock_id text, applicant_name text, status text,
+                                created_at timestamptz DEFAULT now(), details jsonb);
+        INSERT INTO processes (id, stock_id, status, details) VALUES ('3', 'KYB #3', 'In Progress',
+            '{"id": "3", "sections": {"activityLogs": {"items": [
+                {"stepId": "s1", "status": "success"}, {"stepId": "s2", "status": "completed"}, {"stepId": "s3", "status": "processing"}
+            ]}}}');
+    """)
+    assert database.run("SELECT tasks_completed || '/' || tasks_total FROM processes WHERE id = '3'") == "2/3"
+
+
+def test_concurrent_updates_of_a_new_step_count_it_once(make_database):
+    database = make_database(LEGACY_PROCESSES)
+    calls = [
+        subprocess.Popen(
+            database.command(f"""SELECT log_process_step('7', 'license', '{{"status": "{status}"}}')"""),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for status in ["success"] * 10
+    ]
+    for call in calls:
+        _, stderr = call.communicate(timeout=60)
+        assert call.returncode == 0, stderr
+    assert database.run("SELECT tasks_completed || '/' || tasks_total FROM processes WHERE id = '7'") == "1/1"
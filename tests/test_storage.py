@@ -0,0 +1,57 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+
+import storage
+
+
+class RecordingBudget(storage.ByteBudget):
+    def __init__(self):
+        super().__init__(storage.UPLOAD_MAX_INFLIGHT_BYTES)
+        self.reserved = []
+
+    async def acquire(self, size):
+        self.reserved.append(size)
+        return await super().acquire(size)
+
+
+@pytest.fixture
+def fake_storage(monkeypatch):
+    received = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and request.url.path.endswith("/upload/resumable"):
+            return httpx.Response(201, headers={"Location": "http://storage.test/storage/v1/upload/resumable/1"})
+        received.append(request.read())
+        if request.method == "PATCH":
+            offset = int(request.headers["Upload-Offset"]) + len(received[-1])
+            return httpx.Response(204, headers={"Upload-Offset": str(offset)})
+        return httpx.Response(200)
+
+    budget = RecordingBudget()
+    monkeypatch.setattr(storage, "inflight_bytes", budget)
+    monkeypatch.setattr(storage, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+    storage.configure("http://storage.test", "key")
+    yield budget, received
+    storage.configure(None, None)
+
+
+def test_small_upload_reserves_only_its_size(fake_storage):
+    budget, received = fake_storage
+    data = b"x" * 1000
+    assert asyncio.run(storage.upload_fileobj(io.BytesIO(data), len(data), "small.pdf"))
+    assert budget.reserved == [1000]
+    assert received == [data]
+    assert budget.available == budget.capacity
+
+
+def test_resumable_upload_reserves_the_last_part_exactly(fake_storage, monkeypatch):
+    budget, received = fake_storage
+    monkeypatch.setattr(storage, "STORAGE_CHUNK_SIZE", 400)
+    monkeypatch.setattr(storage, "STORAGE_RESUMABLE_THRESHOLD", 500)
+    data = bytes(range(256)) * 4
+    assert asyncio.run(storage.upload_fileobj(io.BytesIO(data), len(data), "large.pdf"))
+    assert budget.reserved == [400, 400, 224]
+    assert b"".join(received) == data
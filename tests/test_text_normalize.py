@@ -0,0 +1,15 @@
+from text_normalize import normalize_legal_name
+
+
+def test_legal_forms_are_stripped():
+    assert normalize_legal_name("Trafco D.M.C.C.") == "trafco"
+    assert normalize_legal_name("TRAFCO DMCC") == "trafco"
+    assert normalize_legal_name("ABC Trading L.L.C") == "abc trading"
+    assert normalize_legal_name("Acme FZ LLC") == "acme"
+
+
+def test_distinguishing_words_are_kept():
+    assert normalize_legal_name("ABC Trading Holding LLC") != normalize_legal_name("ABC Trading LLC")
+    assert normalize_legal_name("Al Futtaim Group") != normalize_legal_name("Al Futtaim")
+    assert normalize_legal_name("Emirates NBD Branch") == "emirates nbd branch"
+    assert normalize_legal_name("Gulf Trading Est") == "gulf trading est"